@@ -6,6 +6,8 @@ Config settings for the entire entity package
 
 # DBpedia collection
 COLLECTION_DBPEDIA = "dbpedia-3.9"
+# Changed DBpedia entities (for incremental indexing)
+COLLECTION_DBPEDIA_CHANGES = "dbpedia-3.9-changes"
 # Freebase to DBpedia sameAs links
 COLLECTION_FREEBASE_DBPEDIA = "freebase-dbpedia-3.9"
 # surface forms
@@ -0,0 +1,50 @@
+"""
+Log of changed DBpedia entities (in MongoDB), used for updating the index incrementally.
+
+Each changed entity is stored with the time of its (last) change:
+    {_id: <entity id>, time: <unix timestamp>}
+
+@author: Faegheh Hasibi
+"""
+
+import time
+
+from nordlys.config import MONGO_DB, MONGO_HOST
+from nordlys.entity.config import COLLECTION_DBPEDIA_CHANGES
+from nordlys.storage.mongo import Mongo
+
+
+class ChangeLog(object):
+    TIME_FIELD = "time"
+
+    def __init__(self, collection=COLLECTION_DBPEDIA_CHANGES):
+        self.mongo = Mongo(MONGO_HOST, MONGO_DB, collection)
+
+    def add(self, doc_id, timestamp=None):
+        """Records that the document has been changed (or deleted)."""
+        self.mongo.set(doc_id, self.TIME_FIELD, timestamp if timestamp is not None else time.time())
+
+    def get_changed_since(self, timestamp=None):
+        """
+        Returns ids of documents changed after the given time.
+
+        :param timestamp: unix timestamp; all changed documents are returned if None
+        :return: list of document ids
+        """
+        query = {} if timestamp is None else {self.TIME_FIELD: {'$gt': timestamp}}
+        return [Mongo.unescape(mdoc[Mongo.ID_FIELD]) for mdoc in self.mongo.collection.find(query)]
+
+
+def read_checkpoint(checkpoint_file):
+    """Returns the timestamp stored in the checkpoint file (None if the file does not exist)."""
+    try:
+        with open(checkpoint_file) as f:
+            return float(f.read().strip())
+    except IOError:
+        return None
+
+
+def write_checkpoint(checkpoint_file, timestamp):
+    """Stores the timestamp in the checkpoint file."""
+    with open(checkpoint_file, "w") as f:
+        f.write(repr(timestamp) + "\n")
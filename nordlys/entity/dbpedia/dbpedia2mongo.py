@@ -15,6 +15,7 @@ from nordlys.entity.config import COLLECTION_DBPEDIA, COLLECTION_FREEBASE_DBPEDI
 from nordlys.storage.mongo import Mongo
 from nordlys.storage.nt2mongo import Triple, NTriplesToMongoDB
 from entity import DBpediaEntity, DBPEDIA_PREDICATE_REDIRECT
+from change_log import ChangeLog
 
 
 class DBpediaToMongoDB(object):
@@ -97,10 +98,13 @@ class DBpediaToMongoDB(object):
         """Check the stored DBpedia collection for errors.
         Currently the only known issue dealt with here is duplicate redirect values.
 
+        Fixed entities are recorded in the change log (to update the index incrementally).
+
         Args:
             fix_errors: Fixes errors as well
         """
         mongo = Mongo(MONGO_HOST, MONGO_DB, COLLECTION_DBPEDIA)
+        change_log = ChangeLog() if fix_errors else None
         if fix_errors:
             print "Fixing errors"
         else:
@@ -123,6 +127,7 @@ class DBpediaToMongoDB(object):
                         # replace value with the first element of the list
                         # (all elements of the list are the same)
                         mongo.set(entity.get_uri(), DBPEDIA_PREDICATE_REDIRECT, redirects[0])
+                        change_log.add(entity.get_uri())
                         """
                         @todo
                         the reverse redirects field (of redirects[0]) also contains duplicates
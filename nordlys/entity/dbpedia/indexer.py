@@ -9,19 +9,34 @@ Creates a Lucene index for DBpedia from MongoDB.
 @author: Faegheh Hasibi
 """
 
-import sys
+import argparse
+import multiprocessing
+import Queue
+import threading
+import time
+from collections import deque
 from urllib import unquote
 
 from nordlys import config
 from nordlys.retrieval.mongo_fields import Fields
 from nordlys.storage.mongo import Mongo
-from nordlys.retrieval.lucene_tools import Lucene
+from nordlys.retrieval.lucene_tools import Lucene, open_index_writer, get_shard_dirs
+from nordlys.entity.dbpedia.change_log import ChangeLog, read_checkpoint, write_checkpoint
 from nordlys.entity.config import COLLECTION_DBPEDIA
 
 
-class MongoDBToLucene(object):
-    def __init__(self, host=config.MONGO_HOST, db=config.MONGO_DB, collection=COLLECTION_DBPEDIA):
-        self.mongo = Mongo(host, db, collection)
+class DocConverter(object):
+    """Converts MongoDB documents to Lucene document contents (list of fields)."""
+
+    def __init__(self, index_config, only_uris=False):
+        """
+        :param index_config: index configuration
+        :param only_uris: if True, only URI values are indexed (as ids)
+        """
+        self.index_config = index_config
+        self.only_uris = only_uris
+        self.fieldtype_tv = Lucene.FIELDTYPE_ID_TV if only_uris else Lucene.FIELDTYPE_TEXT_TV
+        self.fieldtype_tvp = Lucene.FIELDTYPE_ID_TV if only_uris else Lucene.FIELDTYPE_TEXT_TVP
         self.contents = None
 
     def __resolve_uri(self, uri):
@@ -72,78 +87,110 @@ class MongoDBToLucene(object):
                                       'field_value': field_value,
                                       'field_type': field_type})
 
-    def build_index(self, index_config, only_uris=False):
-        """Builds index.
+    def convert(self, mdoc):
+        """
+        Converts a MongoDB document to Lucene document contents.
 
-        :param index_config: index configuration
+        :param mdoc: MongoDB document (as returned by Mongo.find_all())
+        :return: list of fields, or None if the document should not be indexed
         """
-        lucene = Lucene(index_config['index_dir'])
-        lucene.open_writer()
+        index_config = self.index_config
+
+        # this is just to speed up things a bit
+        # we can skip the document right away if the ID does not start
+        # with "<dbpedia:"
+        if not mdoc[Mongo.ID_FIELD].startswith("<dbpedia:"):
+            return None
+
+        # get back document from mongo with keys and _id field unescaped
+        doc = Mongo.get_doc(mdoc)
+
+        # check must_have fields
+        for f, v in index_config['fields'].iteritems():
+            if ("must_have" in v) and (v['must_have']) and (f not in doc):
+                return None
+
+        # doc contents is represented as a list of fields
+        # (mind that fields are multi-valued)
+        self.contents = []
+
+        # each predicate to a separate field
+        for f in doc:
+            if f == Mongo.ID_FIELD:  # id is special
+                self.__add_to_contents(Lucene.FIELDNAME_ID, doc[f], Lucene.FIELDTYPE_ID)
+            if f in index_config['ignore']:
+                pass
+            else:
+                # get resolved field value(s) -- note that it might be a list
+                field_value = self.__get_field_value(doc[f], self.only_uris)
+                # ignore empty fields
+                if (field_value is None) or (field_value == []):
+                    continue
+
+                to_catchall_content = True if index_config['catchall_all'] else False
+
+                if f in index_config['fields']:
+                    self.__add_to_contents(f, field_value, self.fieldtype_tvp)
+
+                    # fields in index_config['fields'] are always added to catch-all content
+                    to_catchall_content = True
+
+                    # copy field value to other field(s)
+                    # (copying is without term positions)
+                    if "copy_to" in index_config['fields'][f]:
+                        for f2 in index_config['fields'][f]['copy_to']:
+                            self.__add_to_contents(f2, field_value, self.fieldtype_tv)
 
-        fieldtype_tv = Lucene.FIELDTYPE_ID_TV if only_uris else Lucene.FIELDTYPE_TEXT_TV
-        fieldtype_tvp = Lucene.FIELDTYPE_ID_TV if only_uris else Lucene.FIELDTYPE_TEXT_TVP
+                # copy field value to catch-all content field
+                # (copying is without term positions)
+                if to_catchall_content:
+                    self.__add_to_contents(Lucene.FIELDNAME_CONTENTS, field_value, self.fieldtype_tv)
 
-        # iterate through MongoDB contents
-        i = 0
-        for mdoc in self.mongo.find_all():
+        return self.contents
 
-            # this is just to speed up things a bit
-            # we can skip the document right away if the ID does not start
-            # with "<dbpedia:"
-            if not mdoc[Mongo.ID_FIELD].startswith("<dbpedia:"):
-                continue
 
-            # get back document from mongo with keys and _id field unescaped
-            doc = self.mongo.get_doc(mdoc)
+# converter of the worker processes (set by _init_converter)
+_converter = None
 
-            # check must_have fields
-            skip_doc = False
-            for f, v in index_config['fields'].iteritems():
-                if ("must_have" in v) and (v['must_have']) and (f not in doc):
-                    skip_doc = True
-                    break
 
-            if skip_doc:
-                continue
+def _init_converter(index_config, only_uris):
+    """Initializes the converter of a worker process."""
+    global _converter
+    _converter = DocConverter(index_config, only_uris)
 
-            # doc contents is represented as a list of fields
-            # (mind that fields are multi-valued)
-            self.contents = []
-
-            # each predicate to a separate field
-            for f in doc:
-                if f == Mongo.ID_FIELD:  # id is special
-                    self.__add_to_contents(Lucene.FIELDNAME_ID, doc[f], Lucene.FIELDTYPE_ID)
-                if f in index_config['ignore']:
-                    pass
-                else:
-                    # get resolved field value(s) -- note that it might be a list
-                    field_value = self.__get_field_value(doc[f], only_uris)
-                    # ignore empty fields
-                    if (field_value is None) or (field_value == []):
-                        continue
-
-                    to_catchall_content = True if index_config['catchall_all'] else False
-
-                    if f in index_config['fields']:
-                        self.__add_to_contents(f, field_value, fieldtype_tvp)
-
-                        # fields in index_config['fields'] are always added to catch-all content
-                        to_catchall_content = True
-
-                        # copy field value to other field(s)
-                        # (copying is without term positions)
-                        if "copy_to" in index_config['fields'][f]:
-                            for f2 in index_config['fields'][f]['copy_to']:
-                                self.__add_to_contents(f2, field_value, fieldtype_tv)
-
-                    # copy field value to catch-all content field
-                    # (copying is without term positions)
-                    if to_catchall_content:
-                        self.__add_to_contents(Lucene.FIELDNAME_CONTENTS, field_value, fieldtype_tv)
+
+def _convert_batch(mdocs):
+    """Converts a batch of MongoDB documents (in a worker process); skipped documents are left out."""
+    batch = []
+    for mdoc in mdocs:
+        contents = _converter.convert(mdoc)
+        if contents is not None:
+            batch.append(contents)
+    return batch
+
+
+class MongoDBToLucene(object):
+    def __init__(self, host=config.MONGO_HOST, db=config.MONGO_DB, collection=COLLECTION_DBPEDIA):
+        self.mongo = Mongo(host, db, collection)
+
+    def build_index(self, index_config, only_uris=False, num_shards=1):
+        """Builds index.
+
+        :param index_config: index configuration
+        :param num_shards: number of shards (sub-indices in index_dir/shard-i); 1 means a single index
+        """
+        lucene = open_index_writer(index_config['index_dir'], num_shards)
+        converter = DocConverter(index_config, only_uris)
+
+        # iterate through MongoDB contents
+        i = 0
+        for mdoc in self.mongo.find_all():
+            contents = converter.convert(mdoc)
+            if contents is None:
+                continue
 
             # add document to index
-            lucene.add_document(self.contents)
+            lucene.add_document(contents)
 
             i += 1
             if i % 1000 == 0:
@@ -154,8 +201,163 @@ class MongoDBToLucene(object):
 
         print "Finished indexing (" + str(i) + " documents in total)"
 
+    def update_index(self, index_config, doc_ids, only_uris=False, commit_every=10000):
+        """
+        Updates an existing index with the current MongoDB contents of the given documents:
+        documents are replaced (or added) by their id, and deleted if they are not in MongoDB anymore
+        or should not be indexed.
+
+        :param index_config: index configuration (same as for building the index)
+        :param doc_ids: ids of changed documents
+        :param commit_every: changes are committed after this many documents
+        """
+        num_shards = max(1, len(get_shard_dirs(index_config['index_dir'])))
+        lucene = open_index_writer(index_config['index_dir'], num_shards, append=True)
+        converter = DocConverter(index_config, only_uris)
+
+        updated, deleted = 0, 0
+        for i, doc_id in enumerate(doc_ids):
+            mdoc = self.mongo.collection.find_one({Mongo.ID_FIELD: Mongo.escape(doc_id)})
+            contents = converter.convert(mdoc) if mdoc is not None else None
+            if contents is None:
+                lucene.delete_document(doc_id)
+                deleted += 1
+            else:
+                lucene.update_document(contents)
+                updated += 1
+            if (i + 1) % commit_every == 0:
+                lucene.commit()
+                print str((i + 1) / 1000) + "K documents updated"
+        lucene.close_writer()
+
+        print "Finished updating (" + str(updated) + " documents updated, " + str(deleted) + " deleted)"
+
+    def update_index_since(self, index_config, checkpoint_file, only_uris=False, since=None):
+        """
+        Updates the index with the documents changed since the checkpoint (see ChangeLog).
+        The checkpoint is set to the start time of the update, once the update is done.
+
+        :param checkpoint_file: file holding the time of the last update
+        :param since: unix timestamp (overrides the checkpoint)
+        """
+        s_t = time.time()
+        if since is None:
+            since = read_checkpoint(checkpoint_file)
+        doc_ids = ChangeLog().get_changed_since(since)
+        print str(len(doc_ids)) + " changed documents since " + str(since)
+        self.update_index(index_config, doc_ids, only_uris)
+        write_checkpoint(checkpoint_file, s_t)
+
+    def __get_batches(self, batch_size):
+        """Reads MongoDB documents in batches."""
+        batch = []
+        for mdoc in self.mongo.find_all():
+            batch.append(mdoc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if len(batch) > 0:
+            yield batch
+
+    @staticmethod
+    def __index_batches(lucene, queue, errors):
+        """Indexing thread: adds converted documents from the queue to the index, until it gets None."""
+        Lucene.attach_current_thread()
+        while True:
+            batch = queue.get()
+            if batch is None:
+                break
+            try:
+                for contents in batch:
+                    lucene.add_document(contents)
+            except Exception, e:
+                errors.append(e)
+
+    def build_index_parallel(self, index_config, only_uris=False, num_shards=1, num_workers=4, num_threads=4,
+                             batch_size=1000, ram_buffer_mb=1024, segments_per_tier=30, force_merge=None):
+        """
+        Builds index in parallel:
+            - this process reads MongoDB documents in batches
+            - worker processes convert them to Lucene document contents
+            - indexing threads add the documents to a single IndexWriter (one per shard)
+        The index is the same as with build_index (only the order of documents may differ).
+
+        :param index_config: index configuration
+        :param num_shards: number of shards (sub-indices in index_dir/shard-i); 1 means a single index
+        :param num_workers: number of converter processes
+        :param num_threads: number of indexing threads
+        :param batch_size: number of documents sent to a worker at once
+        :param ram_buffer_mb: RAM buffer of the IndexWriter (MB)
+        :param segments_per_tier: merge policy setting, see Lucene.open_writer
+        :param force_merge: if set, the index is merged down to this number of segments (per shard) at the end
+        """
+        s_t = time.time()
+        # worker processes are forked before the JVM is started in this process
+        pool = multiprocessing.Pool(num_workers, _init_converter, (index_config, only_uris))
+        lucene = open_index_writer(index_config['index_dir'], num_shards, ram_buffer_mb=ram_buffer_mb,
+                                   max_thread_states=num_threads, segments_per_tier=segments_per_tier)
+
+        queue = Queue.Queue(maxsize=num_threads * 4)
+        errors = []
+        threads = []
+        for j in range(num_threads):
+            t = threading.Thread(target=self.__index_batches, args=(lucene, queue, errors))
+            t.start()
+            threads.append(t)
+
+        # at most 2 batches per worker are pending, so that MongoDB is not read ahead of the indexing
+        pending = deque()
+        i = 0
+        for mdocs in self.__get_batches(batch_size):
+            pending.append(pool.apply_async(_convert_batch, (mdocs,)))
+            while len(pending) >= 2 * num_workers or (len(pending) > 0 and pending[0].ready()):
+                batch = pending.popleft().get()
+                queue.put(batch)
+                if (i + len(batch)) // 10000 > i // 10000:
+                    print str((i + len(batch)) // 1000) + "K documents converted (" + \
+                        str(int((i + len(batch)) / (time.time() - s_t))) + " docs/sec)"
+                i += len(batch)
+        while len(pending) > 0:
+            batch = pending.popleft().get()
+            queue.put(batch)
+            i += len(batch)
+        pool.close()
+        pool.join()
+
+        for t in threads:
+            queue.put(None)
+        for t in threads:
+            t.join()
+        if len(errors) > 0:
+            raise Exception("Error in indexing: " + str(errors[0]))
+
+        index_time = time.time() - s_t
+        if force_merge is not None:
+            print "Merging index into " + str(force_merge) + " segment(s) ..."
+            lucene.force_merge(force_merge)
+        lucene.close_writer()
+        total_time = time.time() - s_t
+
+        print "Finished indexing (" + str(i) + " documents in total)"
+        print "Indexing time: " + str(round(index_time, 1)) + " sec (" + str(int(i / index_time)) + \
+              " docs/sec), total time: " + str(round(total_time, 1)) + " sec"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--parallel", help="parallel build", action="store_true", default=False)
+    parser.add_argument("-w", "--workers", help="number of converter processes (parallel build)", type=int, default=4)
+    parser.add_argument("-t", "--threads", help="number of indexing threads (parallel build)", type=int, default=4)
+    parser.add_argument("-s", "--shards", help="number of shards", type=int, default=1)
+    parser.add_argument("-m", "--merge", help="force merge into this number of segments (parallel build)", type=int)
+    parser.add_argument("-u", "--update", help="update the existing index instead of building it", action="store_true",
+                        default=False)
+    parser.add_argument("--ids", help="file with ids of changed documents, one per line (update)", type=str)
+    parser.add_argument("--since", help="unix timestamp; documents changed since then are updated (update)",
+                        type=float)
+    parser.add_argument("--checkpoint", help="checkpoint file (update); default: <index_dir>.checkpoint", type=str)
+    args = parser.parse_args()
 
-def main(argv):
     # title + short abstract
     """
     index_config0 = {'index_dir' : "/hdfs1/krisztib/dbpedia-3.9-indices/index0",
@@ -232,9 +434,21 @@ def main(argv):
 
     print "index dir: " + index_config7_only_uri['index_dir']
     m2l = MongoDBToLucene()
-    m2l.build_index(index_config7_only_uri, only_uris=True)
+    if args.update:
+        checkpoint_file = args.checkpoint if args.checkpoint is not None \
+            else index_config7_only_uri['index_dir'].rstrip("/") + ".checkpoint"
+        if args.ids is not None:
+            doc_ids = [line.strip() for line in open(args.ids) if line.strip() != ""]
+            m2l.update_index(index_config7_only_uri, doc_ids, only_uris=True)
+        else:
+            m2l.update_index_since(index_config7_only_uri, checkpoint_file, only_uris=True, since=args.since)
+    elif args.parallel:
+        m2l.build_index_parallel(index_config7_only_uri, only_uris=True, num_shards=args.shards,
+                                 num_workers=args.workers, num_threads=args.threads, force_merge=args.merge)
+    else:
+        m2l.build_index(index_config7_only_uri, only_uris=True, num_shards=args.shards)
     print "index build" + index_config7_only_uri['index_dir']
 
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    main()
@@ -0,0 +1,176 @@
+"""
+Wikipedia link graph (<dbo:wikiPageWikiLink>) of DBpedia entities in CSR format.
+
+- Entities (documents and link targets) get integer ids: positions in the sorted list of URIs
+- Links of entity i are links[ptr[i]:ptr[i+1]] (sorted, unique int32 ids)
+- Arrays are saved as .npy files and loaded as memory-mapped arrays
+
+Building the graph from the DBpedia MongoDB collection:
+    python -m nordlys.entity.dbpedia.link_graph <graph_dir>
+
+@author: Faegheh Hasibi
+"""
+
+import argparse
+import json
+import os
+import time
+from array import array
+from bisect import bisect_left
+
+import numpy
+from nordlys.config import MONGO_DB, MONGO_HOST
+from nordlys.entity.config import COLLECTION_DBPEDIA
+from nordlys.retrieval.mem_index import StringArray, load_array, intersect_sorted, to_utf8
+from nordlys.storage.mongo import Mongo
+
+WIKILINKS = "<dbo:wikiPageWikiLink>"
+
+
+class LinkGraph(object):
+    """Directed link graph over integer entity ids."""
+
+    META_FILE = "meta.json"
+
+    def __init__(self, entities, ptr, links):
+        """
+        :param entities: StringArray of entity URIs (sorted, utf-8)
+        :param ptr: link offsets (len(entities) + 1)
+        :param links: link targets
+        """
+        self.entities = entities
+        self.ptr = ptr
+        self.links = links
+
+    @staticmethod
+    def build(docs):
+        """
+        Builds the graph.
+
+        :param docs: iterable of (entity URI, list of linked URIs)
+        """
+        s_t = time.time()
+        ids = {}  # URI -> id, in the order of appearance
+        srcs, dsts = array('i'), array('i')
+        for i, (uri, links) in enumerate(docs):
+            src = ids.setdefault(to_utf8(uri), len(ids))
+            for link in links:
+                srcs.append(src)
+                dsts.append(ids.setdefault(to_utf8(link), len(ids)))
+            if (i + 1) % 1000000 == 0:
+                print str((i + 1) // 1000000) + "M documents read"
+
+        # renumbers entities in the order of their URIs
+        uris = sorted(ids.iterkeys())
+        new_ids = numpy.zeros(len(uris), dtype=numpy.int32)
+        for new_id, uri in enumerate(uris):
+            new_ids[ids[uri]] = new_id
+        del ids
+        srcs = new_ids[numpy.frombuffer(srcs, dtype=numpy.int32)]
+        dsts = new_ids[numpy.frombuffer(dsts, dtype=numpy.int32)]
+
+        # sorts links by (src, dst) and removes duplicates
+        keys = numpy.unique(srcs.astype(numpy.int64) * len(uris) + dsts)
+        srcs = (keys // len(uris)).astype(numpy.int32)
+        links = (keys % len(uris)).astype(numpy.int32)
+        ptr = numpy.zeros(len(uris) + 1, dtype=numpy.int64)
+        ptr[1:] = numpy.cumsum(numpy.bincount(srcs, minlength=len(uris)))
+        print "Graph built: " + str(len(uris)) + " entities, " + str(len(links)) + " links (" + \
+            str(round(time.time() - s_t, 1)) + " sec)"
+        return LinkGraph(StringArray.build(uris), ptr, links)
+
+    @staticmethod
+    def build_from_mongo(collection=COLLECTION_DBPEDIA):
+        """Builds the graph from the DBpedia MongoDB collection."""
+        mongo = Mongo(MONGO_HOST, MONGO_DB, collection)
+
+        def get_docs():
+            for mdoc in mongo.find_all():
+                doc = Mongo.get_doc(mdoc)
+                yield doc[Mongo.ID_FIELD], doc.get(WIKILINKS, [])
+        return LinkGraph.build(get_docs())
+
+    def save(self, graph_dir):
+        if not os.path.exists(graph_dir):
+            os.makedirs(graph_dir)
+        self.entities.save(graph_dir + "/entities")
+        numpy.save(graph_dir + "/ptr.npy", self.ptr)
+        numpy.save(graph_dir + "/links.npy", self.links)
+        json.dump({'num_entities': len(self.entities), 'num_links': len(self.links)},
+                  open(graph_dir + "/" + self.META_FILE, "w"))
+
+    @staticmethod
+    def load(graph_dir, mmap_mode="r"):
+        """
+        Loads the graph.
+
+        :param mmap_mode: numpy mmap mode; None reads the arrays into memory
+        """
+        return LinkGraph(StringArray.load(graph_dir + "/entities", mmap_mode),
+                         load_array(graph_dir + "/ptr.npy", mmap_mode),
+                         load_array(graph_dir + "/links.npy", mmap_mode))
+
+    def get_id(self, uri):
+        """Returns integer id of the entity, or None if the entity is not in the graph."""
+        uri = to_utf8(uri)
+        i = bisect_left(self.entities, uri)
+        if i < len(self.entities) and self.entities[i] == uri:
+            return i
+        return None
+
+    def get_links(self, uri):
+        """Returns sorted ids of the entities linked from the entity (empty if the entity is not in the graph)."""
+        i = self.get_id(uri)
+        if i is None:
+            return numpy.zeros(0, dtype=numpy.int32)
+        return self.links[self.ptr[i]:self.ptr[i + 1]]
+
+    def is_linked(self, uri1, uri2):
+        """Returns True if there is a link between the two entities (in either direction)."""
+        i, j = self.get_id(uri1), self.get_id(uri2)
+        if i is None or j is None:
+            return False
+        for src, dst in [(i, j), (j, i)]:
+            links = self.links[self.ptr[src]:self.ptr[src + 1]]
+            k = numpy.searchsorted(links, dst)
+            if k < len(links) and links[k] == dst:
+                return True
+        return False
+
+    def common_neighbors(self, uris):
+        """Returns number of entities linked from all the given entities."""
+        links = sorted([self.get_links(uri) for uri in uris], key=len)
+        common = links[0]
+        for l in links[1:]:
+            if len(common) == 0:
+                break
+            common = intersect_sorted(common, l)
+        return len(common)
+
+    def all_neighbors(self, uris):
+        """Returns number of entities linked from any of the given entities."""
+        links = [self.get_links(uri) for uri in uris]
+        return len(numpy.unique(numpy.concatenate(links)))
+
+    def num_edges(self, uris):
+        """Returns number of (undirected) edges between the given entities."""
+        uris = list(uris)
+        num_edges = 0
+        for x in range(len(uris)):
+            for y in range(x + 1, len(uris)):
+                if self.is_linked(uris[x], uris[y]):
+                    num_edges += 1
+        return num_edges
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("graph_dir", help="output directory", type=str)
+    parser.add_argument("-c", "--collection", help="DBpedia collection", type=str, default=COLLECTION_DBPEDIA)
+    args = parser.parse_args()
+
+    LinkGraph.build_from_mongo(args.collection).save(args.graph_dir)
+
+
+if __name__ == '__main__':
+    main()
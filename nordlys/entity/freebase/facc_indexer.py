@@ -1,24 +1,131 @@
 """
 Building an entities-only index from FACC-12.
 
+Parallel build (build_index_parallel):
+    - annotation files are distributed dynamically among worker processes (idle workers take the next file)
+    - each worker parses its files and writes its own shard (index_dir/shard-i), using its own JVM
+    - progress is checkpointed per file, so that an interrupted build can be resumed
+
+Usage:
+    python -m nordlys.entity.freebase.facc_indexer [-w <num_workers>] [-r]
+
 @author: Faegheh Hasibi
 @author: Krisztian Balog
 """
+import argparse
+import multiprocessing
 import os
+import Queue
+import time
 from collections import defaultdict
-import csv
-from nordlys.retrieval.lucene_tools import Lucene
+from nordlys.retrieval.lucene_tools import Lucene, open_index_writer, get_shard_dirs, SHARD_PREFIX
+
+
+def get_anns_files(folder):
+    """Returns the list of annotation files in the FACC folder (<folder>/<chunk>/<dir>/<file>), in sorted order."""
+    anns_files = []
+    for chunk in sorted(os.listdir(folder)):
+        path = folder + "/" + chunk
+        if os.path.isdir(path):
+            for dir in sorted(os.listdir(path)):
+                filedir = path + "/" + dir
+                for anns_file in sorted(os.listdir(filedir)):
+                    anns_files.append(filedir + "/" + anns_file)
+    return anns_files
+
+
+def parse_anns_file(anns_file):
+    """
+    Reads the annotations of a tsv file.
+
+    :param anns_file: tsv annotation file (doc_id in the first column, freebase id in the 8th column)
+    :return: dictionary {doc_id: [en_id, ...]}
+    """
+    file_dict = defaultdict(list)
+    with open(anns_file, 'rb') as tsvfile:
+        for line in tsvfile:
+            cols = line.rstrip("\r\n").split("\t")
+            if len(cols) < 8:
+                continue
+            file_dict[cols[0]].append(cols[7])
+    return file_dict
+
+
+def get_lucene_contents(doc_id, en_list):
+    """Adds the id and content field to the document, to be indexed by Lucene."""
+    contents = [{'field_name': Lucene.FIELDNAME_ID, 'field_value': doc_id, 'field_type': Lucene.FIELDTYPE_ID}]
+    for en_id in en_list:
+        contents.append({'field_name': "content", 'field_value': en_id, 'field_type': Lucene.FIELDTYPE_ID_TV})
+    return contents
+
+
+class ShardCheckpoint(object):
+    """
+    Per-file progress of a shard (written by a single worker):
+        - <index_dir>/shard-i.done: files whose documents are committed to the shard
+        - <index_dir>/shard-i.pending: files indexed in the commit that is in progress
+
+    The pending list is written before the commit and the files are added to the done list after it. If the build is
+    interrupted in between, pending files are re-indexed in the same shard with document updates (so no duplicates).
+    """
+
+    def __init__(self, index_dir, shard):
+        self.done_file = index_dir + "/" + SHARD_PREFIX + str(shard) + ".done"
+        self.pending_file = index_dir + "/" + SHARD_PREFIX + str(shard) + ".pending"
+
+    @staticmethod
+    def __read(file_name):
+        if not os.path.exists(file_name):
+            return []
+        with open(file_name) as f:
+            return [line.rstrip("\n") for line in f if line.strip() != ""]
+
+    def get_done(self):
+        """Returns the set of files committed to the shard."""
+        return set(self.__read(self.done_file))
+
+    def get_pending(self):
+        """Returns the files of an interrupted commit, which are not in the done list."""
+        done = self.get_done()
+        return [f for f in self.__read(self.pending_file) if f not in done]
+
+    def set_pending(self, anns_files):
+        tmp_file = self.pending_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            for anns_file in anns_files:
+                f.write(anns_file + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_file, self.pending_file)
+
+    def add_done(self, anns_files):
+        with open(self.done_file, "a") as f:
+            for anns_file in anns_files:
+                f.write(anns_file + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(self.pending_file):
+            os.remove(self.pending_file)
+
+    def clear(self):
+        for file_name in [self.done_file, self.pending_file]:
+            if os.path.exists(file_name):
+                os.remove(file_name)
 
 
 class FaccToLucene(object):
 
-    def __init__(self, index_dir):
+    def __init__(self, index_dir, num_shards=1):
+        """
+        :param index_dir: index directory
+        :param num_shards: number of shards (sub-indices in index_dir/shard-i); 1 means a single index
+        """
         self.index_dir = index_dir
+        self.num_shards = num_shards
         self.lucene = None
 
     def __start_indexing(self):
-        self.lucene = Lucene(self.index_dir)
-        self.lucene.open_writer()
+        self.lucene = open_index_writer(self.index_dir, self.num_shards)
 
     def __end_indexing(self):
         self.lucene.close_writer()
@@ -26,15 +133,86 @@ class FaccToLucene(object):
     def build_index(self, folder):
         """Builds the index for all docs in the folder."""
         self.__start_indexing()
-        for chunk in sorted(os.listdir(folder)):
-            path = folder + "/" + chunk
-            if os.path.isdir(path):
-                for dir in sorted(os.listdir(path)):
-                    filedir = path + "/" + dir
-                    for anns_file in sorted(os.listdir(filedir)):
-                        self.index_file(filedir + "/" + anns_file)
+        for anns_file in get_anns_files(folder):
+            self.index_file(anns_file)
         self.__end_indexing()
 
+    def build_index_parallel(self, folder, num_workers=4, resume=False, commit_every=100, ram_buffer_mb=256):
+        """
+        Builds the index for all docs in the folder using num_workers processes; each worker writes one shard.
+        Documents are partitioned by file (not by the hash of their ids), as each document is in a single file.
+
+        :param folder: FACC folder
+        :param num_workers: number of worker processes (= number of shards)
+        :param resume: if True, an interrupted build is continued (files in the checkpoints are skipped);
+                       otherwise a new index is created
+        :param commit_every: each worker commits (and checkpoints) after this many files
+        :param ram_buffer_mb: RAM buffer of each IndexWriter (MB)
+        """
+        s_t = time.time()
+        if resume:
+            num_shards = len(get_shard_dirs(self.index_dir))
+            if num_shards != num_workers:
+                raise Exception("Index has " + str(num_shards) + " shards; resume with the same number of workers")
+        elif len(get_shard_dirs(self.index_dir)) > num_workers:
+            raise Exception("Index directory has more shards than workers: " + self.index_dir)
+        elif not os.path.exists(self.index_dir):
+            os.makedirs(self.index_dir)
+
+        # files that are committed or to be re-indexed by the worker of their shard are not distributed
+        skip = set()
+        for i in range(num_workers):
+            checkpoint = ShardCheckpoint(self.index_dir, i)
+            if resume:
+                skip.update(checkpoint.get_done())
+                skip.update(checkpoint.get_pending())
+            else:
+                checkpoint.clear()
+        anns_files = [f for f in get_anns_files(folder) if f not in skip]
+        print str(len(anns_files)) + " files to index (" + str(len(skip)) + " done)"
+
+        # workers are started before the JVM is initialized (no Lucene object is created in this process)
+        task_queue = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue()
+        workers = []
+        for i in range(num_workers):
+            p = multiprocessing.Process(target=_index_worker, args=(self.index_dir, i, resume, commit_every,
+                                                                    ram_buffer_mb, task_queue, result_queue))
+            p.start()
+            workers.append(p)
+        for anns_file in anns_files:
+            task_queue.put(anns_file)
+        for p in workers:
+            task_queue.put(None)
+
+        num_files, num_docs, num_finished = 0, 0, 0
+        while num_finished < num_workers:
+            try:
+                anns_file, n = result_queue.get(timeout=1)
+            except Queue.Empty:
+                if not any(p.is_alive() for p in workers):
+                    raise Exception("Indexing workers terminated before indexing all files")
+                continue
+            if anns_file is None:  # worker is finished
+                if n is not None:
+                    raise Exception("Error in indexing: " + n)
+                num_finished += 1
+                continue
+            num_files += 1
+            num_docs += n
+            if num_files % 100 == 0:
+                elapsed = time.time() - s_t
+                print str(num_files) + " files, " + str(num_docs) + " documents indexed (" + \
+                    str(round(num_files / elapsed, 1)) + " files/sec, " + str(int(num_docs / elapsed)) + " docs/sec)"
+        for p in workers:
+            p.join()
+
+        total_time = time.time() - s_t
+        print "Finished indexing (" + str(num_files) + " files, " + str(num_docs) + " documents)"
+        if total_time > 0:
+            print "Indexing time: " + str(round(total_time, 1)) + " sec (" + str(round(num_files / total_time, 1)) + \
+                  " files/sec, " + str(int(num_docs / total_time)) + " docs/sec)"
+
     def index_file(self, anns_file):
         """
         Builds index for a single file.
@@ -42,33 +220,82 @@ class FaccToLucene(object):
         :param anns_file: tsv annotation file
         """
         print "Indexing " + anns_file + "... ",
+        index_anns_file(self.lucene, anns_file)
+        print "done"
 
-        with open(anns_file, 'rb') as tsvfile:
-            reader = csv.reader(tsvfile, delimiter="\t", quoting=csv.QUOTE_NONE)
-            file_dict = defaultdict(list)
-            # Reads tsv lines
-            for line in reader:
-                doc_id, en = line[0], line[7]
-                file_dict[doc_id].append(en)
 
-        for doc_id, en_list in file_dict.iteritems():
-            contents = self.__get_lucene_contents(doc_id, en_list)
-            self.lucene.add_document(contents)
+def index_anns_file(lucene, anns_file, update=False):
+    """
+    Adds the documents of an annotation file to the index.
 
-        print "done"
+    :param lucene: Lucene object (with open writer)
+    :param anns_file: tsv annotation file
+    :param update: if True, documents replace the ones with the same id (used when re-indexing a file)
+    :return: number of documents
+    """
+    file_dict = parse_anns_file(anns_file)
+    for doc_id, en_list in file_dict.iteritems():
+        contents = get_lucene_contents(doc_id, en_list)
+        if update:
+            lucene.update_document(contents)
+        else:
+            lucene.add_document(contents)
+    return len(file_dict)
 
-    def __get_lucene_contents(self, doc_id, en_list):
-        """Adds the id and content field to the dpcument, to be indexed by Lucene."""
-        contents = [{'field_name': Lucene.FIELDNAME_ID, 'field_value': doc_id, 'field_type': Lucene.FIELDTYPE_ID}]
-        for en_id in en_list:
-            contents.append({'field_name': "content", 'field_value': en_id, 'field_type': Lucene.FIELDTYPE_ID_TV})
-        return contents
+
+def _index_worker(index_dir, shard, resume, commit_every, ram_buffer_mb, task_queue, result_queue):
+    """
+    Worker process of the parallel build: indexes files into its shard until it gets None.
+    Sends (file, number of documents) for each indexed file, and (None, error message or None) when finished.
+    """
+    try:
+        lucene = Lucene(index_dir + "/" + SHARD_PREFIX + str(shard))
+        lucene.open_writer(ram_buffer_mb=ram_buffer_mb, append=resume)
+        checkpoint = ShardCheckpoint(index_dir, shard)
+        batch = []
+
+        def commit():
+            checkpoint.set_pending(batch)
+            lucene.commit()
+            checkpoint.add_done(batch)
+            del batch[:]
+
+        # files of an interrupted commit are re-indexed first
+        for anns_file in checkpoint.get_pending() if resume else []:
+            result_queue.put((anns_file, index_anns_file(lucene, anns_file, update=True)))
+            batch.append(anns_file)
+        while True:
+            anns_file = task_queue.get()
+            if anns_file is None:
+                break
+            result_queue.put((anns_file, index_anns_file(lucene, anns_file)))
+            batch.append(anns_file)
+            if len(batch) >= commit_every:
+                commit()
+        commit()
+        lucene.close_writer()
+        result_queue.put((None, None))
+    except Exception, e:
+        print "Error in indexing shard " + str(shard) + ": ", e
+        result_queue.put((None, str(e)))
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-w", "--workers", help="number of worker processes (= shards) for parallel build; "
+                                                "if not given, the index is built serially", type=int)
+    parser.add_argument("-r", "--resume", help="resume an interrupted parallel build", action="store_true",
+                        default=False)
+    parser.add_argument("-c", "--commit", help="files per commit/checkpoint (parallel build)", type=int, default=100)
+    args = parser.parse_args()
+
     index_dir = "/hdfs1/krisztib/facc-indices/clueweb12"
     facc_folder = "/hdfs1/krisztib/ClueWeb12-FACC1"
-    FaccToLucene(index_dir).build_index(facc_folder)
+    if args.workers is not None:
+        FaccToLucene(index_dir).build_index_parallel(facc_folder, num_workers=args.workers, resume=args.resume,
+                                                     commit_every=args.commit)
+    else:
+        FaccToLucene(index_dir).build_index(facc_folder)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+Precomputed FACC document co-occurrence counts of entity pairs.
+
+- Entities get integer ids (positions in the sorted list of entities)
+- Pairs are stored as a sparse matrix: sorted int64 keys (i * num_entities + j, i < j) and their counts
+- Document frequencies of the single entities are stored as well
+- Arrays are saved as .npy files and loaded as memory-mapped arrays
+
+Candidate pairs are the entity pairs that appear together in the candidate list of a surface form (FACC entities of the
+surface form with commonness above the threshold, filtered by the KB snapshot). Counts are computed from the FACC
+postings (see facc_postings.py) or, if postings are not given, by searching the FACC index.
+
+Usage:
+    python -m nordlys.entity.freebase.facc_pairs <pairs_dir> -e <entities_file> (-p <postings_dir> | -i <facc_index>)
+        [-c <commonness_th>]
+
+@author: Faegheh Hasibi
+"""
+
+import argparse
+import json
+import os
+import time
+from array import array
+from bisect import bisect_left
+
+import numpy
+from nordlys.entity.freebase.facc_postings import load_entities
+from nordlys.entity.freebase.utils import FreebaseUtils
+from nordlys.retrieval.mem_index import StringArray, load_array
+from nordlys.storage.mongo import Mongo
+
+
+def get_candidate_lists(entities, commonness_th=0.0):
+    """
+    Generates candidate entity lists of the surface forms.
+
+    :param entities: set of entity (Freebase) ids; other entities are ignored
+    :param commonness_th: commonness threshold
+    :return: generator of entity id lists
+    """
+    from nordlys.entity.surfaceforms import SurfaceForms
+    sf = SurfaceForms(lowercase=True)
+    for mdoc in sf.mongo.find_all():
+        # the same as Mention.__gen_merged_facc
+        merged_facc = {}
+        for source in ["facc09", "facc12"]:
+            for fb_uri, occurrences in mdoc.get(source, {}).iteritems():
+                fb_uri = Mongo.unescape(fb_uri)
+                merged_facc[fb_uri] = merged_facc.get(fb_uri, 0) + occurrences
+        total = sum(merged_facc.values())
+        candidates = []
+        for fb_uri, occurrences in merged_facc.iteritems():
+            if occurrences / float(total) >= commonness_th and fb_uri.startswith("<fb:m."):
+                fb_id = FreebaseUtils.freebase_uri_to_id(fb_uri)
+                if fb_id in entities:
+                    candidates.append(fb_id)
+        if len(candidates) > 1:
+            yield candidates
+
+
+class FaccPairs(object):
+    """Sparse matrix of entity pair co-occurrence counts."""
+
+    META_FILE = "meta.json"
+
+    def __init__(self, entities, df, pair_keys, pair_counts, num_docs):
+        """
+        :param entities: StringArray of entity ids (sorted)
+        :param df: document frequency of entities
+        :param pair_keys: sorted pair keys (i * len(entities) + j, where i < j)
+        :param pair_counts: number of documents containing both entities of the pair
+        :param num_docs: number of documents in the collection
+        """
+        self.entities = entities
+        self.df = df
+        self.pair_keys = pair_keys
+        self.pair_counts = pair_counts
+        self.num_docs = num_docs
+
+    @staticmethod
+    def build(candidate_lists, counter):
+        """
+        Builds the matrix for all pairs of the candidate lists.
+
+        :param candidate_lists: iterable of entity id lists
+        :param counter: object with get_and_count(en_ids) and num_docs (e.g., FaccPostings or FaccIndexCounter)
+        """
+        s_t = time.time()
+        en_lists = [sorted(set(en_list)) for en_list in candidate_lists]
+        entities = sorted(set(en_id for en_list in en_lists for en_id in en_list))
+        entity_ids = dict((en_id, i) for i, en_id in enumerate(entities))
+        n = len(entities)
+
+        keys = array('l')
+        for en_list in en_lists:
+            ids = [entity_ids[en_id] for en_id in en_list]
+            for x in range(len(ids)):
+                for y in range(x + 1, len(ids)):
+                    keys.append(ids[x] * n + ids[y])
+        pair_keys = numpy.unique(numpy.frombuffer(keys, dtype=numpy.int64)) if len(keys) > 0 \
+            else numpy.zeros(0, dtype=numpy.int64)
+        print str(len(pair_keys)) + " pairs of " + str(n) + " entities"
+
+        df = numpy.array([counter.get_and_count([en_id]) for en_id in entities], dtype=numpy.int64)
+        pair_counts = numpy.zeros(len(pair_keys), dtype=numpy.int64)
+        for k, key in enumerate(pair_keys):
+            i, j = divmod(int(key), n)
+            # pairs of entities that never occur are not counted
+            if df[i] > 0 and df[j] > 0:
+                pair_counts[k] = counter.get_and_count([entities[i], entities[j]])
+            if (k + 1) % 1000000 == 0:
+                print str((k + 1) // 1000000) + "M pairs counted (" + str(round(time.time() - s_t, 1)) + " sec)"
+        print "Pairs counted (" + str(round(time.time() - s_t, 1)) + " sec)"
+        return FaccPairs(StringArray.build(entities), df, pair_keys, pair_counts, counter.num_docs)
+
+    def save(self, pairs_dir):
+        if not os.path.exists(pairs_dir):
+            os.makedirs(pairs_dir)
+        self.entities.save(pairs_dir + "/entities")
+        numpy.save(pairs_dir + "/df.npy", self.df)
+        numpy.save(pairs_dir + "/pair_keys.npy", self.pair_keys)
+        numpy.save(pairs_dir + "/pair_counts.npy", self.pair_counts)
+        json.dump({'num_docs': self.num_docs, 'num_entities': len(self.entities), 'num_pairs': len(self.pair_keys)},
+                  open(pairs_dir + "/" + self.META_FILE, "w"))
+
+    @staticmethod
+    def load(pairs_dir, mmap_mode="r"):
+        """
+        Loads the matrix.
+
+        :param mmap_mode: numpy mmap mode; None reads the arrays into memory
+        """
+        meta = json.load(open(pairs_dir + "/" + FaccPairs.META_FILE))
+        return FaccPairs(StringArray.load(pairs_dir + "/entities", mmap_mode),
+                         load_array(pairs_dir + "/df.npy", mmap_mode),
+                         load_array(pairs_dir + "/pair_keys.npy", mmap_mode),
+                         load_array(pairs_dir + "/pair_counts.npy", mmap_mode), meta['num_docs'])
+
+    def get_entity_id(self, en_id):
+        """Returns integer id of the entity, or None if the entity is not in the matrix."""
+        i = bisect_left(self.entities, en_id)
+        if i < len(self.entities) and self.entities[i] == en_id:
+            return i
+        return None
+
+    def get_df(self, en_id):
+        """Returns document frequency of the entity, or None if the entity is not in the matrix."""
+        i = self.get_entity_id(en_id)
+        return None if i is None else int(self.df[i])
+
+    def get_pair_count(self, en_id1, en_id2):
+        """Returns number of documents containing both entities, or None if the pair is not in the matrix."""
+        i, j = self.get_entity_id(en_id1), self.get_entity_id(en_id2)
+        if i is None or j is None:
+            return None
+        if i > j:
+            i, j = j, i
+        key = i * len(self.entities) + j
+        k = numpy.searchsorted(self.pair_keys, key)
+        if k < len(self.pair_keys) and self.pair_keys[k] == key:
+            return int(self.pair_counts[k])
+        return None
+
+    def get_and_count(self, en_ids):
+        """Returns "and" count of one or two entities; None if it is not precomputed (or for larger sets)."""
+        en_ids = sorted(set(en_ids))
+        if len(en_ids) == 1:
+            return self.get_df(en_ids[0])
+        if len(en_ids) == 2:
+            return self.get_pair_count(en_ids[0], en_ids[1])
+        return None
+
+    def get_or_count(self, en_ids):
+        """Returns "or" count of one or two entities; None if it is not precomputed (or for larger sets)."""
+        en_ids = sorted(set(en_ids))
+        if len(en_ids) == 1:
+            return self.get_df(en_ids[0])
+        if len(en_ids) == 2:
+            both = self.get_pair_count(en_ids[0], en_ids[1])
+            if both is None:
+                return None
+            return self.get_df(en_ids[0]) + self.get_df(en_ids[1]) - both
+        return None
+
+
+class FaccIndexCounter(object):
+    """Counts co-occurrences by searching the FACC index (used if there are no postings)."""
+
+    def __init__(self, index_dir):
+        from nordlys.retrieval.index_cache import IndexCache
+        self.lucene = IndexCache(index_dir)
+        self.lucene.open_searcher()
+        self.num_docs = self.lucene.num_docs()
+
+    def get_and_count(self, en_ids):
+        return self.lucene.get_and_count(en_ids, "content")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pairs_dir", help="output directory", type=str)
+    parser.add_argument("-e", "--entities", help="file with Freebase ids in the first column (e.g., KB snapshot)",
+                        type=str, required=True)
+    parser.add_argument("-p", "--postings", help="FACC postings directory (see facc_postings.py)", type=str)
+    parser.add_argument("-i", "--index", help="FACC index directory (used if postings are not given)", type=str)
+    parser.add_argument("-c", "--commonness", help="commonness threshold of candidate entities", type=float,
+                        default=0.0)
+    args = parser.parse_args()
+
+    if args.postings is not None:
+        from nordlys.entity.freebase.facc_postings import FaccPostings
+        counter = FaccPostings.load(args.postings)
+    elif args.index is not None:
+        counter = FaccIndexCounter(args.index)
+    else:
+        raise Exception("Either postings or index directory is required")
+
+    candidate_lists = get_candidate_lists(set(load_entities(args.entities)), args.commonness)
+    FaccPairs.build(candidate_lists, counter).save(args.pairs_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+In-memory entity postings of the FACC collection, for computing co-occurrence counts without Lucene searches.
+
+- For each entity of the KB snapshot, the (sorted) numbers of the FACC documents annotated with the entity are stored
+- Postings are kept in CSR format: docs of entity i are docs[ptr[i]:ptr[i+1]], in int32 numpy arrays
+- AND/OR counts of entity sets are computed by intersection/union of the postings
+- Document numbers are assigned while building (they are not Lucene doc ids); only the counts are meaningful
+
+Building postings from the FACC annotation files:
+    python -m nordlys.entity.freebase.facc_postings <facc_folder> <postings_dir> -e <entities_file> [-w <num_workers>]
+
+where entities_file holds Freebase ids (e.g., /m/02_286) in the first column (e.g., the KB snapshot file).
+
+@author: Faegheh Hasibi
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from bisect import bisect_left
+
+import numpy
+from nordlys.entity.freebase.facc_indexer import get_anns_files, parse_anns_file
+from nordlys.retrieval.mem_index import StringArray, load_array, intersect_sorted
+
+# entity ids of the workers (set by _init_worker)
+_entity_ids = None
+
+
+def _init_worker(entities):
+    global _entity_ids
+    _entity_ids = dict((en_id, i) for i, en_id in enumerate(entities))
+
+
+def _parse_file(anns_file):
+    """
+    Returns the postings of an annotation file: number of documents, and (entity, doc) pairs sorted by doc,
+    where docs are numbered from 0 within the file.
+    """
+    file_dict = parse_anns_file(anns_file)
+    ens, docs = [], []
+    for doc, en_list in enumerate(file_dict.itervalues()):
+        for en_id in set(en_list):
+            if en_id in _entity_ids:
+                ens.append(_entity_ids[en_id])
+                docs.append(doc)
+    return len(file_dict), numpy.array(ens, dtype=numpy.int32), numpy.array(docs, dtype=numpy.int32)
+
+
+class FaccPostings(object):
+    """Entity postings (FACC document numbers) of a set of entities."""
+
+    META_FILE = "meta.json"
+
+    def __init__(self, entities, ptr, docs, num_docs):
+        """
+        :param entities: StringArray of entity ids (sorted)
+        :param ptr: postings offsets (len(entities) + 1)
+        :param docs: document numbers
+        :param num_docs: number of documents in the collection
+        """
+        self.entities = entities
+        self.ptr = ptr
+        self.docs = docs
+        self.num_docs = num_docs
+
+    @staticmethod
+    def build(folder, entities, num_workers=4):
+        """
+        Builds postings from the FACC annotation files.
+
+        :param folder: FACC folder
+        :param entities: collection of entity ids (Freebase ids)
+        :param num_workers: number of processes parsing the files
+        """
+        s_t = time.time()
+        entities = sorted(set(entities))
+        anns_files = get_anns_files(folder)
+        print str(len(anns_files)) + " files, " + str(len(entities)) + " entities"
+
+        # documents are numbered in the order the files are parsed; as these numbers are increasing, the (stable)
+        # sorting by entity gives the postings sorted by document
+        pool = multiprocessing.Pool(num_workers, _init_worker, (entities,))
+        en_chunks, doc_chunks = [], []
+        num_docs = 0
+        for i, (n, ens, docs) in enumerate(pool.imap_unordered(_parse_file, anns_files, chunksize=4)):
+            en_chunks.append(ens)
+            doc_chunks.append(docs + num_docs)
+            num_docs += n
+            if (i + 1) % 100 == 0:
+                elapsed = time.time() - s_t
+                print str(i + 1) + " files parsed (" + str(round((i + 1) / elapsed, 1)) + " files/sec, " + \
+                    str(int(num_docs / elapsed)) + " docs/sec)"
+        pool.close()
+        pool.join()
+
+        ens = numpy.concatenate(en_chunks) if len(en_chunks) > 0 else numpy.zeros(0, dtype=numpy.int32)
+        docs = numpy.concatenate(doc_chunks) if len(doc_chunks) > 0 else numpy.zeros(0, dtype=numpy.int32)
+        order = numpy.argsort(ens, kind="mergesort")
+        ptr = numpy.zeros(len(entities) + 1, dtype=numpy.int64)
+        ptr[1:] = numpy.cumsum(numpy.bincount(ens, minlength=len(entities)))
+        print "Postings built: " + str(num_docs) + " documents, " + str(len(docs)) + " postings (" + \
+            str(round(time.time() - s_t, 1)) + " sec)"
+        return FaccPostings(StringArray.build(entities), ptr, docs[order], num_docs)
+
+    def save(self, postings_dir):
+        if not os.path.exists(postings_dir):
+            os.makedirs(postings_dir)
+        self.entities.save(postings_dir + "/entities")
+        numpy.save(postings_dir + "/ptr.npy", self.ptr)
+        numpy.save(postings_dir + "/docs.npy", self.docs)
+        json.dump({'num_docs': self.num_docs, 'num_entities': len(self.entities)},
+                  open(postings_dir + "/" + self.META_FILE, "w"))
+
+    @staticmethod
+    def load(postings_dir, mmap_mode="r"):
+        """
+        Loads postings.
+
+        :param mmap_mode: numpy mmap mode; None reads the arrays into memory
+        """
+        meta = json.load(open(postings_dir + "/" + FaccPostings.META_FILE))
+        return FaccPostings(StringArray.load(postings_dir + "/entities", mmap_mode),
+                            load_array(postings_dir + "/ptr.npy", mmap_mode),
+                            load_array(postings_dir + "/docs.npy", mmap_mode), meta['num_docs'])
+
+    def __get_entity_index(self, en_id):
+        i = bisect_left(self.entities, en_id)
+        if i < len(self.entities) and self.entities[i] == en_id:
+            return i
+        return None
+
+    def contains(self, en_id):
+        return self.__get_entity_index(en_id) is not None
+
+    def get_postings(self, en_id):
+        """Returns sorted document numbers of the entity, or None if the entity is not covered by the postings."""
+        i = self.__get_entity_index(en_id)
+        if i is None:
+            return None
+        return self.docs[self.ptr[i]:self.ptr[i + 1]]
+
+    def __get_postings_list(self, en_ids):
+        postings = []
+        for en_id in set(en_ids):
+            docs = self.get_postings(en_id)
+            if docs is None:
+                return None
+            postings.append(docs)
+        return postings
+
+    def get_and_count(self, en_ids):
+        """Returns number of documents annotated with all the entities, or None if any entity is not covered."""
+        postings = self.__get_postings_list(en_ids)
+        if postings is None or len(postings) == 0:
+            return None if postings is None else 0
+        postings.sort(key=len)
+        docs = postings[0]
+        for p in postings[1:]:
+            if len(docs) == 0:
+                break
+            docs = intersect_sorted(docs, p)
+        return len(docs)
+
+    def get_or_count(self, en_ids):
+        """Returns number of documents annotated with any of the entities, or None if any entity is not covered."""
+        postings = self.__get_postings_list(en_ids)
+        if postings is None or len(postings) == 0:
+            return None if postings is None else 0
+        if len(postings) == 1:
+            return len(postings[0])
+        if len(postings) == 2:
+            return len(postings[0]) + len(postings[1]) - len(intersect_sorted(postings[0], postings[1]))
+        return len(numpy.unique(numpy.concatenate(postings)))
+
+
+def load_entities(entities_file):
+    """Reads entity ids from the first column of a tab separated file."""
+    entities = []
+    with open(entities_file) as f:
+        for line in f:
+            cols = line.strip().split("\t")
+            if cols[0] != "":
+                entities.append(cols[0])
+    return entities
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("facc_folder", help="FACC annotations folder", type=str)
+    parser.add_argument("postings_dir", help="output directory", type=str)
+    parser.add_argument("-e", "--entities", help="file with Freebase ids in the first column (e.g., KB snapshot)",
+                        type=str, required=True)
+    parser.add_argument("-w", "--workers", help="number of worker processes", type=int, default=4)
+    args = parser.parse_args()
+
+    postings = FaccPostings.build(args.facc_folder, load_entities(args.entities), args.workers)
+    postings.save(args.postings_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+MinHash (bottom-k) sketches of the FACC document sets of entities, for estimating co-occurrence counts in constant time.
+
+- Documents are hashed to 64 bit values; the sketch of an entity holds the k smallest hash values of its documents
+- Sketches are stored in CSR format (entities with less than k documents have shorter, exact sketches)
+- For a set of entities, the k smallest values of the union of the sketches are a sample of the union of the document
+  sets: the union is estimated from the k-th smallest value and the intersection from the fraction of sampled values
+  contained in all sketches (both are exact if the entities have less than k documents in total)
+
+Building sketches from FACC postings (see facc_postings.py):
+    python -m nordlys.entity.freebase.facc_sketches build <postings_dir> <sketches_dir> [-k <sketch_size>]
+
+Accuracy of the estimated features against exact counts, on the entity sets of the ground truth query sets:
+    python -m nordlys.entity.freebase.facc_sketches report <sketches_dir> -i <facc_index> [-p <postings_dir>]
+
+@author: Faegheh Hasibi
+"""
+
+import argparse
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy
+from nordlys.retrieval.mem_index import StringArray, load_array
+
+HASH_MAX = 2.0 ** 64
+
+
+def hash_docs(docs):
+    """Returns 64 bit hash values (splitmix64) of document numbers."""
+    x = docs.astype(numpy.uint64) + numpy.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> numpy.uint64(30))) * numpy.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> numpy.uint64(27))) * numpy.uint64(0x94D049BB133111EB)
+    return x ^ (x >> numpy.uint64(31))
+
+
+class FaccSketches(object):
+    """Bottom-k MinHash sketches of entities."""
+
+    META_FILE = "meta.json"
+
+    def __init__(self, entities, df, ptr, hashes, k):
+        """
+        :param entities: StringArray of entity ids (sorted)
+        :param df: document frequency of entities
+        :param ptr: sketch offsets (len(entities) + 1)
+        :param hashes: sketches; sketch of entity i is hashes[ptr[i]:ptr[i+1]] (sorted)
+        :param k: sketch size
+        """
+        self.entities = entities
+        self.df = df
+        self.ptr = ptr
+        self.hashes = hashes
+        self.k = k
+
+    @staticmethod
+    def build(facc_postings, k=256):
+        """
+        Builds sketches for all entities of the postings.
+
+        :param facc_postings: FaccPostings object
+        :param k: sketch size
+        """
+        s_t = time.time()
+        n = len(facc_postings.entities)
+        df = numpy.diff(facc_postings.ptr).astype(numpy.int64)
+        ptr = numpy.zeros(n + 1, dtype=numpy.int64)
+        ptr[1:] = numpy.cumsum(numpy.minimum(df, k))
+        hashes = numpy.zeros(ptr[-1], dtype=numpy.uint64)
+        for i in xrange(n):
+            h = hash_docs(facc_postings.docs[facc_postings.ptr[i]:facc_postings.ptr[i + 1]])
+            if len(h) > k:
+                h = numpy.partition(h, k - 1)[:k]
+            h.sort()
+            hashes[ptr[i]:ptr[i + 1]] = h
+            if (i + 1) % 100000 == 0:
+                print str((i + 1) // 1000) + "K sketches built"
+        print "Sketches built: " + str(n) + " entities, k=" + str(k) + " (" + str(round(time.time() - s_t, 1)) + " sec)"
+        return FaccSketches(facc_postings.entities, df, ptr, hashes, k)
+
+    def save(self, sketches_dir):
+        if not os.path.exists(sketches_dir):
+            os.makedirs(sketches_dir)
+        self.entities.save(sketches_dir + "/entities")
+        numpy.save(sketches_dir + "/df.npy", self.df)
+        numpy.save(sketches_dir + "/ptr.npy", self.ptr)
+        numpy.save(sketches_dir + "/hashes.npy", self.hashes)
+        json.dump({'k': self.k, 'num_entities': len(self.entities)}, open(sketches_dir + "/" + self.META_FILE, "w"))
+
+    @staticmethod
+    def load(sketches_dir, mmap_mode="r"):
+        """
+        Loads sketches.
+
+        :param mmap_mode: numpy mmap mode; None reads the arrays into memory
+        """
+        meta = json.load(open(sketches_dir + "/" + FaccSketches.META_FILE))
+        return FaccSketches(StringArray.load(sketches_dir + "/entities", mmap_mode),
+                            load_array(sketches_dir + "/df.npy", mmap_mode),
+                            load_array(sketches_dir + "/ptr.npy", mmap_mode),
+                            load_array(sketches_dir + "/hashes.npy", mmap_mode), meta['k'])
+
+    def __get_entity_index(self, en_id):
+        i = bisect_left(self.entities, en_id)
+        if i < len(self.entities) and self.entities[i] == en_id:
+            return i
+        return None
+
+    def estimate(self, en_ids):
+        """
+        Estimates "and" and "or" counts of a set of entities.
+
+        :param en_ids: entity ids
+        :return: (and count, or count), or None if any of the entities has no sketch
+        """
+        idx = []
+        for en_id in set(en_ids):
+            i = self.__get_entity_index(en_id)
+            if i is None:
+                return None
+            idx.append(i)
+        if len(idx) == 0:
+            return 0, 0
+        dfs = [int(self.df[i]) for i in idx]
+        if len(idx) == 1:
+            return dfs[0], dfs[0]
+
+        sketches = [self.hashes[self.ptr[i]:self.ptr[i + 1]] for i in idx]
+        union = numpy.unique(numpy.concatenate(sketches))[:self.k]
+        in_all = numpy.ones(len(union), dtype=bool)
+        for sketch in sketches:
+            in_all &= numpy.in1d(union, sketch, assume_unique=True)
+        num_common = int(numpy.count_nonzero(in_all))
+        if len(union) < self.k:  # all documents are in the sketches
+            return num_common, len(union)
+
+        or_count = max((self.k - 1) / (float(union[-1]) / HASH_MAX), max(dfs))
+        and_count = min(num_common / float(self.k) * or_count, min(dfs))
+        return and_count, or_count
+
+    def get_and_count(self, en_ids):
+        """Returns estimated "and" count, or None if any of the entities has no sketch."""
+        counts = self.estimate(en_ids)
+        return None if counts is None else counts[0]
+
+    def get_or_count(self, en_ids):
+        """Returns estimated "or" count, or None if any of the entities has no sketch."""
+        counts = self.estimate(en_ids)
+        return None if counts is None else counts[1]
+
+
+def load_gt_sets():
+    """
+    Returns entity sets of the ground truth query sets (Y-ERD and ERD TREC): annotated interpretation sets and
+    the set of all annotated entities of a query.
+
+    :return: list of sets of Freebase ids
+    """
+    from nordlys.erd.groundtruth import config
+    sets = defaultdict(set)
+    # qid, set_id, fb_id, mention, label
+    with open(config.ERD_ANNOTATION) as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) > 2 and cols[2].startswith("/m/"):
+                sets[("erd", cols[0], cols[1])].add(cols[2])
+                sets[("erd", cols[0], None)].add(cols[2])
+    # difficulty, qid, query, mention, entity, set_id, freebase_id
+    with open(config.YSQLE_ERD) as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) > 6 and cols[6].startswith("/m/"):
+                sets[("yerd", cols[1], cols[5])].add(cols[6])
+                sets[("yerd", cols[1], None)].add(cols[6])
+    return [en_set for en_set in set(frozenset(s) for s in sets.values()) if len(en_set) > 1]
+
+
+def report(facc_sketches, facc_lucene, facc_postings=None):
+    """
+    Prints the error of estimated FACC features (computed with sketches) against the exact ones.
+
+    :param facc_sketches: FaccSketches object
+    :param facc_lucene: FACC index
+    :param facc_postings: FaccPostings object (exact counts are computed from the postings if given)
+    """
+    from nordlys.erd.features.facc_feat import FACCFeat
+    features = ["jc", "mw_rel", "joint_prob", "entropy"]
+    exact = FACCFeat(facc_lucene, facc_postings)
+    approx = FACCFeat(facc_lucene, facc_postings, facc_sketches=facc_sketches, sketch_min_size=2)
+
+    # errors[size group][feature]: list of absolute errors
+    errors = defaultdict(lambda: defaultdict(list))
+    times = {'exact': 0.0, 'approx': 0.0}
+    en_sets = load_gt_sets()
+    for en_set in en_sets:
+        fb_ids = list(en_set)
+        if facc_sketches.estimate(fb_ids) is None:
+            continue
+        group = str(len(fb_ids)) if len(fb_ids) < 4 else "4+"
+        values = {}
+        for name, facc_feat in [('exact', exact), ('approx', approx)]:
+            s_t = time.time()
+            values[name] = [getattr(facc_feat, f)(fb_ids) for f in features]
+            times[name] += time.time() - s_t
+        for f, v_exact, v_approx in zip(features, values['exact'], values['approx']):
+            errors[group][f].append(abs(v_exact - v_approx))
+            errors["all"][f].append(abs(v_exact - v_approx))
+
+    print "Sketch size: " + str(facc_sketches.k) + ", entity sets: " + str(len(errors["all"]["jc"])) + \
+        " (of " + str(len(en_sets)) + ")"
+    print "Mean (max) absolute error:"
+    print "size\t#sets\t" + "\t".join(features)
+    for group in sorted(errors.keys()):
+        row = [group, str(len(errors[group]["jc"]))]
+        for f in features:
+            errs = errors[group][f]
+            row.append("%.4f (%.4f)" % (sum(errs) / len(errs), max(errs)))
+        print "\t".join(row)
+    print "Time (sec): exact " + str(round(times['exact'], 3)) + ", approx " + str(round(times['approx'], 3))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    build_parser = subparsers.add_parser("build", help="build sketches from FACC postings")
+    build_parser.add_argument("postings_dir", help="FACC postings directory", type=str)
+    build_parser.add_argument("sketches_dir", help="output directory", type=str)
+    build_parser.add_argument("-k", "--size", help="sketch size", type=int, default=256)
+    report_parser = subparsers.add_parser("report", help="accuracy report on the ground truth entity sets")
+    report_parser.add_argument("sketches_dir", help="sketches directory", type=str)
+    report_parser.add_argument("-i", "--index", help="FACC index directory", type=str, required=True)
+    report_parser.add_argument("-p", "--postings", help="FACC postings directory (for exact counts)", type=str)
+    args = parser.parse_args()
+
+    from nordlys.entity.freebase.facc_postings import FaccPostings
+    if args.command == "build":
+        FaccSketches.build(FaccPostings.load(args.postings_dir), args.size).save(args.sketches_dir)
+    elif args.command == "report":
+        from nordlys.retrieval.index_cache import IndexCache
+        facc_postings = FaccPostings.load(args.postings) if args.postings is not None else None
+        report(FaccSketches.load(args.sketches_dir), IndexCache(args.index), facc_postings)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,6 @@ ERD application:
 """
 import argparse
 import json
-import pickle
 from datetime import datetime
 
 from nordlys.erd import econfig
@@ -22,6 +21,7 @@ from nordlys.erd.cer.ranker_ltr import RankerLTR
 from nordlys.erd.isf.set_generator import SetGen
 from nordlys.erd.isf.set_detector import SetDetect
 from nordlys.erd.groundtruth import erd_gt, ysqle_erd_gt
+from nordlys.ml.tree_ensemble import load_model
 
 
 class ERD(object):
@@ -51,18 +51,18 @@ class ERD(object):
         ranker = None
         if args.weights is not None:
             weights = args.weights.replace(" ", "").split(',')
-            ranker = RankerMLM([float(x) for x in weights], commonness_th=args.commonness, sf_source=args.sfsource, filter=True)
+            ranker = RankerMLM([float(x) for x in weights], commonness_th=args.commonness, sf_source=args.sfsource,
+                               filter=True, max_candidates=args.maxcandidates)
         elif args.cermodel is not None:
-            model = open(args.cermodel, "r").read()
-            ranker = RankerLTR(model=pickle.loads(model), commonness_th=args.commonness, sf_source=args.sfsource, filter=True)
+            ranker = RankerLTR(model=load_model(args.cermodel), commonness_th=args.commonness, sf_source=args.sfsource,
+                               filter=True, max_candidates=args.maxcandidates)
         return ranker
 
     @classmethod
     def load_classifier(cls, args):
         """ Loads the classifier for set detection. """
         if args.isfmodel is not None:
-            model = open(args.isfmodel, "r").read()
-            return SetDetect(model=pickle.loads(model))
+            return SetDetect(model=load_model(args.isfmodel))
         else:
             return None
 
@@ -91,6 +91,9 @@ class ERD(object):
             return tagme.process_query()
 
         # ====== CER step ======
+        econfig.LUCENE.maybe_refresh()
+        if econfig.FACC_LUCENE.maybe_refresh():
+            econfig.FACC_FEAT.clear_cache()
         query = Query(q_id, q_content)
         if self.args.weights is not None:
             q_inss = self.ranker.rank_query(query, self.args.cmn)
@@ -132,6 +135,10 @@ class ERD(object):
         total_time += diff.total_seconds()
         time_log = "Execution time(min):\t" + str(round(total_time/60, 4)) + "\n"
         time_log += "Avg. time per query:\t" + str(round(total_time/len(queries), 4)) + "\n"
+        if (self.ranker is not None) and (self.ranker.max_candidates is not None):
+            time_log += "Candidates dropped:\t" + str(self.ranker.cap_stats['dropped']) + " of " + \
+                        str(self.ranker.cap_stats['candidates']) + " (max. " + str(self.ranker.max_candidates) + \
+                        " per mention)\n"
         print time_log
         if time_log_file is not None:
             open(time_log_file, 'w').write(time_log)
@@ -191,11 +198,14 @@ def read_args():
     parser.add_argument("-c", "--commonness", help="Commonness threshold", type=float)
     parser.add_argument("-k", help="top-K entities to be considered from CER step", type=float)
     parser.add_argument("-w", "--weights", help="MLM weights", type=str)
-    parser.add_argument("-cm", "--cermodel", help="Trained model file for CER step", type=str)
-    parser.add_argument("-im", "--isfmodel", help="Trained model file for ISF step", type=str)
+    parser.add_argument("-cm", "--cermodel", help="Trained model file for CER step (pickle or .npz)", type=str)
+    parser.add_argument("-im", "--isfmodel", help="Trained model file for ISF step (pickle or .npz)", type=str)
     parser.add_argument("-runid", help="Run id", type=str)
     parser.add_argument("-cmn", help="MLM-cmn method for entity ranking", action="store_true", default=False)
     parser.add_argument("-sfs", "--sfsource", help="Surface form sources", choices=['facc', 'wiki'])
+    parser.add_argument("-maxc", "--maxcandidates", help="Max. number of candidate entities per mention", type=int)
+    parser.add_argument("-warmup", help="Read the indices into the page cache before processing queries",
+                        action="store_true", default=False)
 
     parser.add_argument("-tagmeapi", help="TagMe API results", action="store_true", default=False)
     parser.add_argument("-tagme", help="TagMe baseline", action="store_true", default=False)
@@ -220,6 +230,8 @@ def read_args():
 
 
 def take_action(args):
+    if args.warmup or econfig.WARM_UP:
+        econfig.warm_up()
     erd = ERD(args)
     # Processing single query
     if args.query is not None:
@@ -244,6 +256,7 @@ def take_action(args):
 def __gen_run_id(args):
     run_id = args.data + "-c" + str(args.commonness)
     run_id += "-" + args.sfsource if args.sfsource is not None else ""
+    run_id += "-maxc" + str(args.maxcandidates) if args.maxcandidates is not None else ""
 
     cmn_str = "cmn-" if args.cmn else ""
     if args.weights is not None:
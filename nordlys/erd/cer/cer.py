@@ -32,6 +32,7 @@ def read_args():
     parser.add_argument("-in", "--input", help="Input file from previous step", type=str)
     parser.add_argument("-unf", "--filter", help="Do not perform filtering", action="store_false", default=True)
     parser.add_argument("-sfs", "--sfsource", help="Surface form sources", choices=['facc', 'wiki'])
+    parser.add_argument("-maxc", "--maxcandidates", help="Max. number of candidate entities per mention", type=int)
 
     # mlm parameters
     parser.add_argument("-mlm", help="MLM method for entity ranking", action="store_true", default=False)
@@ -40,7 +41,7 @@ def read_args():
 
     # ltr parameters
     parser.add_argument("-ltr", help="LTR method for entity ranking", action="store_true", default=False)
-    parser.add_argument("-model", help="Trained model file", type=str)
+    parser.add_argument("-model", help="Trained model file (pickle or .npz)", type=str)
     parser.add_argument("-tree", help="Number of trees", type=int)
     parser.add_argument("-depth", help="Depth of tress (used for GBRT)", type=int)
     parser.add_argument("-maxfeat", help="Max features (used for RF)", type=int)
@@ -48,6 +49,14 @@ def read_args():
     parser.add_argument("-cv", help="Cross validation for the given instances", action="store_true", default=False)
     parser.add_argument("-f", "--folds", help="Number of folds", type=int)
     parser.add_argument("-genfolds", help="Cross validation for the given instances", action="store_true", default=False)
+    parser.add_argument("-prof", "--profile", help="Profile feature costs on the given number of train instances",
+                        type=int)
+    parser.add_argument("-cascade", help="Train/cross validate the first stage model of the cascade",
+                        action="store_true", default=False)
+    parser.add_argument("-cmodel", help="Trained cascade model file (first stage)", type=str)
+    parser.add_argument("-topn", help="Number of candidates kept by the cascade", type=int, default=20)
+    parser.add_argument("-topnby", help="Candidates are kept per query or per mention", choices=['query', 'mention'],
+                        default="query")
 
     args = parser.parse_args()
 
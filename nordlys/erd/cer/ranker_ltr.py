@@ -3,21 +3,51 @@ Uses Learning to Rank  to rank entities
 @author: Faegheh Hasibi
 """
 from datetime import datetime
-import pickle
 
 
 from nordlys.erd.features.query_sim_feat import QuerySimFeat
 from nordlys.ml.cross_validation import CrossValidation
 from nordlys.erd.features.entity_feat import EntityFeat
+from nordlys.erd.features.feature_profiler import FeatureProfiler
+from nordlys.erd.features.feature_registry import FeatureRegistry, COST_GIVEN, COST_MEMORY, COST_MONGO, COST_LUCENE
 from nordlys.erd.features.mention_feat import MentionFeat
 from nordlys.erd.features.entity_mention_feat import EntityMentionFeat
 from nordlys.erd import econfig
 from nordlys.erd.groundtruth import erd_gt, ysqle_erd_gt, ysqle_gt
 from nordlys.erd.query.query import Query
 from nordlys.erd.ml.cer_instances import CERInstances, CERInstance
+from nordlys.erd.ml.feature_pool import extract_features
 from nordlys.ml.ml import ML
+from nordlys.ml.tree_ensemble import load_model
 from nordlys.retrieval.lucene_tools import Lucene
 
+# fields of the LM features: {feature name (without the m/q prefix): field}
+LM_FIELDS = {'title': econfig.TITLE, 'sAbs': econfig.SHORT_ABS, 'lAbs': econfig.LONG_ABS,
+             'links': econfig.WIKILINKS, 'cats': econfig.CATEGORIES, 'catchall': Lucene.FIELDNAME_CONTENTS}
+
+# CER features: group, cost and dependencies (backend resources)
+CER_FEATURES = FeatureRegistry()
+for name in ["len", "len_ratio"]:
+    CER_FEATURES.register(name, "mention", COST_MEMORY)
+for name in ["ntem", "smil"]:
+    CER_FEATURES.register(name, "mention", COST_MONGO, ["surface_forms"])
+CER_FEATURES.register("matches", "matches", COST_MONGO, ["surface_forms"])
+CER_FEATURES.register("commonness", "commonness", COST_GIVEN)
+for name in ["redirects", "links"]:
+    CER_FEATURES.register(name, "entity", COST_MONGO, ["entity"])
+for name in ["mct", "tcm", "tem", "pos1"]:
+    CER_FEATURES.register(name, "entity_mention", COST_MONGO, ["entity"])
+for name in ["qct", "tcq", "teq"]:
+    CER_FEATURES.register(name, "entity_query", COST_MONGO, ["entity"])
+CER_FEATURES.register("mlm-tc", "entity_query", COST_LUCENE, ["term_vectors", "collection_stats"])
+for name in LM_FIELDS:
+    CER_FEATURES.register("m" + name, "entity_mention", COST_LUCENE, ["term_vectors", "collection_stats"])
+    CER_FEATURES.register("q" + name, "entity_query", COST_LUCENE, ["term_vectors", "collection_stats"])
+
+# cheap features used in the first stage of the cascade (see rank_query); the cascade model is trained on these only
+CASCADE_FEATURES = ["commonness", "matches", "len", "redirects", "links"]
+CASCADE_CONFIG = {'model': "gbrt", 'parameters': {'tree': 100, 'depth': 3}}
+
 
 class RankerLTR(object):
     """
@@ -26,14 +56,35 @@ class RankerLTR(object):
         depth: int, depth of the trees
         alpha: float, learning rate
         model: the trained model
+        features: features computed for ranking queries; only the features used by the model (if model_features),
+            all features if None
+        cascade_model: model of the first stage of the cascade, trained on CASCADE_FEATURES (no cascade if None)
+        cascade_top_n: number of candidates kept by the first stage (per query or per mention)
+        cascade_by: "query" or "mention"
+        max_candidates: maximum number of candidate entities per mention (no limit if None)
+        cap_stats: number of candidates and candidates dropped by max_candidates (over all ranked queries)
     """
-    def __init__(self, commonness_th=None, sf_source=None, filter=True, model=None, config={}):
+    def __init__(self, commonness_th=None, sf_source=None, filter=True, model=None, config={}, model_features=True,
+                 cascade_model=None, cascade_top_n=20, cascade_by="query", max_candidates=None):
         self.commonness_th = commonness_th
         self.sf_source = sf_source
         self.filter = filter
         self.config = config
         self.model = model
         self.ml = ML(config) #if config is not None else None
+        self.features = None
+        if model is not None and model_features:
+            self.features = CER_FEATURES.get_model_features(model)
+            if self.features is None:
+                print "All features are computed"
+            else:
+                print "Features used by the model: " + str(len(self.features)) + " of " + \
+                      str(len(CER_FEATURES.names()))
+        self.cascade_model = cascade_model
+        self.cascade_top_n = cascade_top_n
+        self.cascade_by = cascade_by
+        self.max_candidates = max_candidates
+        self.cap_stats = {'candidates': 0, 'dropped': 0}
 
     def train(self, inss, model_file=None, feat_imp_file=None):
         """
@@ -125,6 +176,9 @@ class RankerLTR(object):
         total_time += diff.total_seconds()
         time_log = "Execution time(min):\t" + str(round(total_time/60, 4)) + "\n"
         time_log += "Avg. time per query:\t" + str(round(total_time/len(queries), 4)) + "\n"
+        if self.max_candidates is not None:
+            time_log += "Candidates dropped:\t" + str(self.cap_stats['dropped']) + " of " + \
+                        str(self.cap_stats['candidates']) + " (max. " + str(self.max_candidates) + " per mention)\n"
         print time_log
         # open(time_log_file + ".timelog", "w").write(time_log)
         # print "Time log:\t" + time_log_file + ".timelog"
@@ -137,68 +191,277 @@ class RankerLTR(object):
         :param query: query.Query
         :return erd.ml.CERInstances
         """
-        q_inss = CERInstances.gen_instances(query, self.commonness_th, sf_source=self.sf_source, filter=self.filter)
-        RankerLTR.add_features(q_inss, self.commonness_th, self.sf_source)
+        q_inss = CERInstances.gen_instances(query, self.commonness_th, sf_source=self.sf_source, filter=self.filter,
+                                            max_candidates=self.max_candidates)
+        for key in self.cap_stats:
+            self.cap_stats[key] += query.cap_stats[key]
+        if self.cascade_model is None:
+            RankerLTR.add_features(q_inss, self.commonness_th, self.sf_source, features=self.features)
+        else:
+            q_inss = self.__cascade(q_inss)
+            # features of the first stage are kept; only the missing ones are computed
+            features = set(self.features if self.features is not None else CER_FEATURES.names())
+            cheap_ftrs = dict((ins.id, ins.features) for ins in q_inss.get_all())
+            RankerLTR.add_features(q_inss, self.commonness_th, self.sf_source,
+                                   features=features - set(CASCADE_FEATURES))
+            for ins in q_inss.get_all():
+                ins.features.update(cheap_ftrs[ins.id])
         self.rank_inss(q_inss)
         return q_inss
 
+    def __cascade(self, q_inss):
+        """
+        First stage of the cascade: scores the candidates with the cheap features and keeps the top ones.
+
+        :param q_inss: erd.ml.CERInstances
+        :return erd.ml.CERInstances, the top candidates (with the cheap features)
+        """
+        RankerLTR.add_features(q_inss, self.commonness_th, self.sf_source, features=CASCADE_FEATURES)
+        for ins in q_inss.get_all():
+            ins.features = dict((name, ins.features[name]) for name in CASCADE_FEATURES)
+        self.ml.apply_model(q_inss, self.cascade_model)
+        top_inss = RankerLTR.select_top(q_inss, self.cascade_top_n, self.cascade_by)
+        print "Cascade: " + str(len(top_inss.get_all())) + " of " + str(len(q_inss.get_all())) + " candidates kept"
+        return top_inss
+
+    @staticmethod
+    def __cascade_group(ins, by):
+        return ins.q_id if by == "query" else (ins.q_id, ins.mention)
+
+    @staticmethod
+    def select_top(inss, n, by="query"):
+        """
+        Selects the top-n scored instances per query or per mention.
+
+        :param inss: erd.ml.CERInstances, scored instances
+        :param by: "query" or "mention"
+        :return erd.ml.CERInstances
+        """
+        groups = {}
+        for ins in inss.get_all():
+            groups.setdefault(RankerLTR.__cascade_group(ins, by), []).append(ins)
+        top_inss = CERInstances(None)
+        for group in groups.values():
+            for ins in sorted(group, key=lambda x: (-x.score, x.id))[:n]:
+                top_inss.add_instance(ins)
+        return top_inss
+
+    @staticmethod
+    def cascade_instances(inss):
+        """Returns copies of the instances with only the cheap features (for training the cascade model)."""
+        cheap_inss = CERInstances(None)
+        for ins in inss.get_all():
+            features = dict((name, ins.features[name]) for name in CASCADE_FEATURES)
+            cheap_inss.add_instance(CERInstance(ins.id, features, ins.target, dict(ins.properties)))
+        return cheap_inss
+
+    @staticmethod
+    def cascade_recall(inss, ns=(5, 10, 20, 50, 100), by="query"):
+        """
+        Recall@N report of the cascade: fraction of the relevant instances kept by the first stage.
+
+        :param inss: erd.ml.CERInstances, instances scored by the cascade model (with targets)
+        :param ns: values of N
+        :param by: "query" or "mention"
+        :return report string
+        """
+        groups = {}
+        for ins in inss.get_all():
+            groups.setdefault(RankerLTR.__cascade_group(ins, by), []).append(ins)
+        num_rel = sum(1 for ins in inss.get_all() if str(ins.target) == "1")
+        report = "=========== Cascade recall@N (per " + by + ") ===========\n"
+        report += "#groups: " + str(len(groups)) + ", #candidates: " + str(len(inss.get_all())) + \
+                  ", #relevant: " + str(num_rel) + "\n"
+        report += "N\trecall\tavg. kept\n"
+        for n in ns:
+            kept, kept_rel = 0, 0
+            for group in groups.values():
+                top = sorted(group, key=lambda x: (-x.score, x.id))[:n]
+                kept += len(top)
+                kept_rel += sum(1 for ins in top if str(ins.target) == "1")
+            recall = float(kept_rel) / num_rel if num_rel > 0 else 0
+            avg_kept = float(kept) / max(len(groups), 1)
+            report += str(n) + "\t" + str(round(recall, 4)) + "\t" + str(round(avg_kept, 2)) + "\n"
+        report += "=================================================="
+        return report
+
     @staticmethod
-    def add_features(inss, commonness_th, sf_source):
+    def add_features(inss, commonness_th, sf_source, num_workers=1, features=None):
+        """
+        Adds features to the instances.
+
+        :param num_workers: number of worker processes; for more than one worker, queries are processed in parallel
+        :param features: names of the features to be computed; others get default values (all features if None)
+        """
         print "Extracting features ..."
+        if num_workers > 1:
+            params = {'commonness_th': commonness_th, 'sf_source': sf_source, 'features': features}
+            return extract_features(inss, "cer", params, num_workers)
+        s_t = datetime.now()
+        # feature groups shared by instances (e.g., the same entity for several mentions) are computed only once
+        cache = {}
+        q_ids = set()
         i = 0
         for ins in inss.get_all():
-            ins.features = RankerLTR.get_features(ins, commonness_th, sf_source)
+            ins.features = RankerLTR.get_features(ins, commonness_th, sf_source, cache, features)
+            q_ids.add(ins.q_id)
             i += 1
             if i % 1000.0 == 0:
                 print "Features are generated until instance " + str(ins.id)
+        total_time = (datetime.now() - s_t).total_seconds()
+        if len(q_ids) > 0:
+            print "Feature extraction time (sec):\t" + str(round(total_time, 4)) + " (" + \
+                  str(round(total_time / len(q_ids), 4)) + " per query)"
         return inss
 
     @staticmethod
-    def get_features(ins, commonness_th, sf_source):
+    def profile_features(inss, commonness_th, sf_source, num_inss=None):
+        """
+        Instrumentation mode of get_features: computes each feature separately (without caching) and records its
+        wall time and backend calls.
+
+        :param num_inss: number of instances to be profiled (all instances if None)
+        :return FeatureProfiler
+        """
+        print "Profiling features ..."
+        profiler = FeatureProfiler()
+        profiler.start()
+        try:
+            for ins in inss.get_all()[:num_inss]:
+                for name in CER_FEATURES.names():
+                    with profiler.measure(name):
+                        RankerLTR.get_features(ins, commonness_th, sf_source, features=[name])
+        finally:
+            profiler.stop()
+        return profiler
+
+    @staticmethod
+    def __get_group(cache, group, key, func):
+        """Returns features of the group for the given key; features are computed by func if not cached."""
+        if cache is None:
+            return func()
+        group_cache = cache.setdefault(group, {})
+        if key not in group_cache:
+            group_cache[key] = func()
+        return group_cache[key]
+
+    @staticmethod
+    def __mention_features(mention_ftr, q_content, names):
+        """ Features depending only on the mention (and the query it comes from). """
+        ftrs = {}
+        if 'len' in names:
+            ftrs['len'] = mention_ftr.mention_len()
+        if 'ntem' in names:
+            ftrs['ntem'] = mention_ftr.ntem()
+        if 'smil' in names:
+            ftrs['smil'] = mention_ftr.smil()
+        if 'len_ratio' in names:
+            ftrs['len_ratio'] = mention_ftr.len_ratio(Query.preprocess(q_content))
+        return ftrs
+
+    @staticmethod
+    def __entity_features(en_id, names):
+        """ Features depending only on the entity. """
+        ftrs = {}
+        en_ftr = EntityFeat(en_id, econfig.ENTITY_TABLE)
+        if 'redirects' in names:
+            ftrs['redirects'] = en_ftr.redirects()
+        if 'links' in names:
+            ftrs['links'] = en_ftr.links()
+        return ftrs
+
+    @staticmethod
+    def __entity_mention_features(en_id, mention, names):
+        """ Features of the entity-mention pair. """
+        ftrs = {}
+        if len(names & set(['mct', 'tcm', 'tem', 'pos1'])) > 0:
+            en_mention_ftr = EntityMentionFeat(en_id, mention, econfig.ENTITY_TABLE)
+            if 'mct' in names:
+                ftrs['mct'] = en_mention_ftr.mct()
+            if 'tcm' in names:
+                ftrs['tcm'] = en_mention_ftr.tcm()
+            if 'tem' in names:
+                ftrs['tem'] = en_mention_ftr.tem()
+            if 'pos1' in names:
+                ftrs['pos1'] = en_mention_ftr.pos1()
+        ftrs.update(RankerLTR.__lm_scores(en_id, mention, "m", names))
+        return ftrs
+
+    @staticmethod
+    def __entity_query_features(en_id, q_content, names):
+        """ Features of the entity-query pair. """
+        ftrs = {}
+        if len(names & set(['qct', 'tcq', 'teq'])) > 0:
+            en_query_ftr = EntityMentionFeat(en_id, q_content, econfig.ENTITY_TABLE)
+            if 'qct' in names:
+                ftrs['qct'] = en_query_ftr.mct()
+            if 'tcq' in names:
+                ftrs['tcq'] = en_query_ftr.tcm()
+            if 'teq' in names:
+                ftrs['teq'] = en_query_ftr.tem()
+        if 'mlm-tc' in names:
+            mlm_tc = QuerySimFeat(q_content).nllr_mlm_score(en_id, {'names': 0.2, 'contents': 0.8})  # mlm_score
+            ftrs['mlm-tc'] = mlm_tc if mlm_tc is not None else 0
+        ftrs.update(RankerLTR.__lm_scores(en_id, q_content, "q", names))
+        return ftrs
+
+    @staticmethod
+    def get_features(ins, commonness_th, sf_source, cache=None, features=None):
         """
         Concatenate all features.
+        Features are computed in groups: per mention, per entity, per entity-mention and per entity-query.
 
         :param ins: ml.Instance
+        :param cache: dictionary for caching feature groups (shared by the instances of add_features)
+        :param features: names of the features to be computed; others get default values (all features if None).
+                The same features should be used for all instances sharing the cache.
         """
-        all_ftrs = {}
+        groups = CER_FEATURES.get_groups(features)
+        all_ftrs = CER_FEATURES.get_defaults()
         # --- mention features ---
-        mention_ftr = MentionFeat(ins.mention, sf_source)
-        all_ftrs['len'] = mention_ftr.mention_len()
-        all_ftrs['ntem'] = mention_ftr.ntem()
-        all_ftrs['smil'] = mention_ftr.smil()
-        all_ftrs['matches'] = ins.matches if ins.matches is not None else mention_ftr.matches(commonness_th)
-        all_ftrs['len_ratio'] = mention_ftr.len_ratio(Query.preprocess(ins.q_content))
+        if "mention" in groups or ("matches" in groups and ins.matches is None):
+            mention_ftr = RankerLTR.__get_group(cache, "mention_ftr", ins.mention,
+                                                lambda: MentionFeat(ins.mention, sf_source))
+        if "mention" in groups:
+            all_ftrs.update(RankerLTR.__get_group(cache, "mention", (ins.mention, ins.q_content),
+                                                  lambda: RankerLTR.__mention_features(mention_ftr, ins.q_content,
+                                                                                       groups["mention"])))
+        if "matches" in groups:
+            if ins.matches is not None:
+                all_ftrs['matches'] = ins.matches
+            else:
+                all_ftrs['matches'] = RankerLTR.__get_group(cache, "matches", ins.mention,
+                                                            lambda: mention_ftr.matches(commonness_th))
         # --- entity features ---
-        en_ftr = EntityFeat(ins.en_id)
-        all_ftrs['redirects'] = en_ftr.redirects()
-        all_ftrs['links'] = en_ftr.links()
+        if "entity" in groups:
+            all_ftrs.update(RankerLTR.__get_group(cache, "entity", ins.en_id,
+                                                  lambda: RankerLTR.__entity_features(ins.en_id, groups["entity"])))
         # --- entity-mention features ---
-        en_mention_ftr = EntityMentionFeat(ins.en_id, ins.mention)
-        all_ftrs['commonness'] = ins.commonness
-        all_ftrs['mct'] = en_mention_ftr.mct()
-        all_ftrs['tcm'] = en_mention_ftr.tcm()
-        all_ftrs['tem'] = en_mention_ftr.tem()
-        all_ftrs['pos1'] = en_mention_ftr.pos1()
-        all_ftrs.update(RankerLTR.__lm_scores(ins.en_id, ins.mention, "m"))
+        if "commonness" in groups:
+            all_ftrs['commonness'] = ins.commonness
+        if "entity_mention" in groups:
+            all_ftrs.update(RankerLTR.__get_group(cache, "entity_mention", (ins.en_id, ins.mention),
+                                                  lambda: RankerLTR.__entity_mention_features(
+                                                      ins.en_id, ins.mention, groups["entity_mention"])))
         # --- entity-query features ---
-        en_query_ftr = EntityMentionFeat(ins.en_id, ins.q_content)
-        all_ftrs['qct'] = en_query_ftr.mct()
-        all_ftrs['tcq'] = en_query_ftr.tcm()
-        all_ftrs['teq'] = en_query_ftr.tem()
-        mlm_tc = QuerySimFeat(ins.q_content).nllr_mlm_score(ins.en_id, {'names': 0.2, 'contents': 0.8})  # mlm_score
-        all_ftrs['mlm-tc'] = mlm_tc if mlm_tc is not None else 0
-        all_ftrs.update(RankerLTR.__lm_scores(ins.en_id, ins.q_content, "q"))
+        if "entity_query" in groups:
+            all_ftrs.update(RankerLTR.__get_group(cache, "entity_query", (ins.en_id, ins.q_content),
+                                                  lambda: RankerLTR.__entity_query_features(
+                                                      ins.en_id, ins.q_content, groups["entity_query"])))
         return all_ftrs
 
     @staticmethod
-    def __lm_scores(en_id, txt, prefix):
-        """ Calculates all LM scores. """
-        feat_field_dict = {'title': econfig.TITLE, 'sAbs': econfig.SHORT_ABS, 'lAbs': econfig.LONG_ABS,
-                           'links': econfig.WIKILINKS, 'cats': econfig.CATEGORIES, 'catchall': Lucene.FIELDNAME_CONTENTS}
-        ftr_extractor = QuerySimFeat(txt)
+    def __lm_scores(en_id, txt, prefix, names):
+        """ Calculates LM scores of the required fields. """
+        feat_field_dict = dict((feature_name, field) for feature_name, field in LM_FIELDS.iteritems()
+                               if prefix + feature_name in names)
+        if len(feat_field_dict) == 0:
+            return {}
+        # term vectors of all fields are read at once
+        lm_scores = QuerySimFeat(txt).nllr_lm_scores(en_id, feat_field_dict.values())
         scores = dict()
         for feature_name, field in feat_field_dict.iteritems():
-            lm_score = ftr_extractor.nllr_lm_score(en_id, field)  # lm_score(en_id, field)
+            lm_score = lm_scores[field]
             scores[prefix + feature_name] = lm_score if lm_score is not None else 0
         return scores
 
@@ -206,9 +469,13 @@ class RankerLTR(object):
 def main(args):
     """
     Required args for training:         -train -cer -t <int> -l <int> -in <train_set_name.json>
+    Valid args for training:            -prof <num_instances> -c <commonness> (profiles feature costs)
     Required args for cross validation: -cv -cer -d <data_name> -c <commonness> -t <int> -l <int>
     Required args for ranking:          -rank -ltr -m <model_file>
     Valid args for ranking:             -d <data_name> -qid <str> -query <str> -c <commonness>
+                                        -cmodel <cascade_model_file> -topn <int> -topnby <query|mention>
+    Cascade (first stage) model:        -train -cascade -in <train_set_name.json>
+    Cascade recall@N:                   -cv -cascade -in <cv_set_name.json> -f <int> [-topnby <query|mention>]
     """
     settings_str = "-ltr-t" + str(args.tree)
     model_name = ""
@@ -225,7 +492,22 @@ def main(args):
     # ==== Train ====
     if args.train:
         train_inss = CERInstances.from_json(args.input)
+        train_inss.to_columnar()
         file_name = args.input[:args.input.rfind(".json")] + settings_str
+        if args.profile is not None:
+            profiler = RankerLTR.profile_features(train_inss, args.commonness, args.sfsource, args.profile)
+            profiler.save(file_name + "-feat_cost.json")
+            ml_config['feature_costs'] = file_name + "-feat_cost.json"
+        if args.cascade:
+            # first stage of the cascade: small model on cheap features
+            file_name = args.input[:args.input.rfind(".json")] + "-cascade"
+            cascade_inss = RankerLTR.cascade_instances(train_inss)
+            ranker_ltr = RankerLTR(config=dict(CASCADE_CONFIG))
+            model = ranker_ltr.train(cascade_inss, model_file=file_name + ".model",
+                                     feat_imp_file=file_name + "-feat_imp.txt")
+            ranker_ltr.rank_inss(cascade_inss, model)
+            print RankerLTR.cascade_recall(cascade_inss, by=args.topnby) + " (train set)"
+            return
         ranker_ltr = RankerLTR(config=ml_config)  # model_name, tree=args.tree, depth=args.depth, max_features=args.maxfeat)
         ranker_ltr.train(train_inss, model_file=file_name + ".model", feat_imp_file=file_name + "-feat_imp.txt")
 
@@ -233,6 +515,17 @@ def main(args):
     elif args.cv:
         in_file_name = args.input[:args.input.rfind(".json")]
         cv_inss = CERInstances.from_json(args.input)
+        cv_inss.to_columnar()
+        if args.cascade:
+            # recall of the first stage of the cascade
+            ranker_ltr = RankerLTR(config=dict(CASCADE_CONFIG))
+            ranked_inss = ranker_ltr.cross_validate(RankerLTR.cascade_instances(cv_inss), args.folds,
+                                                    folds_name=in_file_name + "-" + str(args.folds) + "f-folds.json",
+                                                    gen_folds=args.genfolds)
+            report = RankerLTR.cascade_recall(ranked_inss, by=args.topnby)
+            open(in_file_name + "-" + str(args.folds) + "f-cascade-recall.txt", "w").write(report)
+            print report
+            return
         ranker_ltr = RankerLTR(config=ml_config) # model_name, tree=args.tree, depth=args.depth, max_features=args.maxfeat)
         ranked_inss = ranker_ltr.cross_validate(cv_inss, args.folds,
                                                 folds_name=in_file_name + "-" + str(args.folds) + "f-folds.json",
@@ -246,8 +539,11 @@ def main(args):
     # ==== Rank ====
     elif args.rank:
         # loads model
-        model = pickle.loads(open(args.model, 'r').read())
-        ranker_ltr = RankerLTR(model=model, commonness_th=args.commonness, sf_source=args.sfsource, filter=args.filter)
+        model = load_model(args.model)
+        cascade_model = load_model(args.cmodel) if args.cmodel is not None else None
+        ranker_ltr = RankerLTR(model=model, commonness_th=args.commonness, sf_source=args.sfsource, filter=args.filter,
+                               cascade_model=cascade_model, cascade_top_n=args.topn, cascade_by=args.topnby,
+                               max_candidates=args.maxcandidates)
         settings_str = "-ltr"
         if args.model.rfind("-d") != -1:
             settings_str += args.model[args.model.rfind("-t"):args.model.rfind("-d")]
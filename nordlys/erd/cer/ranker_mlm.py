@@ -20,12 +20,16 @@ class RankerMLM(object):
         commonness_th: float, commonness threshold
         sf_source: surface form source
         filter: if True, filters entities not in the KB snapshot.
+        max_candidates: maximum number of candidate entities per mention (no limit if None)
+        cap_stats: number of candidates and candidates dropped by max_candidates (over all ranked queries)
     """
-    def __init__(self, weights, commonness_th=None, sf_source="facc", filter=None):
+    def __init__(self, weights, commonness_th=None, sf_source="facc", filter=None, max_candidates=None):
         self.weights = self.__get_weights(weights)
         self.commonness_th = commonness_th
         self.sf_source = sf_source
         self.filter = filter
+        self.max_candidates = max_candidates
+        self.cap_stats = {'candidates': 0, 'dropped': 0}
 
     @staticmethod
     def __get_weights(weights):
@@ -107,6 +111,9 @@ class RankerMLM(object):
         # save time logs
         time_log = "Execution time(min):\t" + str(round(total_time, 4)) + "\n"
         time_log += "Avg. time per query:\t" + str(round(total_time/len(queries), 4)) + "\n"
+        if self.max_candidates is not None:
+            time_log += "Candidates dropped:\t" + str(self.cap_stats['dropped']) + " of " + \
+                        str(self.cap_stats['candidates']) + " (max. " + str(self.max_candidates) + " per mention)\n"
         print time_log
         # if time_log_file is not None:
         #     open(time_log_file + ".timelog", 'w').write(time_log)
@@ -122,7 +129,10 @@ class RankerMLM(object):
         :param cmn: if True, combines cmn with mlm score
         :return erd.ml.CERInstances
         """
-        q_inss = CERInstances.gen_instances(query, self.commonness_th, filter=self.filter, sf_source=self.sf_source)
+        q_inss = CERInstances.gen_instances(query, self.commonness_th, filter=self.filter, sf_source=self.sf_source,
+                                            max_candidates=self.max_candidates)
+        for key in self.cap_stats:
+            self.cap_stats[key] += query.cap_stats[key]
         self.rank_inss(q_inss, cmn)
         return q_inss
 
@@ -139,7 +149,8 @@ def main(args):
 
     weights = args.weights.replace(" ", "").split(',')
     weights = [float(x) for x in weights]
-    ranker_mlm = RankerMLM(weights, commonness_th=args.commonness, sf_source=args.sfsource, filter=args.filter)
+    ranker_mlm = RankerMLM(weights, commonness_th=args.commonness, sf_source=args.sfsource, filter=args.filter,
+                           max_candidates=args.maxcandidates)
     # Ranks instances
     if args.input is not None:
         inss = CERInstances.from_json(args.input)
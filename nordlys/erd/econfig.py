@@ -8,6 +8,11 @@ from nordlys.wikipedia.config import COLLECTION_SURFACEFORMS_WIKI_2015, COLLECTI
     COLLECTION_SURFACEFORMS_WIKI_2012
 from nordlys.entity.entity import Entity
 from nordlys.entity.surfaceforms import SurfaceForms
+from nordlys.entity.dbpedia.link_graph import LinkGraph
+from nordlys.entity.freebase.facc_pairs import FaccPairs
+from nordlys.entity.freebase.facc_postings import FaccPostings
+from nordlys.entity.freebase.facc_sketches import FaccSketches
+from nordlys.erd.features.entity_table import EntityTable
 from nordlys.erd.features.facc_feat import FACCFeat
 from nordlys.retrieval.index_cache import IndexCache
 
@@ -23,6 +28,16 @@ EVAL_DIR = OUTPUT_DIR + "/eval"
 # ------- Index Path -------
 INDEX_DIR = "/data/dbpedia-3.9-indices/index7"
 FACC_INDEX = "/data/facc-indices/clueweb12"
+FACC_POSTINGS_DIR = None  # in-memory entity postings for FACC co-occurrence features (see facc_postings.py)
+FACC_PAIRS_DIR = None  # precomputed co-occurrence counts of entity pairs (see facc_pairs.py)
+FACC_SKETCHES_DIR = None  # if set, FACC features of larger entity sets are estimated from MinHash sketches
+ENTITY_TABLE_DIR = None  # precomputed static entity features for CER (see features/entity_table.py)
+LINK_GRAPH_DIR = None  # precompiled Wikipedia link graph for graph features (see entity/dbpedia/link_graph.py)
+
+# ------- Index settings -------
+USE_MMAP = True  # index files are memory-mapped (MMapDirectory), instead of being read through the JVM heap
+REFRESH_INTERVAL = None  # if set (sec), indices are reopened between queries when changed by incremental indexing
+WARM_UP = False  # the ERD app reads term dictionaries and term vectors into the page cache at start-up (see warm_up)
 
 # ------- Entity predicates -------
 IREDIRECT = "!<dbo:wikiPageRedirects>"  # Inverse Redirect
@@ -50,12 +65,21 @@ KB_SNP_DBP = set()
 KB_SNP_FB = set()
 load_kb()
 
-LUCENE = IndexCache(INDEX_DIR)
+LUCENE = IndexCache(INDEX_DIR, use_mmap=USE_MMAP, refresh_interval=REFRESH_INTERVAL)
 print "INDEX:" + INDEX_DIR
 
-FACC_LUCENE = IndexCache(FACC_INDEX)
-FACC_FEAT = FACCFeat(FACC_LUCENE)
+FACC_LUCENE = IndexCache(FACC_INDEX, use_mmap=USE_MMAP, refresh_interval=REFRESH_INTERVAL)
+FACC_POSTINGS = FaccPostings.load(FACC_POSTINGS_DIR) if FACC_POSTINGS_DIR is not None else None
+FACC_PAIRS = FaccPairs.load(FACC_PAIRS_DIR) if FACC_PAIRS_DIR is not None else None
+FACC_SKETCHES = FaccSketches.load(FACC_SKETCHES_DIR) if FACC_SKETCHES_DIR is not None else None
+FACC_FEAT = FACCFeat(FACC_LUCENE, FACC_POSTINGS, FACC_PAIRS, FACC_SKETCHES)
+ENTITY_TABLE = EntityTable.load(ENTITY_TABLE_DIR) if ENTITY_TABLE_DIR is not None else None
+LINK_GRAPH = LinkGraph.load(LINK_GRAPH_DIR) if LINK_GRAPH_DIR is not None else None
 ENTITY = Entity()
 SF = SurfaceForms(lowercase=True)
 
 
+def warm_up():
+    """Reads the DBpedia and FACC indices into the page cache; for long-running processes (e.g., the ERD app)."""
+    LUCENE.warm_up([TITLE, SHORT_ABS, LONG_ABS, WIKILINKS, CATEGORIES, "names", "contents"])
+    FACC_LUCENE.warm_up(["content"])
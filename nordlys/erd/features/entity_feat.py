@@ -13,15 +13,20 @@ class EntityFeat(object):
     """
     Attributes:
         entity_id: DBpedia uri of entity (string)
+        entity_table: EntityTable object; if given, features are read from the table (the entity is not looked up)
     """
 
-    def __init__(self, entity_id):
+    def __init__(self, entity_id, entity_table=None):
         self.entity_id = entity_id
+        self.entity_table = entity_table
         self.entity = {}
-        self.entity = econfig.ENTITY.lookup_dbpedia_uri(entity_id)
+        if entity_table is None:
+            self.entity = econfig.ENTITY.lookup_dbpedia_uri(entity_id)
 
     def redirects(self):
         """ Number of redirect pages linking to the entity"""
+        if self.entity_table is not None:
+            return self.entity_table.redirects(self.entity_id)
         if econfig.IREDIRECT in self.entity:
             reds = self.entity[econfig.IREDIRECT]
             if type(reds) != list:
@@ -32,6 +37,8 @@ class EntityFeat(object):
 
     def links(self):
         """ Number of Wikipedia pages linking to the entity"""
+        if self.entity_table is not None:
+            return self.entity_table.links(self.entity_id)
         links = self.entity.get(econfig.WIKILINKS, [])
         if type(links) != list:
             links = [links]
@@ -16,19 +16,38 @@ class EntityMentionFeat(object):
         entity_id: DBpedia uri of entity (string)
         Mention: string
         entity: All predicates of entity
+        entity_table: EntityTable object; if given, title and short abstract are read from the table
     """
 
-    def __init__(self, entity_id, mention):
+    def __init__(self, entity_id, mention, entity_table=None):
         self.entity_id = entity_id
         self.mention = mention.lower()  # Mention(mention)
+        self.entity_table = entity_table
         self.entity = {}
-        self.entity = econfig.ENTITY.lookup_dbpedia_uri(entity_id)
+        if entity_table is None:
+            self.entity = econfig.ENTITY.lookup_dbpedia_uri(entity_id)
+
+    def __get_title(self):
+        """Returns pre-processed and lowercased title of entity, or None if the entity has no title."""
+        if self.entity_table is not None:
+            return self.entity_table.title(self.entity_id)
+        if econfig.TITLE in self.entity:
+            return Query.preprocess(self.entity[econfig.TITLE]).lower()
+        return None
+
+    def __get_short_abs(self):
+        """Returns lowercased short abstract of entity, or None if the entity has no short abstract."""
+        if self.entity_table is not None:
+            return self.entity_table.short_abs(self.entity_id)
+        if econfig.SHORT_ABS in self.entity:
+            return self.entity[econfig.SHORT_ABS].lower()
+        return None
 
     def mct(self):
         """ True if mention contains the title of entity """
         mct = 0
-        if econfig.TITLE in self.entity:
-            en_title = Query.preprocess(self.entity[econfig.TITLE]).lower()
+        en_title = self.__get_title()
+        if en_title is not None:
             if en_title in self.mention:
                 mct = 1
         return mct
@@ -36,8 +55,8 @@ class EntityMentionFeat(object):
     def tcm(self):
         """ True if title of entity contains mention """
         tcm = 0
-        if econfig.TITLE in self.entity:
-            en_title = Query.preprocess(self.entity[econfig.TITLE]).lower()
+        en_title = self.__get_title()
+        if en_title is not None:
             if self.mention in en_title:
                 tcm = 1
         return tcm
@@ -45,8 +64,8 @@ class EntityMentionFeat(object):
     def tem(self):
         """ True if title of entity equals mention """
         tem = 0
-        if econfig.TITLE in self.entity:
-            en_title = Query.preprocess(self.entity[econfig.TITLE]).lower()
+        en_title = self.__get_title()
+        if en_title is not None:
             # if self.entity_id == "<dbpedia:Cass_County,_Missouri>":
             #     print "MENTION:", self.mention, "TITLE:", en_title, "RES:", self.mention == en_title
             if self.mention == en_title:
@@ -56,8 +75,8 @@ class EntityMentionFeat(object):
     def pos1(self):
         """ Position of the occurrence of mention in the short abstract """
         pos1 = 1000
-        if econfig.SHORT_ABS in self.entity:
-            s_abs = self.entity[econfig.SHORT_ABS].lower()
+        s_abs = self.__get_short_abs()
+        if s_abs is not None:
             if self.mention in s_abs:
                 pos1 = s_abs.find(self.mention)
         return pos1
@@ -0,0 +1,184 @@
+"""
+Static (query-independent) entity features, precomputed for all DBpedia entities.
+
+- Entities get dense integer ids: positions in the sorted list of entity URIs
+- Numeric features are stored in numpy columns, texts in StringArrays (utf-8); all loaded as memory-mapped arrays
+- Features: number of redirects and links (as EntityFeat), normalised title (as used by EntityMentionFeat),
+  title length, lowercased short abstract and its hash
+
+Building the table from the DBpedia MongoDB collection:
+    python -m nordlys.erd.features.entity_table <table_dir>
+
+@author: Faegheh Hasibi
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+from bisect import bisect_left
+
+import numpy
+from nordlys.retrieval.mem_index import StringArray, load_array, to_utf8
+
+
+class EntityTable(object):
+    """Column store of entity features."""
+
+    META_FILE = "meta.json"
+    COLUMNS = {'redirects': numpy.int32, 'links': numpy.int32, 'has_title': numpy.bool_, 'title_len': numpy.int32,
+               'has_short_abs': numpy.bool_, 'short_abs_hash': numpy.int64}
+    STRING_COLUMNS = ["title", "short_abs"]
+
+    def __init__(self, entities, columns, string_columns):
+        """
+        :param entities: StringArray of entity URIs (sorted)
+        :param columns: dictionary of numeric columns {name: numpy array}
+        :param string_columns: dictionary of text columns {name: StringArray}
+        """
+        self.entities = entities
+        self.columns = columns
+        self.string_columns = string_columns
+
+    @staticmethod
+    def get_entity_features(entity):
+        """
+        Computes features of an entity document; the same way as EntityFeat and EntityMentionFeat do.
+
+        :param entity: entity document (dictionary)
+        :return: dictionary of features
+        """
+        from nordlys.erd import econfig
+        from nordlys.erd.query.query import Query
+
+        def count(predicate):
+            values = entity.get(predicate, [])
+            if type(values) != list:
+                values = [values]
+            return len(set(values))
+
+        title = Query.preprocess(entity[econfig.TITLE]).lower() if econfig.TITLE in entity else ""
+        short_abs = entity[econfig.SHORT_ABS].lower() if econfig.SHORT_ABS in entity else u""
+        return {'redirects': count(econfig.IREDIRECT),
+                'links': count(econfig.WIKILINKS),
+                'has_title': econfig.TITLE in entity,
+                'title': to_utf8(title),
+                'title_len': len(title.split()),
+                'has_short_abs': econfig.SHORT_ABS in entity,
+                'short_abs': to_utf8(short_abs),
+                'short_abs_hash': struct.unpack("<q", hashlib.md5(to_utf8(short_abs)).digest()[:8])[0]}
+
+    @staticmethod
+    def build(entities):
+        """
+        Builds the table.
+
+        :param entities: iterable of entity documents (dictionaries with the URI as Mongo.ID_FIELD)
+        """
+        from nordlys.storage.mongo import Mongo
+        s_t = time.time()
+        rows = []
+        for entity in entities:
+            rows.append((to_utf8(entity[Mongo.ID_FIELD]), EntityTable.get_entity_features(entity)))
+            if len(rows) % 1000000 == 0:
+                print str(len(rows) // 1000000) + "M entities"
+        rows.sort(key=lambda row: row[0])
+
+        columns = {}
+        for name, dtype in EntityTable.COLUMNS.iteritems():
+            columns[name] = numpy.array([features[name] for _, features in rows], dtype=dtype)
+        string_columns = {}
+        for name in EntityTable.STRING_COLUMNS:
+            string_columns[name] = StringArray.build([features[name] for _, features in rows])
+        print "Entity table built: " + str(len(rows)) + " entities (" + str(round(time.time() - s_t, 1)) + " sec)"
+        return EntityTable(StringArray.build([uri for uri, _ in rows]), columns, string_columns)
+
+    @staticmethod
+    def build_from_mongo():
+        """Builds the table for all entities of the DBpedia MongoDB collection."""
+        from nordlys.config import MONGO_DB, MONGO_HOST
+        from nordlys.entity.config import COLLECTION_DBPEDIA
+        from nordlys.storage.mongo import Mongo
+        mongo = Mongo(MONGO_HOST, MONGO_DB, COLLECTION_DBPEDIA)
+        return EntityTable.build(Mongo.get_doc(mdoc) for mdoc in mongo.find_all())
+
+    def save(self, table_dir):
+        if not os.path.exists(table_dir):
+            os.makedirs(table_dir)
+        self.entities.save(table_dir + "/entities")
+        for name, column in self.columns.iteritems():
+            numpy.save(table_dir + "/" + name + ".npy", column)
+        for name, column in self.string_columns.iteritems():
+            column.save(table_dir + "/" + name)
+        json.dump({'num_entities': len(self.entities)}, open(table_dir + "/" + self.META_FILE, "w"))
+
+    @staticmethod
+    def load(table_dir, mmap_mode="r"):
+        """
+        Loads the table.
+
+        :param mmap_mode: numpy mmap mode; None reads the arrays into memory
+        """
+        columns = {}
+        for name in EntityTable.COLUMNS:
+            columns[name] = load_array(table_dir + "/" + name + ".npy", mmap_mode)
+        string_columns = {}
+        for name in EntityTable.STRING_COLUMNS:
+            string_columns[name] = StringArray.load(table_dir + "/" + name, mmap_mode)
+        return EntityTable(StringArray.load(table_dir + "/entities", mmap_mode), columns, string_columns)
+
+    def get_id(self, en_id):
+        """Returns dense id of the entity, or None if the entity is not in the table."""
+        en_id = to_utf8(en_id)
+        i = bisect_left(self.entities, en_id)
+        if i < len(self.entities) and self.entities[i] == en_id:
+            return i
+        return None
+
+    def redirects(self, en_id):
+        """Number of redirects (0 for unknown entities)."""
+        i = self.get_id(en_id)
+        return 0 if i is None else int(self.columns['redirects'][i])
+
+    def links(self, en_id):
+        """Number of links (0 for unknown entities)."""
+        i = self.get_id(en_id)
+        return 0 if i is None else int(self.columns['links'][i])
+
+    def title(self, en_id):
+        """Normalised title (Query.preprocess and lowercased; unicode), or None if the entity has no title."""
+        i = self.get_id(en_id)
+        if i is None or not self.columns['has_title'][i]:
+            return None
+        return self.string_columns['title'][i].decode("utf-8")
+
+    def title_len(self, en_id):
+        """Number of terms in the normalised title."""
+        i = self.get_id(en_id)
+        return 0 if i is None else int(self.columns['title_len'][i])
+
+    def short_abs(self, en_id):
+        """Lowercased short abstract (unicode), or None if the entity has no short abstract."""
+        i = self.get_id(en_id)
+        if i is None or not self.columns['has_short_abs'][i]:
+            return None
+        return self.string_columns['short_abs'][i].decode("utf-8")
+
+    def short_abs_hash(self, en_id):
+        """64 bit hash (md5 prefix) of the lowercased short abstract, or None for unknown entities."""
+        i = self.get_id(en_id)
+        return None if i is None else int(self.columns['short_abs_hash'][i])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("table_dir", help="output directory", type=str)
+    args = parser.parse_args()
+
+    EntityTable.build_from_mongo().save(args.table_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,49 @@ import math
 
 
 class FACCFeat(object):
-    def __init__(self, facc_lucene):
+    def __init__(self, facc_lucene, facc_postings=None, facc_pairs=None, facc_sketches=None, sketch_min_size=3):
+        """
+        :param facc_lucene: FACC index (Lucene/IndexCache or MemIndex object)
+        :param facc_postings: FaccPostings object; if given, counts are computed from the in-memory postings
+                              (the index is used for entities that are not covered by the postings)
+        :param facc_pairs: FaccPairs object; if given, counts of single entities and pairs are taken from the
+                           precomputed matrix (postings or the index are used for other sets)
+        :param facc_sketches: FaccSketches object; if given, counts of sets with at least sketch_min_size entities
+                              are estimated from MinHash sketches (approximate mode)
+        :param sketch_min_size: minimum size of entity sets estimated from sketches
+        """
         self.facc_lucene = facc_lucene
+        self.facc_postings = facc_postings
+        self.facc_pairs = facc_pairs
+        self.facc_sketches = facc_sketches
+        self.sketch_min_size = sketch_min_size
         self.and_freq = {}
+        self.or_freq = {}
         self.facc_lucene.open_searcher()
 
+    def clear_cache(self):
+        """Clears cached counts (e.g., after the index is refreshed)."""
+        self.and_freq = {}
+        self.or_freq = {}
+
+    def __get_count(self, fb_ids, op):
+        """
+        Returns "and"/"or" count from the first source that covers the entities:
+        sketches (large sets only), pairs matrix, postings, and the index.
+
+        :param fb_ids: tuple of freebase ids
+        :param op: "and" or "or"
+        """
+        count = None
+        if (self.facc_sketches is not None) and (len(fb_ids) >= self.sketch_min_size):
+            count = getattr(self.facc_sketches, "get_" + op + "_count")(fb_ids)
+        for source in [self.facc_pairs, self.facc_postings]:
+            if (count is None) and (source is not None):
+                count = getattr(source, "get_" + op + "_count")(fb_ids)
+        if count is None:
+            count = getattr(self.facc_lucene, "get_" + op + "_count")(fb_ids, "content")
+        return count
+
     def __get_and_freq(self, fb_ids):
         """
         returns "and" occurrences of entities in the corpus.
@@ -19,14 +57,8 @@ class FACCFeat(object):
         :param fb_ids: list of freebase ids
         """
         fb_ids = tuple(sorted(set(fb_ids)))
-        if fb_ids in self.and_freq:
-            return self.and_freq[fb_ids]
-
-        term_queries = []
-        for fb_id in fb_ids:
-            term_queries.append(self.facc_lucene.get_id_lookup_query(fb_id, "content"))
-        and_query = self.facc_lucene.get_and_query(term_queries)
-        self.and_freq[fb_ids] = self.facc_lucene.searcher.search(and_query, 1).totalHits
+        if fb_ids not in self.and_freq:
+            self.and_freq[fb_ids] = self.__get_count(fb_ids, "and")
         return self.and_freq[fb_ids]
 
     def __get_or_freq(self, fb_ids):
@@ -35,11 +67,10 @@ class FACCFeat(object):
 
         :param fb_ids: list of freebase ids
         """
-        term_queries = []
-        for fb_id in fb_ids:
-            term_queries.append(self.facc_lucene.get_id_lookup_query(fb_id, "content"))
-        or_query = self.facc_lucene.get_or_query(term_queries)
-        return self.facc_lucene.searcher.search(or_query, 1).totalHits
+        fb_ids = tuple(sorted(set(fb_ids)))
+        if fb_ids not in self.or_freq:
+            self.or_freq[fb_ids] = self.__get_count(fb_ids, "or")
+        return self.or_freq[fb_ids]
 
     def joint_prob(self, fb_ids):
         """
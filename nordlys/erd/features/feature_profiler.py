@@ -0,0 +1,93 @@
+"""
+Profiler of feature computation costs.
+
+- Records wall time and number of backend calls (MongoDB and Lucene) of each feature
+- Backend calls are counted by wrapping the public methods of the Mongo and Lucene classes while the profiler is
+  running; nested calls (e.g., a Lucene method calling another one) are counted once, and lookups answered from a
+  cache (e.g., IndexCache) are not counted
+- Profiles are saved in JSON and used by ML.analyse_features for a joint table of feature cost and importance
+
+@author: Faegheh Hasibi
+"""
+
+import json
+import time
+import types
+from contextlib import contextmanager
+
+from nordlys.retrieval.lucene_tools import Lucene
+from nordlys.storage.mongo import Mongo
+
+BACKENDS = {'mongo': Mongo, 'lucene': Lucene}
+
+
+class FeatureProfiler(object):
+    """
+    Attributes:
+        stats: {feature name: {'calls': , 'time': , 'mongo': , 'lucene': }}; totals over all calls
+    """
+
+    def __init__(self, stats=None):
+        self.stats = stats if stats is not None else {}
+        self.__backend_calls = dict((backend, 0) for backend in BACKENDS)
+        self.__depth = dict((backend, 0) for backend in BACKENDS)
+        self.__orig_methods = []
+
+    def __wrap(self, backend, method):
+        def wrapper(*args, **kwargs):
+            if self.__depth[backend] == 0:
+                self.__backend_calls[backend] += 1
+            self.__depth[backend] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.__depth[backend] -= 1
+        return wrapper
+
+    def start(self):
+        """Starts counting backend calls."""
+        if len(self.__orig_methods) > 0:
+            return
+        for backend, cls in BACKENDS.iteritems():
+            for name, method in vars(cls).items():
+                if isinstance(method, types.FunctionType) and not name.startswith("_"):
+                    self.__orig_methods.append((cls, name, method))
+                    setattr(cls, name, self.__wrap(backend, method))
+
+    def stop(self):
+        """Restores the backend classes."""
+        for cls, name, method in self.__orig_methods:
+            setattr(cls, name, method)
+        self.__orig_methods = []
+
+    @contextmanager
+    def measure(self, name):
+        """Records the cost of the code block for the given feature."""
+        calls = dict(self.__backend_calls)
+        s_t = time.time()
+        try:
+            yield
+        finally:
+            stats = self.stats.setdefault(name, {'calls': 0, 'time': 0.0, 'mongo': 0, 'lucene': 0})
+            stats['calls'] += 1
+            stats['time'] += time.time() - s_t
+            for backend in BACKENDS:
+                stats[backend] += self.__backend_calls[backend] - calls[backend]
+
+    def save(self, json_file):
+        json.dump(self.stats, open(json_file, "w"), indent=4, sort_keys=True)
+        print "Feature costs:\t" + json_file
+
+    @staticmethod
+    def load(json_file):
+        return FeatureProfiler(json.load(open(json_file)))
+
+
+@contextmanager
+def measure(profiler, name):
+    """Records the cost of the code block if a profiler is given."""
+    if profiler is None:
+        yield
+    else:
+        with profiler.measure(name):
+            yield
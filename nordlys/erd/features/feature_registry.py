@@ -0,0 +1,106 @@
+"""
+Registry of features: the group, cost and dependencies of each feature.
+
+- Features are computed in groups (e.g., per mention or per entity-query pair); a group is computed only if any of its
+  features is needed
+- Cost is a rough estimate of the computation cost (see the COST_* constants)
+- Dependencies are the backend resources a feature needs (e.g., surface forms, entity document, term vectors)
+- For a trained model, only the features used in the splits of its trees are needed; the rest get their default values
+
+@author: Faegheh Hasibi
+"""
+
+from collections import defaultdict
+
+# costs of features
+COST_GIVEN = 0  # property of the instance
+COST_MEMORY = 1  # computed in memory (or from precomputed tables)
+COST_MONGO = 2  # MongoDB lookups
+COST_LUCENE = 3  # Lucene lookups (term vectors, collection statistics)
+
+
+class Feature(object):
+    """
+    Attributes:
+        name: feature name
+        group: feature group
+        cost: cost of the feature (one of COST_* values)
+        depends: list of resources the feature depends on
+        default: value used if the feature is not computed
+    """
+
+    def __init__(self, name, group, cost, depends=None, default=0):
+        self.name = name
+        self.group = group
+        self.cost = cost
+        self.depends = depends if depends is not None else []
+        self.default = default
+
+
+class FeatureRegistry(object):
+    """Collection of features."""
+
+    def __init__(self):
+        self.features = {}
+
+    def register(self, name, group, cost, depends=None, default=0):
+        """Adds a feature to the registry."""
+        if name in self.features:
+            raise Exception("Feature " + name + " is already registered")
+        self.features[name] = Feature(name, group, cost, depends, default)
+
+    def get(self, name):
+        return self.features[name]
+
+    def names(self):
+        """Returns sorted feature names; the order of features in the trained models."""
+        return sorted(self.features.keys())
+
+    def get_groups(self, names=None):
+        """
+        Groups the features.
+
+        :param names: feature names (all features if None)
+        :return: dictionary {group: set of feature names}
+        """
+        groups = defaultdict(set)
+        for name in names if names is not None else self.features:
+            groups[self.features[name].group].add(name)
+        return groups
+
+    def get_defaults(self, names=None):
+        """Returns default values of the features: {name: default}."""
+        return dict((name, self.features[name].default) for name in (names if names is not None else self.features))
+
+    def get_dependencies(self, names=None):
+        """Returns the resources needed for the features."""
+        deps = set()
+        for name in names if names is not None else self.features:
+            deps.update(self.features[name].depends)
+        return deps
+
+    def get_model_features(self, model):
+        """
+        Returns names of the features used by the model (trained on all features of the registry).
+        The feature names of the model (set by ML.train_model) must be the same as the registered features;
+        otherwise (or for models without feature names) the used features can not be identified.
+
+        :param model: trained tree ensemble (GBRT or RF)
+        :return: set of feature names, or None if the features of the model do not match the registry
+        """
+        from nordlys.ml.ml import ML
+        names = self.names()
+        model_names = getattr(model, "feature_names", None)
+        if model_names is None:
+            print "Warning: feature names of the model are unknown"
+            return None
+        if list(model_names) != names:
+            print "Warning: the model is trained on " + str(len(model_names)) + " features, different from the " + \
+                  str(len(names)) + " registered features"
+            return None
+        num_features, used = ML.get_split_features(model)
+        if num_features != len(names):
+            print "Warning: the model has " + str(num_features) + " features; " + str(len(names)) + \
+                  " features are registered"
+            return None
+        return set(names[i] for i in used)
@@ -14,14 +14,17 @@ class GraphFeat(object):
         entities: Dictionary {en_id: entity, ...}
         attributes: attributes of all entities in the form of a dictionary.
             (e.g. {'en_id':{'mention': 'm1','score': 1234}, ...})
+        link_graph: LinkGraph object; if given, features are computed from the precompiled link graph
+            (entity documents are not used, entities may be given as a list of en_ids)
     """
 
-    def __init__(self, entities, attributes=None):
+    def __init__(self, entities, attributes=None, link_graph=None):
         self.entities = entities
         if attributes is None:
             self.attributes = {}
         else:
             self.attributes = attributes
+        self.link_graph = link_graph
         self.graph = None
 
     def __gen_graph(self):
@@ -57,12 +60,16 @@ class GraphFeat(object):
     @property
     def num_nodes(self):
         """Number of nodes. """
+        if self.link_graph is not None:
+            return len(self.entities)
         self.__gen_graph()
         return len(self.graph.vs)
 
     @property
     def num_edges(self):
         """Number of nodes. """
+        if self.link_graph is not None:
+            return self.link_graph.num_edges(self.entities)
         self.__gen_graph()
         return len(self.graph.es)
 
@@ -84,6 +91,8 @@ class GraphFeat(object):
             raise Exception("Calculating common neighbors: No entity is given")
         if len(self.entities) == 1:
             return -1
+        if self.link_graph is not None:
+            return self.link_graph.common_neighbors(self.entities)
         cmn_neighbors = set(self.entities.values()[0].get(econfig.WIKILINKS, []))
         for entity in self.entities.values():
             cmn_neighbors &= set(entity.get(econfig.WIKILINKS, []))
@@ -93,6 +102,8 @@ class GraphFeat(object):
         """Size of all neighbors that all entities have."""
         if len(self.entities) < 1:
             raise Exception("Calculating all neighbors: No entity is given")
+        if self.link_graph is not None:
+            return self.link_graph.all_neighbors(self.entities)
         all_neighbors = set()
         for entity in self.entities.values():
             all_neighbors |= set(entity.get(econfig.WIKILINKS, []))
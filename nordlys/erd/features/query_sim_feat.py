@@ -78,14 +78,40 @@ class QuerySimFeat(object):
         if self.DEBUG:
             print entity_id
         lucene_doc_id = econfig.LUCENE.get_lucene_document_id(entity_id)
+        scorer = ScorerMLM(econfig.LUCENE, self.query, {})
+        scorer.load_tf(lucene_doc_id, weights.keys())
         p_t_theta_d = {}
         for t in set(self.query.split()):
-            p_t_theta_d[t] = ScorerMLM(econfig.LUCENE, self.query, {}).get_mlm_term_prob(lucene_doc_id, weights, t)
+            p_t_theta_d[t] = scorer.get_mlm_term_prob(lucene_doc_id, weights, t)
         score = self.nllr(self.query, p_t_theta_d, weights)
         if score is None:
             return None
         return math.exp(score)
 
+    def nllr_lm_scores(self, entity_id, fields):
+        """
+        NLLR-LM scores between the query and multiple entity fields (JM smoothing, lambda=0.1).
+        Term vectors of all fields are read in one call; scores are the same as nllr_lm_score for each field.
+
+        :param entity_id: dbpedia uri
+        :param fields: list of field names
+        :return: dictionary {field: score, ...}
+        """
+        if self.DEBUG:
+            print entity_id
+        lucene_doc_id = econfig.LUCENE.get_lucene_document_id(entity_id)
+        scorer = ScorerMLM(econfig.LUCENE, self.query, {})
+        scorer.load_tf(lucene_doc_id, fields)
+        scores = {}
+        for field in fields:
+            weights = {field: 1}
+            p_t_theta_d = {}
+            for t in set(self.query.split()):
+                p_t_theta_d[t] = scorer.get_mlm_term_prob(lucene_doc_id, weights, t)
+            score = self.nllr(self.query, p_t_theta_d, weights)
+            scores[field] = math.exp(score) if score is not None else None
+        return scores
+
     @staticmethod
     def nllr(query, term_probs, fields):
         """
@@ -164,9 +190,10 @@ class QuerySimFeat(object):
         q_context = self.query[:mention_scope[0]] + self.query[mention_scope[1]:]
         # scoring
         lucene_doc_id = econfig.LUCENE.get_lucene_document_id(entity_id)
+        scorer = ScorerMLM(econfig.LUCENE, self.query, {})
         p_t_theta_d = {}
         for t in set(q_context.strip().split()):
-            p_t_theta_d[t] = ScorerMLM(econfig.LUCENE, self.query, {}).get_mlm_term_prob(lucene_doc_id, {field: 1}, t)
+            p_t_theta_d[t] = scorer.get_mlm_term_prob(lucene_doc_id, {field: 1}, t)
         score = self.nllr(q_context.strip(), p_t_theta_d, {field: 1})
         if score is None:
             return 0
@@ -183,12 +210,14 @@ class QuerySimFeat(object):
         """
         # fielded_weights = self.__get_weights(weights)
         scorer = ScorerMLM(econfig.LUCENE, self.query, {})  # {'field_weights': fielded_weights})
+        lucene_doc_ids = [scorer.lucene.get_lucene_document_id(en) for en in en_ids]
+        # term vectors of all entities of the set are read in one call
+        scorer.load_tfs(lucene_doc_ids, weights.keys())
 
         p_t_theta_d = {}
         for t in set(self.query.split()):
             p_t_theta_d[t] = 0
-            for en in en_ids:
-                lucene_doc_id = scorer.lucene.get_lucene_document_id(en)
+            for lucene_doc_id in lucene_doc_ids:
                 p_t_theta_d[t] += scorer.get_mlm_term_prob(lucene_doc_id, weights, t)
         score = self.nllr(self.query, p_t_theta_d, weights)
         if score is None:
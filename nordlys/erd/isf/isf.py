@@ -26,7 +26,7 @@ def read_args():
     parser.add_argument("-sg", "--setgen", help="Generate interpretation set", action="store_true", default=False)
     parser.add_argument("-train", help="Train a model", action="store_true", default=False)
     parser.add_argument("-predict", help="predict the label of instances", action="store_true", default=False)
-    parser.add_argument("-model", help="Trained model file", type=str)
+    parser.add_argument("-model", help="Trained model file (pickle or .npz)", type=str)
     parser.add_argument("-k", help="top-K entities to be considered from CER step", type=int)
     parser.add_argument("-tree", help="Number of trees", type=int)
     parser.add_argument("-depth", help="Depth of tress (used for GBRT)", type=int)
@@ -35,6 +35,8 @@ def read_args():
     parser.add_argument("-cv", help="Cross validation for the given instances", action="store_true", default=False)
     parser.add_argument("-f", "--folds", help="Number of folds", type=int)
     parser.add_argument("-genfolds", help="Cross validation for the given instances", action="store_true", default=False)
+    parser.add_argument("-prof", "--profile", help="Profile feature costs on the given number of train instances",
+                        type=int)
 
     parser.add_argument("-greedy", help="ISF using greedy approach", action="store_true", default=False)
     parser.add_argument("-top", help="ISF using top-ranked entity", action="store_true", default=False)
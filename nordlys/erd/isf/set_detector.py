@@ -4,18 +4,20 @@ Generates candidate sets and their features.
 @author: Faegheh Hasibi
 """
 
-import pickle
 from itertools import combinations
 
 from nordlys.erd import econfig
 from nordlys.erd.features.entity_feat import EntityFeat
 from nordlys.erd.features.facc_feat import FACCFeat
+from nordlys.erd.features.feature_profiler import FeatureProfiler, measure
 from nordlys.erd.ml.isf_instances import ISFInstances, ISFInstance
+from nordlys.erd.ml.feature_pool import extract_features
 from nordlys.erd.features.query_sim_feat import QuerySimFeat
 from nordlys.erd.features.graph_feat import GraphFeat
 from nordlys.erd.isf.aggregator import Aggregator
 from nordlys.ml.cross_validation import CrossValidation
 from nordlys.ml.ml import ML
+from nordlys.ml.tree_ensemble import load_model
 
 
 class SetDetect(object):
@@ -89,7 +91,7 @@ class SetDetect(object):
         Predicts labels for the given instances.
 
         :param isf_inss: erd.ml.ISFInstances
-        :param model: trained model (loaded by pickle)
+        :param model: trained model (pickled or compiled, see ml.tree_ensemble.load_model)
         :return instances with the predicted labels.
         """
         if model is None:  # Done for CV call_back_test method
@@ -112,8 +114,15 @@ class SetDetect(object):
         return isf_inss
 
     @staticmethod
-    def add_features(isf_inss):
-        """ generates features of all instances"""
+    def add_features(isf_inss, num_workers=1):
+        """
+        Generates features of all instances.
+
+        :param num_workers: number of worker processes; for more than one worker, queries are processed in parallel
+        """
+        if num_workers > 1:
+            print "Extracting features of ISF instances ..."
+            return extract_features(isf_inss, "isf", {}, num_workers)
         econfig.FACC_LUCENE.open_reader()
         econfig.FACC_LUCENE.open_searcher()
 
@@ -130,6 +139,27 @@ class SetDetect(object):
 
         return isf_inss
 
+    @staticmethod
+    def profile_features(isf_inss, num_inss=None):
+        """
+        Instrumentation mode of FeatureExtractor: records wall time and backend calls of the features.
+
+        :param num_inss: number of instances to be profiled (all instances if None)
+        :return FeatureProfiler
+        """
+        econfig.FACC_LUCENE.open_reader()
+        econfig.FACC_LUCENE.open_searcher()
+
+        print "Profiling features of ISF instances ..."
+        profiler = FeatureProfiler()
+        profiler.start()
+        try:
+            for isf_ins in isf_inss.get_all()[:num_inss]:
+                FeatureExtractor(isf_ins, profiler).get_features()
+        finally:
+            profiler.stop()
+        return profiler
+
 
 class FeatureExtractor(object):
     """
@@ -138,8 +168,12 @@ class FeatureExtractor(object):
             isf_ins: erd.ml.ISFInstance
     """
 
-    def __init__(self, isf_ins):
+    def __init__(self, isf_ins, profiler=None):
+        """
+        :param profiler: FeatureProfiler; if given, cost of each feature (or group of aggregated features) is recorded
+        """
         self.isf_ins = isf_ins
+        self.profiler = profiler
 
     def get_features(self):
         """
@@ -147,54 +181,69 @@ class FeatureExtractor(object):
         Args:
             isf_inss: erd.ml.ISFInstances
         """
-        ag = Aggregator(self.isf_ins)
-        query_sim_feat = QuerySimFeat(self.isf_ins.q_content)
-
-        en_ids = self.isf_ins.inter_set.keys()
-        entities = {}
-        for en_id in en_ids:
-            entities[en_id] = econfig.ENTITY.lookup_dbpedia_uri(en_id)
-        graph_feat = GraphFeat(entities)
-
-        fb_ids = set()
-        for en_id in self.isf_ins.inter_set:
-            fb_ids.add(self.isf_ins.cer_atts[en_id]['fb_id'])
+        profiler = self.profiler
+        with measure(profiler, "(setup)"):
+            ag = Aggregator(self.isf_ins)
+            query_sim_feat = QuerySimFeat(self.isf_ins.q_content)
+
+            en_ids = self.isf_ins.inter_set.keys()
+            if econfig.LINK_GRAPH is not None:
+                graph_feat = GraphFeat(en_ids, link_graph=econfig.LINK_GRAPH)
+            else:
+                entities = {}
+                for en_id in en_ids:
+                    entities[en_id] = econfig.ENTITY.lookup_dbpedia_uri(en_id)
+                graph_feat = GraphFeat(entities)
+
+            fb_ids = set()
+            for en_id in self.isf_ins.inter_set:
+                fb_ids.add(self.isf_ins.cer_atts[en_id]['fb_id'])
 
         features = {}
         # features['num_nodes'] = graph_feat.num_nodes
         # features['num_edges'] = graph_feat.num_edges
 
         # ------ set-based features ------
-        features['common_links'] = graph_feat.common_neighbors()
-        features['total_links'] = graph_feat.all_neighbors()
-        features['j_kb'] = graph_feat.jc()
-        features['j_corpora'] = econfig.FACC_FEAT.jc(fb_ids)
-        features['rel_mw'] = econfig.FACC_FEAT.mw_rel(fb_ids)
-        features['P'] = econfig.FACC_FEAT.joint_prob(fb_ids)
-        features['H'] = econfig.FACC_FEAT.entropy(fb_ids)
-        features['completeness'] = graph_feat.completeness()
-        features['len_ratio_set'] = self.len_ratio_iset()
-        features['set_sim'] = query_sim_feat.query_set_sim(self.isf_ins.inter_set.keys(), {'names': 0.2, 'contents': 0.8})
+        set_features = [('common_links', lambda: graph_feat.common_neighbors()),
+                        ('total_links', lambda: graph_feat.all_neighbors()),
+                        ('j_kb', lambda: graph_feat.jc()),
+                        ('j_corpora', lambda: econfig.FACC_FEAT.jc(fb_ids)),
+                        ('rel_mw', lambda: econfig.FACC_FEAT.mw_rel(fb_ids)),
+                        ('P', lambda: econfig.FACC_FEAT.joint_prob(fb_ids)),
+                        ('H', lambda: econfig.FACC_FEAT.entropy(fb_ids)),
+                        ('completeness', lambda: graph_feat.completeness()),
+                        ('len_ratio_set', lambda: self.len_ratio_iset()),
+                        ('set_sim', lambda: query_sim_feat.query_set_sim(self.isf_ins.inter_set.keys(),
+                                                                         {'names': 0.2, 'contents': 0.8}))]
+        for name, func in set_features:
+            with measure(profiler, name):
+                features[name] = func()
 
         # ------ entity-based feature -------
         # num_links
-        num_links = [EntityFeat(en_id).links() for en_id in self.isf_ins.inter_set]
-        features.update(ag.aggregate(dict(zip(en_ids, num_links)), "links"))
+        with measure(profiler, "links"):
+            num_links = [EntityFeat(en_id, econfig.ENTITY_TABLE).links() for en_id in self.isf_ins.inter_set]
+            features.update(ag.aggregate(dict(zip(en_ids, num_links)), "links"))
         # commonness
-        commonness = [self.isf_ins.cer_atts[en_id]['commonness'] for en_id in en_ids]
-        features.update(ag.aggregate(dict(zip(en_ids, commonness)), "commonness"))
+        with measure(profiler, "commonness"):
+            commonness = [self.isf_ins.cer_atts[en_id]['commonness'] for en_id in en_ids]
+            features.update(ag.aggregate(dict(zip(en_ids, commonness)), "commonness"))
         # CER scores
-        cer_scores = [self.isf_ins.cer_atts[en_id]['score'] for en_id in en_ids]
-        features.update(ag.aggregate(dict(zip(en_ids, cer_scores)), "score"))
+        with measure(profiler, "score"):
+            cer_scores = [self.isf_ins.cer_atts[en_id]['score'] for en_id in en_ids]
+            features.update(ag.aggregate(dict(zip(en_ids, cer_scores)), "score"))
         # rank inverse
-        iranks = [1.0 / self.isf_ins.cer_atts[en_id]['rank'] for en_id in en_ids]
-        features.update(ag.aggregate(dict(zip(en_ids, iranks)), "irank"))
+        with measure(profiler, "irank"):
+            iranks = [1.0 / self.isf_ins.cer_atts[en_id]['rank'] for en_id in en_ids]
+            features.update(ag.aggregate(dict(zip(en_ids, iranks)), "irank"))
         # MLM-tc
         if "mlm-tc" in self.isf_ins.cer_atts.values()[0]:
-            mlm_tc_scores = [self.isf_ins.cer_atts[en_id]['mlm-tc'] for en_id in en_ids]
-            features.update(ag.aggregate(dict(zip(en_ids, mlm_tc_scores)), "mlm-tc"))
+            with measure(profiler, "mlm-tc"):
+                mlm_tc_scores = [self.isf_ins.cer_atts[en_id]['mlm-tc'] for en_id in en_ids]
+                features.update(ag.aggregate(dict(zip(en_ids, mlm_tc_scores)), "mlm-tc"))
         # con_sim
-        features.update(ag.aggregate(self.context_sim_scores(), "context_sim"))
+        with measure(profiler, "context_sim"):
+            features.update(ag.aggregate(self.context_sim_scores(), "context_sim"))
         return features
 
     def len_ratio_iset(self):
@@ -247,6 +296,7 @@ class FeatureExtractor(object):
 def main(args):
     """
     Required args for training:         -train -t <int> -d <int> -in <train_set_name.json>
+    Valid args for training:            -prof <num_instances> (profiles feature costs)
     Required args for prediction:       -predict -model <model_file> -in <file.json>
     """
     settings_str = "-t" + str(args.tree)
@@ -260,14 +310,19 @@ def main(args):
     # ==== Train ====
     if args.train:
         train_inss = ISFInstances.from_json(args.input)
+        train_inss.to_columnar()
         file_name = args.input[:args.input.rfind(".json")] + settings_str
         set_detector = SetDetect(model_name=model_name, tree=args.tree, depth=args.depth, max_features=args.maxfeat)
+        if args.profile is not None:
+            SetDetect.profile_features(train_inss, args.profile).save(file_name + "-feat_cost.json")
+            set_detector.config['feature_costs'] = file_name + "-feat_cost.json"
         set_detector.train(train_inss, file_name + ".model", feat_imp_file=file_name + "-feat_imp.txt")
 
     # ==== Cross Validation ====
     elif args.cv:
         in_file_name = args.input[:args.input.rfind(".json")]
         cv_inss = ISFInstances.from_json(args.input)
+        cv_inss.to_columnar()
         set_detector = SetDetect(model_name=model_name, tree=args.tree, depth=args.depth, max_features=args.maxfeat)
         ranked_inss = set_detector.cross_validate(cv_inss, args.folds,
                                                   folds_name=in_file_name + "-" + str(args.folds) + "f-folds.json",
@@ -286,7 +341,7 @@ def main(args):
     # ==== Predict ====
     elif args.predict:
         # loads model
-        model = pickle.loads(open(args.model, 'r').read())
+        model = load_model(args.model)
         set_detector = SetDetect()
 
         # Ranks instances
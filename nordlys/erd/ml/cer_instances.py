@@ -159,7 +159,8 @@ class CERInstances(Instances):
         return inss
 
     @staticmethod
-    def gen_instances(query, commonness_th, candidate_entities=None, ftr_func=None, sf_source=None, filter=True):
+    def gen_instances(query, commonness_th, candidate_entities=None, ftr_func=None, sf_source=None, filter=True,
+                      max_candidates=None):
         """
         Generates instances from the candidate entities of the query.
         - Instance id is an integer
@@ -169,13 +170,18 @@ class CERInstances(Instances):
             query: query.Query
             ftr_func: a function in form of
                 ftr_func(entity_id, query, surface) that generates features
+            max_candidates: maximum number of candidate entities per mention (no limit if None)
 
         Returns:
             ins.Instances
         """
         print "Generating instances for query " + query.id
         if candidate_entities is None:
-            candidate_entities = query.get_candidate_entities(commonness_th, filter=filter)
+            candidate_entities = query.get_candidate_entities(commonness_th, filter=filter,
+                                                              max_candidates=max_candidates)
+            if query.cap_stats['dropped'] > 0:
+                print "\t" + str(query.cap_stats['dropped']) + " of " + str(query.cap_stats['candidates']) + \
+                      " candidates dropped (max. " + str(max_candidates) + " per mention)"
 
         instances = CERInstances(None)
         ins_id = 0
@@ -0,0 +1,173 @@
+"""
+Parallel feature extraction for CER and ISF instances.
+
+- Instances are grouped by query and the groups are sent to a pool of worker processes (largest groups first)
+- Workers are started as new Python processes (not forked), as the JVM of Lucene is already running in the parent;
+  each worker imports econfig, i.e., holds its own Lucene indices, Mongo connections and feature caches
+- Tasks and results are pickled over the stdin/stdout pipes of the workers; anything the workers print goes to stderr
+- Features are returned in the order of the instances of the group and assigned by the parent, so the result does not
+  depend on the order in which the groups are finished
+
+Usage:
+    RankerLTR.add_features(inss, commonness_th, sf_source, num_workers=8)
+    SetDetect.add_features(isf_inss, num_workers=8)
+
+@author: Faegheh Hasibi
+"""
+
+import os
+import pickle
+import select
+import subprocess
+import sys
+import time
+import traceback
+
+import nordlys
+
+# root directory of the nordlys package, added to the path of the workers
+NORDLYS_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(nordlys.__file__)))
+
+
+class FeaturePool(object):
+    """Pool of feature extraction processes."""
+
+    def __init__(self, num_workers):
+        """
+        :param num_workers: number of worker processes
+        """
+        env = dict(os.environ)
+        env['PYTHONPATH'] = NORDLYS_ROOT + (os.pathsep + env['PYTHONPATH'] if 'PYTHONPATH' in env else "")
+        self.workers = []
+        for _ in range(num_workers):
+            self.workers.append(subprocess.Popen([sys.executable, "-m", "nordlys.erd.ml.feature_pool"], env=env,
+                                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE))
+
+    def close(self):
+        for worker in self.workers:
+            if worker.poll() is None:
+                pickle.dump(None, worker.stdin, pickle.HIGHEST_PROTOCOL)
+                worker.stdin.close()
+        for worker in self.workers:
+            worker.wait()
+
+    def __send(self, worker, task):
+        pickle.dump(task, worker.stdin, pickle.HIGHEST_PROTOCOL)
+        worker.stdin.flush()
+
+    def __receive(self, worker):
+        try:
+            ok, result = pickle.load(worker.stdout)
+        except EOFError:
+            raise Exception("Feature worker " + str(worker.pid) + " exited (code " + str(worker.poll()) + ")")
+        if not ok:
+            raise Exception("Feature extraction failed in worker " + str(worker.pid) + ":\n" + result)
+        return result
+
+    def extract(self, inss, kind, params):
+        """
+        Extracts features of the instances; features are set in the instances.
+
+        :param inss: CERInstances or ISFInstances
+        :param kind: "cer" or "isf"
+        :param params: extraction parameters (dictionary), e.g., {'commonness_th': 0.1, 'sf_source': None}
+        :return: the instances
+        """
+        s_t = time.time()
+        groups = sorted(inss.group_by_query().values(), key=len, reverse=True)
+        num_inss = sum(len(group) for group in groups)
+        pending = {}  # stdout of busy workers -> (worker, group)
+        idle = list(self.workers)
+        next_group, done_groups = 0, 0
+        while done_groups < len(groups):
+            # sends groups to the idle workers
+            while len(idle) > 0 and next_group < len(groups):
+                worker = idle.pop()
+                group = groups[next_group]
+                self.__send(worker, (kind, params, group))
+                pending[worker.stdout] = (worker, group)
+                next_group += 1
+            # assigns features of the finished groups
+            readable, _, _ = select.select(pending.keys(), [], [])
+            for f in readable:
+                worker, group = pending.pop(f)
+                for ins, features in zip(group, self.__receive(worker)):
+                    ins.features = features
+                idle.append(worker)
+                done_groups += 1
+                if done_groups % 100 == 0:
+                    print "Features are generated for " + str(done_groups) + " queries"
+
+        total_time = time.time() - s_t
+        if total_time > 0:
+            print "Feature extraction (" + str(len(self.workers)) + " workers): " + str(num_inss) + " instances, " + \
+                  str(len(groups)) + " queries in " + str(round(total_time, 2)) + " sec (" + \
+                  str(round(num_inss / total_time, 1)) + " instances/sec, " + \
+                  str(round(len(groups) / total_time, 2)) + " queries/sec)"
+        return inss
+
+
+def extract_features(inss, kind, params, num_workers):
+    """
+    Extracts features of the instances using a pool of workers (the pool is closed afterwards).
+
+    :param inss: CERInstances or ISFInstances
+    :param kind: "cer" or "isf"
+    :param params: extraction parameters (dictionary)
+    :param num_workers: number of worker processes
+    """
+    pool = FeaturePool(num_workers)
+    try:
+        return pool.extract(inss, kind, params)
+    finally:
+        pool.close()
+
+
+class _Worker(object):
+    """Computes features of the instance groups sent by FeaturePool."""
+
+    def __init__(self):
+        # feature groups are cached over all tasks of the worker (as in serial extraction), per set of features
+        self.cer_caches = {}
+        self.facc_opened = False
+
+    def get_features(self, kind, params, group):
+        if kind == "cer":
+            from nordlys.erd.cer.ranker_ltr import RankerLTR
+            features = params.get('features', None)
+            cache = self.cer_caches.setdefault(frozenset(features) if features is not None else None, {})
+            return [RankerLTR.get_features(ins, params['commonness_th'], params['sf_source'], cache, features)
+                    for ins in group]
+        elif kind == "isf":
+            from nordlys.erd import econfig
+            from nordlys.erd.isf.set_detector import FeatureExtractor
+            if not self.facc_opened:
+                econfig.FACC_LUCENE.open_reader()
+                econfig.FACC_LUCENE.open_searcher()
+                self.facc_opened = True
+            return [FeatureExtractor(ins).get_features() for ins in group]
+        raise Exception("Unknown instance type: " + str(kind))
+
+    def run(self, task_in, result_out):
+        while True:
+            task = pickle.load(task_in)
+            if task is None:
+                break
+            try:
+                result = (True, self.get_features(*task))
+            except Exception:
+                result = (False, traceback.format_exc())
+            pickle.dump(result, result_out, pickle.HIGHEST_PROTOCOL)
+            result_out.flush()
+
+
+def main():
+    # results are written to the original stdout; the prints of the feature extractors (and of the JVM, which is
+    # started when econfig is imported) are redirected to stderr
+    result_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    _Worker().run(sys.stdin, result_out)
+
+
+if __name__ == '__main__':
+    main()
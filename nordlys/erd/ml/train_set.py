@@ -34,6 +34,7 @@ def read_args():
     parser.add_argument("-cvs", "--cvset", help="Generate CV set", action="store_true", default=False)
     parser.add_argument("-unf", "--filter", help="Do not perform filtering", action="store_false", default=True)
     parser.add_argument("-sfs", "--sfsource", help="Surface form sources", choices=['facc', 'wiki'])
+    parser.add_argument("-w", "--workers", help="Number of feature extraction processes", type=int, default=1)
 
     args = parser.parse_args()
 
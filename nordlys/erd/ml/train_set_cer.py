@@ -18,9 +18,10 @@ from nordlys.erd.features.entity_mention_feat import EntityMentionFeat
 
 
 class TrainSetCER(object):
-    def __init__(self, commonness_th, sf_source):
+    def __init__(self, commonness_th, sf_source, num_workers=1):
         self.commonness_th = commonness_th
         self.sf_source = sf_source
+        self.num_workers = num_workers  # number of feature extraction processes
         # self.filter = filter
 
     def gen_train_set(self, gt_inss, queries, rand=False, ratio=1):
@@ -57,7 +58,8 @@ class TrainSetCER(object):
             for ins in q_ins_list:
                 ins.id = ins_count
                 if ins.commonness is None:
-                    ins.commonness = EntityMentionFeat(ins.en_id, ins.mention).commonness(self.sf_source)
+                    en_mention_ftr = EntityMentionFeat(ins.en_id, ins.mention, econfig.ENTITY_TABLE)
+                    ins.commonness = en_mention_ftr.commonness(self.sf_source)
                 train_inss.add_instance(ins)
                 ins_count += 1
         print "\nTrain set instances are generated!"
@@ -108,9 +110,9 @@ class TrainSetCER(object):
         for q_id, q_content in queries.iteritems():
             query = Query(q_id, q_content)
             q_inss = CERInstances.gen_instances(query, self.commonness_th, sf_source=self.sf_source, filter=True)
-            RankerLTR.add_features(q_inss, self.commonness_th, self.sf_source)
             inss_list.append(q_inss)
         inss = CERInstances.concatenate_inss(inss_list)
+        RankerLTR.add_features(inss, self.commonness_th, self.sf_source, self.num_workers)
 
         # change target of instances for instances in the groundtruth
         for ins in inss.get_all():
@@ -245,7 +247,7 @@ def main(args):
 
     filter_str = "" if args.filter else "-unfilter"
     # sf_source_str = "-" + args.sfsource if args.sfsource is not None else ""
-    ts = TrainSetCER(args.commonness, args.sfsource)
+    ts = TrainSetCER(args.commonness, args.sfsource, args.workers)
 
     # Generates train set
     if args.trainset:
@@ -253,7 +255,7 @@ def main(args):
         train_inss = ts.gen_train_set(gt_inss, queries)
         # add_commonness(train_inss)
         if not args.nofeatures:
-            RankerLTR.add_features(train_inss, args.commonness, args.sfsource)
+            RankerLTR.add_features(train_inss, args.commonness, args.sfsource, args.workers)
 
         # Writes train set into file
         file_name = econfig.RES_DIR + "/" + args.data + "-cerTrain-c" + str(args.commonness) + filter_str
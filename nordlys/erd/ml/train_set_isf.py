@@ -204,7 +204,7 @@ def main(args):
     """
     if args.addfeat:
         train_inss = ISFInstances.from_json(args.input)
-        SetDetect.add_features(train_inss)
+        SetDetect.add_features(train_inss, args.workers)
          # Writes ISF train set into files
         file_name = args.input[:args.input.rfind("-nof")]
         train_inss.to_json(file_name + ".json")
@@ -225,7 +225,7 @@ def main(args):
         train_inss = gen_train_set(gt_inss, cer_inss, args.k)
         print "Number of ISF train instances:", len(train_inss.get_all())
         if not args.nofeatures:
-            SetDetect.add_features(train_inss)
+            SetDetect.add_features(train_inss, args.workers)
 
         # Writes ISF train set into files
         file_name = args.input[:args.input.rfind(".json")] + "-isfTrain-k" + str(args.k)
@@ -238,7 +238,7 @@ def main(args):
     elif args.cvset:
         cv_inss = gen_cv_set(gt_inss, cer_inss, args.k)
         if not args.nofeatures:
-            SetDetect.add_features(cv_inss)
+            SetDetect.add_features(cv_inss, args.workers)
         file_name = args.input[:args.input.rfind(".json")] + "-isfCV-k" + str(args.k)
         if args.nofeatures:
             file_name += "-nof"
@@ -10,6 +10,7 @@ import re
 from nordlys.entity.freebase.utils import FreebaseUtils
 
 from nordlys.erd import econfig
+from nordlys.erd.features.entity_feat import EntityFeat
 
 
 class Query(object):
@@ -25,6 +26,7 @@ class Query(object):
     def __init__(self, qid, content):
         self.id = qid
         self.content = self.preprocess(content).lower()
+        self.cap_stats = {'candidates': 0, 'dropped': 0}  # candidates dropped by max_candidates
 
     @staticmethod
     def preprocess(input_str):
@@ -85,26 +87,30 @@ class Query(object):
                 ngrams.append(ngram)
         return ngrams
 
-    def get_candidate_entities(self, commonness_th, sf_source="facc", filter=True):
+    def get_candidate_entities(self, commonness_th, sf_source="facc", filter=True, max_candidates=None):
         """
         Finds all candidate entities for the given query.
             - generates all n_grams
             - Detect all entities whose surface form matches query n-grams.
+            - Keeps the top max_candidates entities per mention (see Mention.cap_cand_ens)
 
         :param commonness_th: float, commonness threshold
         :param sf_source: one of the values [facc | wiki]
         :param filter: Filter proper-named entities or not
+        :param max_candidates: maximum number of candidate entities per mention (no limit if None)
         :return A dictionary, where each entry has a list of entityIds: {ngram:[(dbp_uri, fb_id):commonness, ..], ..}
         """
         candidate_entities = {}
+        self.cap_stats = {'candidates': 0, 'dropped': 0}
         for ngram in self.get_ngrams():
             mention = Mention(ngram, sf_source)
             unfiltered_ens = mention.get_men_candidate_ens(commonness_th, filter=False)
-            if filter:
-                filtered_ens = mention.filter_cand_ens(unfiltered_ens)
-                candidate_entities[ngram] = (filtered_ens, len(unfiltered_ens))
-            else:
-                candidate_entities[ngram] = (unfiltered_ens, len(unfiltered_ens))
+            cand_ens = mention.filter_cand_ens(unfiltered_ens) if filter else unfiltered_ens
+            capped_ens = mention.cap_cand_ens(cand_ens, max_candidates)
+            self.cap_stats['candidates'] += len(cand_ens)
+            self.cap_stats['dropped'] += len(cand_ens) - len(capped_ens)
+            # number of matches (used as a feature) is not affected by the cap
+            candidate_entities[ngram] = (capped_ens, len(unfiltered_ens))
         return candidate_entities
 
     def candidate_entities_to_str(self, candidate_entities):
@@ -235,6 +241,37 @@ class Mention(object):
                 filtered_ens[(dbp_uri, fb_id)] = cmn
         return filtered_ens
 
+    def cap_cand_ens(self, cand_ens, max_candidates):
+        """
+        Keeps the top candidate entities by commonness.
+        Ties (e.g., DBpedia name variant matches that are not in FACC, with zero commonness) are broken by the number
+        of DBpedia name variant predicates matching the mention, then by the number of redirects of the entity.
+
+        :param cand_ens: dictionary {(dbp_uri, fb_id):commonness, ..}
+        :param max_candidates: maximum number of entities (no limit if None)
+        :return: dictionary {(dbp_uri, fb_id):commonness, ..}
+        """
+        if (max_candidates is None) or (len(cand_ens) <= max_candidates):
+            return cand_ens
+        ranked = sorted(cand_ens.iteritems(), key=lambda (en, cmn): (-cmn, en))
+        # ties are broken only at the cut-off, as the number of redirects may need an entity lookup
+        cutoff_cmn = ranked[max_candidates - 1][1]
+        top = [(en, cmn) for en, cmn in ranked if cmn > cutoff_cmn]
+        tied = [(en, cmn) for en, cmn in ranked if cmn == cutoff_cmn]
+        if len(top) + len(tied) > max_candidates:
+            tied.sort(key=lambda (en, cmn): (self.__fallback_prior(en[0]), en))
+        return dict((top + tied)[:max_candidates])
+
+    def __fallback_prior(self, dbp_uri):
+        """ Sort key of entities with equal commonness (smaller is better). """
+        num_predicates = 0
+        for predicate, ens in self.matched_ens.iteritems():
+            if (predicate != "facc09") and (predicate != "facc12") and (dbp_uri in ens):
+                num_predicates += 1
+        # from the entity table if available, otherwise from the entity catalog (MongoDB)
+        redirects = EntityFeat(dbp_uri, econfig.ENTITY_TABLE).redirects()
+        return -num_predicates, -redirects
+
     def get_facc_matches(self, commonness_th):
         """
         Gets entity matches from FACC09, FACC12 (with dbpedia uris).
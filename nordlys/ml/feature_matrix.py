@@ -0,0 +1,135 @@
+"""
+Columnar storage of instance features.
+
+- Features of all instances are kept in a single numpy matrix (one row per instance), with a shared feature name index
+- Instance.features is replaced by a FeatureRow, a dictionary-like view of a row of the matrix
+- Each row keeps track of the features set for it, so instances with different feature sets keep their own features
+- Columns of new features are added with spare capacity, so the matrix is not copied for each new feature
+- Feature matrices of (subsets of) instances are obtained by slicing the matrix (see Instances.get_feature_matrix)
+
+Usage:
+    inss = Instances.from_json(json_file)
+    inss.to_columnar()
+
+@author: Krisztian Balog
+"""
+
+import numpy
+
+
+class FeatureMatrix(object):
+    """
+    Attributes:
+        names: list of feature names (column order)
+        index: dictionary {feature name: column}
+        matrix: numpy matrix of feature values; the first num_rows rows and len(names) columns are in use
+        present: boolean matrix; True for the features set for a row (other cells are 0)
+    """
+
+    def __init__(self, names, capacity=1024):
+        """
+        :param names: feature names
+        :param capacity: initial number of rows
+        """
+        self.names = []
+        self.index = {}
+        self.matrix = numpy.zeros((capacity, 0))
+        self.present = numpy.zeros((capacity, 0), dtype=bool)
+        self.num_rows = 0
+        self.add_features(names)
+
+    def __resize(self, num_rows, num_cols):
+        matrix = numpy.zeros((num_rows, num_cols))
+        present = numpy.zeros((num_rows, num_cols), dtype=bool)
+        rows, cols = self.matrix.shape
+        matrix[:rows, :cols] = self.matrix
+        present[:rows, :cols] = self.present
+        self.matrix, self.present = matrix, present
+
+    def add_row(self, features=None):
+        """
+        Adds a row.
+
+        :param features: dictionary of feature values
+        :return FeatureRow
+        """
+        if self.num_rows == len(self.matrix):
+            self.__resize(max(2 * len(self.matrix), 1), self.matrix.shape[1])
+        row = FeatureRow(self, self.num_rows)
+        self.num_rows += 1
+        if features is not None:
+            row.update(features)
+        return row
+
+    def add_features(self, names):
+        """Adds columns for new features; the matrix is copied at most once."""
+        new_names = [name for name in names if name not in self.index]
+        for name in new_names:
+            self.index[name] = len(self.names)
+            self.names.append(name)
+        if len(self.names) > self.matrix.shape[1]:
+            self.__resize(len(self.matrix), max(2 * self.matrix.shape[1], len(self.names)))
+
+    def get_rows(self, rows, names):
+        """
+        Returns the feature matrix of the given rows.
+
+        :param rows: row numbers
+        :param names: feature names (columns of the returned matrix); all of them must be set for the rows
+        """
+        cols = [self.index[name] for name in names]
+        cells = numpy.ix_(numpy.asarray(rows, dtype=int), cols)
+        if not self.present[cells].all():
+            raise KeyError("Features are missing for some of the rows")
+        return self.matrix[cells]
+
+
+class FeatureRow(object):
+    """Dictionary-like view of a row of a FeatureMatrix; only the features set for the row are visible."""
+
+    def __init__(self, matrix, row):
+        self.matrix = matrix
+        self.row = row
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return self.matrix.matrix[self.row, self.matrix.index[name]]
+
+    def __setitem__(self, name, value):
+        self.update({name: value})
+
+    def __contains__(self, name):
+        col = self.matrix.index.get(name, None)
+        return col is not None and self.matrix.present[self.row, col]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return int(self.matrix.present[self.row].sum())
+
+    def __cols(self):
+        return numpy.flatnonzero(self.matrix.present[self.row, :len(self.matrix.names)])
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def keys(self):
+        return [self.matrix.names[col] for col in self.__cols()]
+
+    def values(self):
+        return [float(v) for v in self.matrix.matrix[self.row, self.__cols()]]
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def update(self, features):
+        self.matrix.add_features(features.keys())
+        for name, value in features.iteritems():
+            col = self.matrix.index[name]
+            self.matrix.matrix[self.row, col] = value
+            self.matrix.present[self.row, col] = True
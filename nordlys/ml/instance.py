@@ -97,7 +97,7 @@ class Instance(object):
         :param file_name: (string)
         :return JSON dump of the instance.
         """
-        json_ins = {self.id: {'target': self.target, 'features': self.features, 'properties': self.properties}}
+        json_ins = {self.id: {'target': self.target, 'features': dict(self.features), 'properties': self.properties}}
         if file_name is not None:
             print "writing instance \"" + str(self.id) + "\" to " + file_name + "..."
             out = open(file_name, 'w')
@@ -5,6 +5,7 @@ Instances used for Machine learning algorithms.
     - Loads instance-data from JSON or TSV files
         - When using TSV, instance properties, target, and features are loaded from separate files
     - Generates a list of instances in JSON or RankLib format
+    - Optionally keeps features in a single matrix (see to_columnar and ml.feature_matrix)
 
 @author: Faegheh Hasibi
 @author: Krisztian Balog
@@ -14,6 +15,9 @@ import csv
 import json
 from collections import defaultdict
 import sys
+
+import numpy
+from nordlys.ml.feature_matrix import FeatureMatrix, FeatureRow
 from nordlys.ml.instance import Instance
 
 
@@ -69,6 +73,39 @@ class Instances(object):
         """Returns list of all instance ids."""
         return self.instances.keys()
 
+    def to_columnar(self):
+        """
+        Moves features of all instances to a single feature matrix; features of the instances become row views.
+
+        :return the FeatureMatrix
+        """
+        names = set()
+        for ins in self.get_all():
+            names.update(ins.features.keys())
+        feature_matrix = FeatureMatrix(sorted(names), capacity=len(self.instances))
+        for ins in self.get_all():
+            ins.features = feature_matrix.add_row(ins.features)
+        return feature_matrix
+
+    def get_feature_matrix(self, feature_names, ins_list=None):
+        """
+        Returns features of the instances as a numpy matrix.
+        For columnar instances (see to_columnar), the matrix is sliced from the feature matrix of the instances.
+
+        :param feature_names: feature names (columns)
+        :param ins_list: list of instances (rows); all instances (in the order of get_all()) if None
+        :return numpy matrix (n_instances, n_features)
+        """
+        if ins_list is None:
+            ins_list = self.get_all()
+        rows = [ins.features for ins in ins_list]
+        if (len(rows) > 0) and all(type(row) == FeatureRow and row.matrix is rows[0].matrix for row in rows):
+            return rows[0].matrix.get_rows([row.row for row in rows], feature_names)
+        x = numpy.zeros((len(rows), len(feature_names)))
+        for i, features in enumerate(rows):
+            x[i] = [features[ftr] for ftr in feature_names]
+        return x
+
     def __load_from_tsv(self, tsv_file, type, params):
         """Loads instances from a TSV file.
 
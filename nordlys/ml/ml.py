@@ -23,6 +23,8 @@ Parameters in the config file:
   - save_model: the model is saved to this file
   - load_model: TO BE ADDED LATER
   - save_feature_imp: Feature importance is saved to this file
+  - feature_costs: JSON file with feature costs (see erd.features.feature_profiler); if given, a joint table of cost
+    and importance of features is added to the feature importance file
   - output_file: where output is written; default output format: TSV with with instance_id and (estimated) target
 
 @author: Krisztian Balog
@@ -38,6 +40,7 @@ from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 
 from instances import Instances
 from cross_validation import CrossValidation
+from tree_ensemble import TreeEnsemble
 
 
 class ML(object):
@@ -126,10 +129,9 @@ class ML(object):
         print "Number of features:\t" + str(len(features_names))
         # Converts instances to Scikit-learn format : (n_samples, n_features)
         n_samples = len(instances.get_all())
-        train_x = numpy.zeros((n_samples, len(features_names)))
+        train_x = instances.get_feature_matrix(features_names)
         train_y = numpy.empty(n_samples, dtype=object)  # numpy.zeros(n_samples)  #
         for i, ins in enumerate(instances.get_all()):
-            train_x[i] = [ins.features[ftr] for ftr in features_names]
             if self.config.get('category', "regression") == "regression":
                 train_y[i] = float(ins.target)
             else:
@@ -137,6 +139,8 @@ class ML(object):
         # training
         model = self.gen_model(len(features))
         model.fit(train_x, train_y)
+        # names of the features (columns) are kept with the model
+        model.feature_names = features_names
         model_pickle = pickle.dumps(model)
 
         # write the trained model to the file
@@ -170,9 +174,56 @@ class ML(object):
         for feat, importance in sorted_importances:
             feat_imp_str += feat + "\t" + str(importance) + "\n"
         feat_imp_str += "=========================================="
+        if "feature_costs" in self.config:
+            costs = json.load(open(self.config['feature_costs']))
+            feat_imp_str += "\n\n" + self.cost_importance_table(importances, costs)
         open(self.config['save_feature_imp'], "w").write(feat_imp_str)
         return feat_imp_str
 
+    @staticmethod
+    def cost_importance_table(importances, costs):
+        """
+        Joint table of feature costs and importances, sorted by time.
+        Costs of a feature group (e.g., "links" for aggregated features "links_min", "links_max", ...) are reported
+        with the sum of importances of the features in the group.
+
+        :param importances: list of (feature name, importance)
+        :param costs: {feature name: {'calls': , 'time': , 'mongo': , 'lucene': }} (see FeatureProfiler)
+        """
+        rows = []
+        for name, cost in costs.iteritems():
+            importance = sum(imp for feat, imp in importances if feat == name or feat.startswith(name + "_"))
+            calls = max(cost['calls'], 1)
+            rows.append((name, importance, 1000.0 * cost['time'] / calls, float(cost['mongo']) / calls,
+                         float(cost['lucene']) / calls))
+        rows.sort(key=lambda row: row[2], reverse=True)
+
+        table = "============ Cost vs. Importance ============\n"
+        table += "feature\timportance\ttime(ms)\tmongo\tlucene\n"
+        for name, importance, time_ms, mongo, lucene in rows:
+            table += name + "\t" + str(round(importance, 6)) + "\t" + str(round(time_ms, 3)) + "\t" + \
+                     str(round(mongo, 2)) + "\t" + str(round(lucene, 2)) + "\n"
+        table += "============================================"
+        return table
+
+    @staticmethod
+    def get_split_features(model):
+        """
+        Finds the features used in the splits of the trees of a model.
+
+        :param model: trained tree ensemble (GBRT or RF), pickled or compiled (see tree_ensemble)
+        :return: number of features of the model, sorted indices of the used features
+        """
+        if isinstance(model, TreeEnsemble):
+            return model.n_features, model.get_split_features()
+        estimators = model.estimators_
+        trees = estimators.ravel() if isinstance(estimators, numpy.ndarray) else estimators
+        used = set()
+        for tree in trees:
+            features = tree.tree_.feature
+            used.update(int(f) for f in numpy.unique(features[features >= 0]))  # leaves have negative values
+        return trees[0].tree_.n_features, sorted(used)
+
     def apply_model(self, instances, model):
         """Applies model on a given set of instances.
 
@@ -182,15 +233,20 @@ class ML(object):
         """
         print "Testing instances ... "
         if len(instances.get_all()) > 0:
-            features_names = sorted(instances.get_all()[0].features.keys())
-            for ins in instances.get_all():
-                test_x = [ins.features[ftr] for ftr in features_names]
-                if self.config.get('category', "regression") == "regression":
-                    ins.score = model.predict(test_x)[0]
-                else:  # classification
-                    ins.target = str(model.predict(test_x)[0])
-                    # "predict_proba" gets class probabilities; an array of probabilities for each class e.g.[0.99, 0.01]
-                    ins.score = model.predict_proba(test_x)[0][1]
+            ins_list = instances.get_all()
+            features_names = sorted(ins_list[0].features.keys())
+            # all instances are scored in one call: (n_samples, n_features)
+            test_x = instances.get_feature_matrix(features_names, ins_list)
+            if self.config.get('category', "regression") == "regression":
+                for ins, score in zip(ins_list, model.predict(test_x)):
+                    ins.score = score
+            else:  # classification
+                targets = model.predict(test_x)
+                # "predict_proba" gets class probabilities; an array of probabilities for each class e.g.[0.99, 0.01]
+                probs = model.predict_proba(test_x)
+                for ins, target, prob in zip(ins_list, targets, probs):
+                    ins.target = str(target)
+                    ins.score = prob[1]
         return instances
 
     def output(self, instances):
@@ -0,0 +1,322 @@
+"""
+Compiled tree ensembles for low-latency scoring.
+
+- A trained scikit-learn GBRT or RF model (regressor or classifier) is flattened into contiguous numpy arrays:
+  split feature, threshold, left and right child of each node, and the values of the leaves
+- Batches of instances are evaluated for all trees at once: each step moves every (instance, tree) pair one level
+  down, so the number of numpy operations depends on the depth of the trees, not on the number of trees
+- The compiled model has the predict/predict_proba interface of scikit-learn and can be used by ML.apply_model,
+  RankerLTR and SetDetect instead of the pickled model
+- Compiled models are saved in numpy .npz format; load_model() loads either format based on the file extension
+
+Usage:
+    python -m nordlys.ml.tree_ensemble -export -model <model_file>
+    python -m nordlys.ml.tree_ensemble -parity -model <model_file> -in <instances.json>
+    python -m nordlys.ml.tree_ensemble -bench -model <model_file> -in <instances.json> [-batch 1,10,100] [-repeat 20]
+
+@author: Krisztian Balog
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy
+from sklearn.ensemble import GradientBoostingRegressor, GradientBoostingClassifier
+from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+
+# extension of compiled model files
+COMPILED_EXT = ".npz"
+# max number of (instance, tree) pairs evaluated at once; larger batches are split
+MAX_BATCH_NODES = 2 ** 22
+
+
+class TreeEnsemble(object):
+    """
+    Attributes:
+        method: "gbrt" or "rf"
+        category: "regression" or "classification"
+        feature, threshold, left, right: arrays of all nodes of all trees; leaves point to themselves
+        value: leaf values (num_nodes, num_outputs); learning rate is included for GBRT
+        roots: root node of each tree
+        init: initial score of GBRT (num_outputs)
+        classes_: class labels (classification)
+        depth: max depth of the trees
+        n_features: number of features of the model
+        feature_names: names of the features (columns) the model is trained on; None if not known
+    """
+
+    def __init__(self, method, category, feature, threshold, left, right, value, roots, init, classes, depth,
+                 n_features, feature_names=None):
+        self.method = method
+        self.category = category
+        self.feature = numpy.ascontiguousarray(feature, dtype=numpy.int32)
+        self.threshold = numpy.ascontiguousarray(threshold, dtype=numpy.float64)
+        self.left = numpy.ascontiguousarray(left, dtype=numpy.int32)
+        self.right = numpy.ascontiguousarray(right, dtype=numpy.int32)
+        self.value = numpy.ascontiguousarray(value, dtype=numpy.float64)
+        self.roots = numpy.ascontiguousarray(roots, dtype=numpy.int32)
+        self.init = numpy.asarray(init, dtype=numpy.float64)
+        self.classes_ = numpy.asarray(classes) if classes is not None else None
+        self.depth = int(depth)
+        self.n_features = int(n_features)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Flattens a trained scikit-learn model.
+
+        :param model: GradientBoosting[Regressor|Classifier] or RandomForest[Regressor|Classifier]
+        :return TreeEnsemble
+        """
+        if isinstance(model, (GradientBoostingRegressor, GradientBoostingClassifier)):
+            method = "gbrt"
+        elif isinstance(model, (RandomForestRegressor, RandomForestClassifier)):
+            method = "rf"
+        else:
+            raise Exception("Model is not supported: " + type(model).__name__)
+        category = "classification" if isinstance(model, (GradientBoostingClassifier, RandomForestClassifier)) \
+            else "regression"
+        classes = model.classes_ if category == "classification" else None
+
+        # trees and the output column of each tree
+        if method == "gbrt":
+            num_outputs = model.estimators_.shape[1]
+            trees = [(tree, k) for stage in model.estimators_ for k, tree in enumerate(stage)]
+            n_features = trees[0][0].tree_.n_features
+            init = cls.__gbrt_init(model, n_features)
+        else:
+            num_outputs = len(classes) if category == "classification" else 1
+            trees = [(tree, None) for tree in model.estimators_]
+            n_features = trees[0][0].tree_.n_features
+            init = numpy.zeros(num_outputs)
+        if init.shape != (num_outputs,):
+            raise Exception("Initial estimator of the model is not supported")
+
+        num_nodes = sum(tree.tree_.node_count for tree, _ in trees)
+        feature = numpy.zeros(num_nodes, dtype=numpy.int32)
+        threshold = numpy.zeros(num_nodes)
+        left = numpy.zeros(num_nodes, dtype=numpy.int32)
+        right = numpy.zeros(num_nodes, dtype=numpy.int32)
+        value = numpy.zeros((num_nodes, num_outputs))
+        roots = numpy.zeros(len(trees), dtype=numpy.int32)
+        depth, offset = 0, 0
+        for i, (tree, k) in enumerate(trees):
+            t = tree.tree_
+            nodes = numpy.arange(t.node_count)
+            leaves = t.children_left < 0
+            feature[offset:offset + t.node_count] = numpy.where(leaves, 0, t.feature)
+            threshold[offset:offset + t.node_count] = t.threshold
+            left[offset:offset + t.node_count] = offset + numpy.where(leaves, nodes, t.children_left)
+            right[offset:offset + t.node_count] = offset + numpy.where(leaves, nodes, t.children_right)
+            if method == "gbrt":
+                value[offset:offset + t.node_count, k] = model.learning_rate * t.value[:, 0, 0]
+            elif category == "classification":
+                # class counts -> probabilities (as in DecisionTreeClassifier.predict_proba)
+                counts = t.value[:, 0, :]
+                normalizer = counts.sum(axis=1)
+                normalizer[normalizer == 0.0] = 1.0
+                value[offset:offset + t.node_count] = counts / normalizer[:, numpy.newaxis]
+            else:
+                value[offset:offset + t.node_count, 0] = t.value[:, 0, 0]
+            roots[i] = offset
+            depth = max(depth, t.max_depth)
+            offset += t.node_count
+        return cls(method, category, feature, threshold, left, right, value, roots, init, classes, depth, n_features,
+                   getattr(model, "feature_names", None))
+
+    @staticmethod
+    def __gbrt_init(model, n_features):
+        """Initial score of GBRT; the initial estimators (mean, prior, ...) predict a constant."""
+        x = numpy.zeros((1, n_features), dtype=numpy.float32)
+        if hasattr(model, "_raw_predict_init"):  # scikit-learn >= 0.21
+            init = model._raw_predict_init(x)
+        elif hasattr(model, "_init_decision_function"):
+            init = model._init_decision_function(x)
+        else:
+            init = model.init_.predict(x)
+        return numpy.asarray(init, dtype=numpy.float64).ravel()
+
+    def save(self, file_name):
+        """Saves the compiled model (.npz)."""
+        numpy.savez(open(file_name, "wb"), method=self.method, category=self.category, feature=self.feature,
+                    threshold=self.threshold, left=self.left, right=self.right, value=self.value, roots=self.roots,
+                    init=self.init, classes=numpy.array(self.classes_.tolist() if self.classes_ is not None else []),
+                    depth=self.depth, n_features=self.n_features,
+                    feature_names=numpy.array(self.feature_names if self.feature_names is not None else []))
+        print "Compiled model:\t" + file_name
+
+    @classmethod
+    def load(cls, file_name):
+        data = numpy.load(file_name)
+        category = str(data['category'])
+        return cls(str(data['method']), category, data['feature'], data['threshold'], data['left'], data['right'],
+                   data['value'], data['roots'], data['init'],
+                   data['classes'] if category == "classification" else None, data['depth'], data['n_features'],
+                   [str(name) for name in data['feature_names']] if 'feature_names' in data.files and
+                   len(data['feature_names']) > 0 else None)
+
+    def get_split_features(self):
+        """Returns sorted indices of the features used in the splits (see ML.get_split_features)."""
+        splits = self.left != numpy.arange(len(self.left))
+        return sorted(int(f) for f in numpy.unique(self.feature[splits]))
+
+    def __sum_leaves(self, x):
+        """Sum of the leaf values of all trees: (n_samples, num_outputs)."""
+        # features are compared in float32, as in scikit-learn trees
+        x = numpy.asarray(x, dtype=numpy.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        if x.shape[1] != self.n_features:
+            raise Exception("Number of features is " + str(x.shape[1]) + "; the model has " + str(self.n_features))
+        sums = numpy.zeros((len(x), self.value.shape[1]))
+        batch_size = max(MAX_BATCH_NODES // len(self.roots), 1)
+        for start in range(0, len(x), batch_size):
+            x_batch = x[start:start + batch_size]
+            rows = numpy.arange(len(x_batch))[:, numpy.newaxis]
+            nodes = numpy.tile(self.roots, (len(x_batch), 1))
+            for _ in range(self.depth):
+                go_left = x_batch[rows, self.feature[nodes]] <= self.threshold[nodes]
+                nodes = numpy.where(go_left, self.left[nodes], self.right[nodes])
+            sums[start:start + batch_size] = self.value[nodes].sum(axis=1)
+        return sums
+
+    def decision_function(self, x):
+        """
+        Raw scores of the instances: the sum of trees for GBRT, average of trees for RF.
+
+        :param x: feature matrix (n_samples, n_features)
+        :return: (n_samples, num_outputs)
+        """
+        if self.method == "gbrt":
+            return self.init + self.__sum_leaves(x)
+        return self.__sum_leaves(x) / len(self.roots)
+
+    def predict_proba(self, x):
+        if self.category != "classification":
+            raise Exception("predict_proba is only available for classifiers")
+        scores = self.decision_function(x)
+        if self.method == "rf":
+            return scores
+        if scores.shape[1] == 1:  # binomial deviance
+            probs = 1.0 / (1.0 + numpy.exp(-scores[:, 0]))
+            return numpy.column_stack([1.0 - probs, probs])
+        exp_scores = numpy.exp(scores - scores.max(axis=1)[:, numpy.newaxis])  # multinomial deviance
+        return exp_scores / exp_scores.sum(axis=1)[:, numpy.newaxis]
+
+    def predict(self, x):
+        if self.category == "classification":
+            return self.classes_.take(numpy.argmax(self.predict_proba(x), axis=1))
+        return self.decision_function(x)[:, 0]
+
+
+def load_model(model_file):
+    """Loads a compiled (.npz) or pickled model."""
+    if model_file.endswith(COMPILED_EXT):
+        return TreeEnsemble.load(model_file)
+    return pickle.loads(open(model_file, "r").read())
+
+
+def export_model(model_file, compiled_file=None):
+    """
+    Compiles a pickled model and saves it next to the model file (<model_file>.npz).
+
+    :return: name of the compiled model file
+    """
+    if compiled_file is None:
+        compiled_file = model_file + COMPILED_EXT
+    TreeEnsemble.from_model(load_model(model_file)).save(compiled_file)
+    return compiled_file
+
+
+def get_test_matrix(json_file):
+    """Feature matrix of the instances (features in sorted order, as used for training)."""
+    from nordlys.ml.instances import Instances
+    inss = Instances.from_json(json_file)
+    ins_list = inss.get_all()
+    if len(ins_list) == 0:
+        raise Exception("No instances in " + json_file)
+    return inss.get_feature_matrix(sorted(ins_list[0].features.keys()), ins_list)
+
+
+def check_parity(model, compiled, x):
+    """
+    Compares the predictions of the compiled model with the original model.
+
+    :return report string
+    """
+    report = "Instances:\t" + str(len(x)) + "\n"
+    if compiled.category == "classification":
+        diff = numpy.abs(model.predict_proba(x) - compiled.predict_proba(x)).max()
+        mismatches = numpy.sum(model.predict(x) != compiled.predict(x))
+        report += "Max diff of probabilities:\t" + str(diff) + "\n"
+        report += "Mismatched classes:\t" + str(mismatches)
+    else:
+        diff = numpy.abs(model.predict(x) - compiled.predict(x)).max()
+        report += "Max diff of scores:\t" + str(diff)
+    return report
+
+
+def benchmark(model, compiled, x, batch_sizes, repeat):
+    """
+    Measures scoring latency of the original and compiled models for the given batch sizes.
+
+    :return report string
+    """
+    def score(m, x_batch):
+        m.predict(x_batch)
+        if compiled.category == "classification":
+            m.predict_proba(x_batch)
+
+    report = "batch\toriginal(ms)\tcompiled(ms)\tspeedup\n"
+    for batch_size in batch_sizes:
+        x_batch = x[numpy.arange(batch_size) % len(x)]
+        times = []
+        for m in [model, compiled]:
+            score(m, x_batch)  # warm up
+            s_t = time.time()
+            for _ in range(repeat):
+                score(m, x_batch)
+            times.append(1000.0 * (time.time() - s_t) / repeat)
+        report += str(batch_size) + "\t" + str(round(times[0], 3)) + "\t" + str(round(times[1], 3)) + "\t" + \
+                  str(round(times[0] / max(times[1], 1e-9), 1)) + "\n"
+    return report
+
+
+def main(args):
+    """
+    Required args for export:           -export -model <model_file>
+    Required args for parity test:      -parity -model <model_file> -in <instances.json>
+    Required args for benchmark:        -bench -model <model_file> -in <instances.json>
+    Valid args for benchmark:           -batch <int,int,...> -repeat <int>
+    """
+    if args.export:
+        export_model(args.model, args.out)
+        return
+
+    if args.input is None:
+        raise Exception("Instances file (-in) is required for the parity test and benchmark")
+    model = load_model(args.model)
+    compiled = TreeEnsemble.from_model(model)
+    x = get_test_matrix(args.input)
+    if args.parity:
+        print check_parity(model, compiled, x)
+    elif args.bench:
+        batch_sizes = [int(b) for b in args.batch.replace(" ", "").split(",")]
+        print benchmark(model, compiled, x, batch_sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-export", help="Compile a pickled model", action="store_true", default=False)
+    parser.add_argument("-parity", help="Compare predictions of the compiled and pickled model", action="store_true",
+                        default=False)
+    parser.add_argument("-bench", help="Scoring latency of the compiled and pickled model", action="store_true",
+                        default=False)
+    parser.add_argument("-model", help="Pickled model file", type=str, required=True)
+    parser.add_argument("-out", help="Compiled model file (default: <model_file>.npz)", type=str)
+    parser.add_argument("-in", "--input", help="Instances file (JSON)", type=str)
+    parser.add_argument("-batch", help="Batch sizes (comma separated)", type=str, default="1,10,100,1000")
+    parser.add_argument("-repeat", help="Number of repeats per batch size", type=int, default=20)
+    main(parser.parse_args())
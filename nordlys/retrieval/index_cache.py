@@ -4,22 +4,52 @@ This a layer between scorer and Lucene index, which gives all the values needed
 @author: Faegheh Hasibi
 """
 
+import time
 from nordlys.retrieval.lucene_tools import Lucene
 
 
 class IndexCache(Lucene):
-    def __init__(self, index_dir, use_ram=False, jvm_ram=None, mongo_fields=None, cache_doc_freq=False):
-        super(IndexCache, self).__init__(index_dir, use_ram=use_ram, jvm_ram=jvm_ram)
-        self.n_docs = None
+    def __init__(self, index_dir, use_ram=False, jvm_ram=None, mongo_fields=None, cache_doc_freq=False,
+                 use_mmap=False, refresh_interval=None):
+        """
+        :param refresh_interval: if set, maybe_refresh() reopens the reader (at most once in every refresh_interval
+                                 seconds) when the index has been changed, e.g., by incremental indexing
+        """
+        super(IndexCache, self).__init__(index_dir, use_ram=use_ram, jvm_ram=jvm_ram, use_mmap=use_mmap)
         self.mongo_fields = mongo_fields
         self.cache_doc_freq = cache_doc_freq  # If true, caches doc term freq
-        # Caching variables
+        self.refresh_interval = refresh_interval
+        self.last_refresh = time.time()
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Clears all cached values."""
+        self.n_docs = None
         self.doc_ids = dict()
         self.coll_termfreq = dict()
         self.doc_termfreq = dict()
         self.coll_length = dict()
         self.avg_len = dict()
 
+    def refresh(self):
+        """Reopens the reader if the index has been changed; cached values are cleared if so."""
+        self.last_refresh = time.time()
+        if super(IndexCache, self).refresh():
+            self.clear_cache()
+            return True
+        return False
+
+    def maybe_refresh(self):
+        """
+        Refreshes the index if refresh_interval is set and elapsed since the last refresh.
+        Should be called between queries (internal document ids may change).
+
+        :return: True if the reader has been reopened
+        """
+        if (self.refresh_interval is None) or (time.time() - self.last_refresh < self.refresh_interval):
+            return False
+        return self.refresh()
+
     def num_docs(self):
         if self.n_docs is None:
             self.n_docs = super(IndexCache, self).num_docs()
@@ -47,6 +77,22 @@ class IndexCache(Lucene):
                 self.doc_termfreq[lucene_doc_id][field] = termfreqs
             return self.doc_termfreq[lucene_doc_id][field]
 
+    def get_doc_termfreqs_fields(self, lucene_doc_id, fields):
+        """
+        Returns term frequencies for the given document fields (read in one call).
+        By default, doc termfreq is not cached.
+        """
+        if not self.cache_doc_freq:
+            return super(IndexCache, self).get_doc_termfreqs_fields(lucene_doc_id, fields)
+        else:
+            if lucene_doc_id not in self.doc_termfreq:
+                self.doc_termfreq[lucene_doc_id] = dict()
+            missing = [field for field in fields if field not in self.doc_termfreq[lucene_doc_id]]
+            if len(missing) > 0:
+                termfreqs = super(IndexCache, self).get_doc_termfreqs_fields(lucene_doc_id, missing)
+                self.doc_termfreq[lucene_doc_id].update(termfreqs)
+            return dict((field, self.doc_termfreq[lucene_doc_id][field]) for field in fields)
+
     def get_coll_termfreq(self, term, field):
         """Returns collection term frequency for the given field."""
         if field not in self.coll_termfreq:
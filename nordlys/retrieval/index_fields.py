@@ -0,0 +1,22 @@
+"""
+Field names and field types shared by the index engines (Lucene, MemIndex).
+
+- Kept separately from lucene_tools, so that code using only these constants (e.g., scorers) does not need PyLucene
+
+@author: Faegheh Hasibi
+"""
+
+
+class IndexFields(object):
+
+    # default fieldnames for id and contents
+    FIELDNAME_ID = "id"
+    FIELDNAME_CONTENTS = "contents"
+
+    # internal fieldtypes
+    # used as Enum, the actual values don't matter
+    FIELDTYPE_ID = "id"
+    FIELDTYPE_ID_TV = "id_tv"
+    FIELDTYPE_TEXT = "text"
+    FIELDTYPE_TEXT_TV = "text_tv"
+    FIELDTYPE_TEXT_TVP = "text_tvp"
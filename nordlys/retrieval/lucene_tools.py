@@ -10,10 +10,17 @@ All Lucene features should be accessed in nordlys through this class.
 @author: Faegheh Hasibi
 """
 import argparse
+import ctypes
+import ctypes.util
+import mmap
+import os
+import time
 
 import sys
+import zlib
 import lucene
 from nordlys.storage.mongo import Mongo
+from nordlys.retrieval.index_fields import IndexFields
 from nordlys.retrieval.results import RetrievalResults
 from java.io import File
 from org.apache.lucene.analysis.standard import StandardAnalyzer
@@ -25,7 +32,9 @@ from org.apache.lucene.index import MultiFields
 from org.apache.lucene.index import IndexWriter
 from org.apache.lucene.index import IndexWriterConfig
 from org.apache.lucene.index import DirectoryReader 
+from org.apache.lucene.index import MultiReader
 from org.apache.lucene.index import Term
+from org.apache.lucene.index import TieredMergePolicy
 from org.apache.lucene.queryparser.classic import QueryParser
 from org.apache.lucene.search import IndexSearcher
 from org.apache.lucene.search import BooleanClause
@@ -37,6 +46,7 @@ from org.apache.lucene.search.similarities import LMJelinekMercerSimilarity
 from org.apache.lucene.search.similarities import LMDirichletSimilarity
 from org.apache.lucene.search.similarities import Similarity
 from org.apache.lucene.store import SimpleFSDirectory
+from org.apache.lucene.store import MMapDirectory
 from org.apache.lucene.store import RAMDirectory
 from org.apache.lucene.util import BytesRefIterator
 from org.apache.lucene.util import Version
@@ -44,26 +54,96 @@ from org.apache.lucene.search import DocIdSetIterator
 from org.apache.lucene.analysis.tokenattributes import CharTermAttribute
 from org.apache.lucene.index import AtomicReader
 from org.apache.lucene.store import IOContext
+from java.util.concurrent import Executors
 
 # has java VM for Lucene been initialized
 lucene_vm_init = False
 
+# sub-directories of a sharded index: <index_dir>/shard-0, <index_dir>/shard-1, ...
+SHARD_PREFIX = "shard-"
+
+# chunk size for touching index files during warm-up
+WARM_UP_CHUNK = 64 * 1024 * 1024
+
+
+def get_shard_dirs(index_dir):
+    """Returns the shard directories of a sharded index (sorted by shard number), or empty list if not sharded."""
+    shards = []
+    if os.path.isdir(index_dir):
+        for name in os.listdir(index_dir):
+            if name.startswith(SHARD_PREFIX) and name[len(SHARD_PREFIX):].isdigit():
+                shards.append((int(name[len(SHARD_PREFIX):]), os.path.join(index_dir, name)))
+    return [shard_dir for _, shard_dir in sorted(shards)]
+
+
+def get_shard(doc_id, num_shards):
+    """Returns the shard number of a document (based on the crc32 hash of its id)."""
+    if isinstance(doc_id, unicode):
+        doc_id = doc_id.encode("utf-8")
+    return (zlib.crc32(doc_id) & 0xffffffff) % num_shards
+
+
+def touch_file(file_name):
+    """
+    Reads one byte of every page of the file (through mmap), so that the file gets into the page cache.
+
+    :return: file size in bytes
+    """
+    size = os.path.getsize(file_name)
+    if size == 0:
+        return 0
+    with open(file_name, "rb") as f:
+        m = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        for start in xrange(0, size, WARM_UP_CHUNK):
+            m[start:min(start + WARM_UP_CHUNK, size):mmap.PAGESIZE]
+        m.close()
+    return size
+
+
+def get_resident_bytes(file_name):
+    """
+    Returns number of bytes of the file that are in the page cache (using mincore).
+
+    :return: number of bytes, or None if it can not be determined (e.g., mincore is not available)
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.mmap.restype = ctypes.c_void_p
+        libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                              ctypes.c_long]
+        libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+        size = os.path.getsize(file_name)
+        if size == 0:
+            return 0
+        with open(file_name, "rb") as f:
+            addr = libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, f.fileno(), 0)
+            if addr is None or addr == ctypes.c_void_p(-1).value:
+                return None
+            n_pages = (size + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+            vec = (ctypes.c_ubyte * n_pages)()
+            ret = libc.mincore(addr, size, vec)
+            libc.munmap(addr, size)
+        if ret != 0:
+            return None
+        return min(sum(1 for v in vec if v & 1) * mmap.PAGESIZE, size)
+    except (AttributeError, OSError, TypeError):
+        return None
 
-class Lucene(object):
 
-    # default fieldnames for id and contents
-    FIELDNAME_ID = "id"
-    FIELDNAME_CONTENTS = "contents"
+class Lucene(IndexFields):
+    """Field names and types (FIELDNAME_*, FIELDTYPE_*) are defined in IndexFields."""
 
-    # internal fieldtypes
-    # used as Enum, the actual values don't matter
-    FIELDTYPE_ID = "id"
-    FIELDTYPE_ID_TV = "id_tv"
-    FIELDTYPE_TEXT = "text"
-    FIELDTYPE_TEXT_TV = "text_tv"
-    FIELDTYPE_TEXT_TVP = "text_tvp"
+    # index files read during warm-up: term dictionary (.tim, .tip), term vectors (.tvd, .tvx), compound files
+    WARM_UP_EXTENSIONS = [".tim", ".tip", ".tvd", ".tvx", ".cfs"]
 
-    def __init__(self, index_dir, use_ram=False, jvm_ram=None):
+    def __init__(self, index_dir, use_ram=False, jvm_ram=None, use_mmap=False):
+        """
+        :param index_dir: index directory
+        :param use_ram: if True, the index is copied into a RAMDirectory (on the JVM heap)
+        :param jvm_ram: max heap size of the JVM, e.g., "8g"
+        :param use_mmap: if True, index files are memory-mapped (MMapDirectory); the OS page cache holds the index
+        """
         global lucene_vm_init
         if not lucene_vm_init:
             if jvm_ram:
@@ -73,19 +153,67 @@ class Lucene(object):
             else:
                 lucene.initVM(vmargs=['-Djava.awt.headless=true'])
             lucene_vm_init = True
-        self.dir = SimpleFSDirectory(File(index_dir))
+        self.index_dir = index_dir
+        # a sharded index is opened as a single (multi-)reader; statistics are aggregated over all shards
+        self.shard_dirs = get_shard_dirs(index_dir)
+        self.dirs = []
+        for d in self.shard_dirs if len(self.shard_dirs) > 0 else [index_dir]:
+            self.dirs.append(MMapDirectory(File(d)) if use_mmap else SimpleFSDirectory(File(d)))
+        if use_mmap:
+            print "Using mmap directory..."
+        if len(self.shard_dirs) > 0:
+            print "Sharded index (" + str(len(self.shard_dirs)) + " shards)"
+        self.dir = self.dirs[0]
 
         self.use_ram = use_ram
         if use_ram:
             print "Using ram directory..."
-            self.ram_dir = RAMDirectory(self.dir, IOContext.DEFAULT)
+            self.ram_dirs = [RAMDirectory(d, IOContext.DEFAULT) for d in self.dirs]
+            self.ram_dir = self.ram_dirs[0]
+        self.executor = None
         self.analyzer = None
+        self.sub_readers = []
         self.reader = None
         self.searcher = None
         self.writer = None
         self.ldf = None
         print "Connected to index " + index_dir
 
+    def warm_up(self, fields=None, extensions=WARM_UP_EXTENSIONS):
+        """
+        Reads term dictionaries and term vectors into the page cache, and loads statistics of the given fields.
+        Intended for memory-mapped indices (use_mmap), so that the first queries do not hit the disk.
+
+        :param fields: fields used by the scorers (their collection statistics are loaded)
+        :param extensions: extensions of the index files to be read
+        :return: (warm-up time in seconds, bytes touched, bytes resident in page cache or None if unknown)
+        """
+        s_t = time.time()
+        touched = 0
+        file_names = []
+        for index_dir in self.shard_dirs if len(self.shard_dirs) > 0 else [self.index_dir]:
+            for file_name in sorted(os.listdir(index_dir)):
+                if os.path.splitext(file_name)[1] in extensions:
+                    file_names.append(os.path.join(index_dir, file_name))
+                    touched += touch_file(file_names[-1])
+        self.open_searcher()
+        for field in fields if fields is not None else []:
+            self.get_coll_length(field)
+            self.get_avg_len(field)
+        warm_up_time = time.time() - s_t
+
+        resident = 0
+        for file_name in file_names:
+            file_resident = get_resident_bytes(file_name)
+            if file_resident is None:
+                resident = None
+                break
+            resident += file_resident
+        print "Warm-up " + self.index_dir + ": " + str(round(warm_up_time, 2)) + " sec, " + \
+              str(touched / (1024 * 1024)) + " MB touched, " + \
+              (str(resident / (1024 * 1024)) + " MB resident" if resident is not None else "resident size unknown")
+        return warm_up_time, touched, resident
+
     def get_version(self):
         """Get Lucene version."""
         return Version.LUCENE_48
@@ -97,12 +225,20 @@ class Lucene(object):
         return self.analyzer
 
     def open_reader(self):
-        """Open IndexReader."""
-        if self.use_ram:
-            print "reading from ram directory ..."
-            self.reader = DirectoryReader.open(self.ram_dir)
+        """Open IndexReader (a MultiReader over the shards for sharded indices)."""
         if self.reader is None:
-            self.reader = DirectoryReader.open(self.dir)
+            if self.use_ram:
+                print "reading from ram directory ..."
+            dirs = self.ram_dirs if self.use_ram else self.dirs
+            self.sub_readers = [DirectoryReader.open(d) for d in dirs]
+            self.reader = self.__get_multi_reader(self.sub_readers)
+
+    @staticmethod
+    def __get_multi_reader(sub_readers):
+        """Returns a single reader over the given readers (sub-readers are closed separately)."""
+        if len(sub_readers) == 1:
+            return sub_readers[0]
+        return MultiReader(sub_readers, False)
 
     def get_reader(self):
         return self.reader
@@ -110,20 +246,58 @@ class Lucene(object):
     def close_reader(self):
         """Close IndexReader."""
         if self.reader is not None:
-            self.reader.close()
+            if len(self.sub_readers) > 1:
+                self.reader.close()
+            for sub_reader in self.sub_readers:
+                sub_reader.close()
             self.reader = None
+            self.sub_readers = []
+            self.searcher = None
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
         else:
             raise Exception("There is no open IndexReader to close")
 
+    def refresh(self):
+        """
+        Reopens the IndexReader (and searcher) if the index has been changed (i.e., committed) since it was opened.
+        Internal document ids of the old reader are not valid after the reopen.
+
+        :return: True if the reader has been reopened
+        """
+        if self.reader is None:
+            return False
+        new_readers = [DirectoryReader.openIfChanged(r) for r in self.sub_readers]
+        if all(r is None for r in new_readers):
+            return False
+        if len(self.sub_readers) > 1:
+            self.reader.close()
+        for i, new_reader in enumerate(new_readers):
+            if new_reader is not None:
+                self.sub_readers[i].close()
+                self.sub_readers[i] = new_reader
+        self.reader = self.__get_multi_reader(self.sub_readers)
+        if self.searcher is not None:
+            self.searcher = IndexSearcher(self.reader, self.executor) if self.executor is not None \
+                else IndexSearcher(self.reader)
+        print "Index reopened: " + self.index_dir
+        return True
+
     def open_searcher(self):
         """
         Open IndexSearcher. Automatically opens an IndexReader too,
         if it is not already open. There is no close method for the
         searcher.
+        For sharded indices, the shards are searched in parallel and the top hits are merged.
         """
         if self.searcher is None:
             self.open_reader()
-            self.searcher = IndexSearcher(self.reader)
+            if len(self.dirs) > 1:
+                self.executor = Executors.newFixedThreadPool(len(self.dirs))
+                self.searcher = IndexSearcher(self.reader, self.executor)
+            else:
+                self.searcher = IndexSearcher(self.reader)
 
     def get_searcher(self):
         """Returns index searcher (opens it if needed)."""
@@ -148,15 +322,48 @@ class Lucene(object):
             raise Exception("Searcher has not been created")
         self.searcher.setSimilarity(similarity)
 
-    def open_writer(self):
-        """Open IndexWriter."""
+    def open_writer(self, ram_buffer_mb=None, max_thread_states=None, segments_per_tier=None, append=False):
+        """
+        Open IndexWriter.
+
+        :param ram_buffer_mb: RAM buffer size (MB) before flushing a segment (Lucene default: 16)
+        :param max_thread_states: max number of threads indexing concurrently (Lucene default: 8)
+        :param segments_per_tier: segments per tier (and max segments merged at once) of TieredMergePolicy;
+                                  higher values mean less merging during indexing (Lucene default: 10)
+        :param append: if True, the existing index is opened for updates (otherwise a new index is created)
+        """
+        if len(self.shard_dirs) > 0:
+            raise Exception("Index is sharded; use ShardedWriter for writing")
         if self.writer is None:
             config = IndexWriterConfig(self.get_version(), self.get_analyzer())
-            config.setOpenMode(IndexWriterConfig.OpenMode.CREATE)
+            if append:
+                config.setOpenMode(IndexWriterConfig.OpenMode.CREATE_OR_APPEND)
+            else:
+                config.setOpenMode(IndexWriterConfig.OpenMode.CREATE)
+            if ram_buffer_mb is not None:
+                config.setRAMBufferSizeMB(float(ram_buffer_mb))
+            if max_thread_states is not None:
+                config.setMaxThreadStates(max_thread_states)
+            if segments_per_tier is not None:
+                merge_policy = TieredMergePolicy()
+                merge_policy.setSegmentsPerTier(float(segments_per_tier))
+                merge_policy.setMaxMergeAtOnce(segments_per_tier)
+                config.setMergePolicy(merge_policy)
             self.writer = IndexWriter(self.dir, config)
         else:
             raise Exception("IndexWriter is already open")
 
+    def force_merge(self, max_num_segments=1):
+        """Merges the index down to (at most) the given number of segments."""
+        if self.writer is None:
+            raise Exception("There is no open IndexWriter")
+        self.writer.forceMerge(max_num_segments)
+
+    @staticmethod
+    def attach_current_thread():
+        """Attaches the current (Python) thread to the JVM; needed before using Lucene from a new thread."""
+        lucene.getVMEnv().attachCurrentThread()
+
     def close_writer(self):
         """Close IndexWriter."""
         if self.writer is not None:
@@ -174,6 +381,24 @@ class Lucene(object):
             self.ldf = LuceneDocument()
         self.writer.addDocument(self.ldf.create_document(contents))
 
+    def update_document(self, contents):
+        """
+        Replaces the document with the same id (FIELDNAME_ID) or adds it if it is not in the index.
+        See LuceneDocument.create_document() for the explanation of contents.
+        """
+        if self.ldf is None:
+            self.ldf = LuceneDocument()
+        doc_id = get_contents_id(contents)
+        self.writer.updateDocument(Term(self.FIELDNAME_ID, doc_id), self.ldf.create_document(contents))
+
+    def delete_document(self, doc_id):
+        """Deletes the document with the given id (if exists)."""
+        self.writer.deleteDocuments(Term(self.FIELDNAME_ID, doc_id))
+
+    def commit(self):
+        """Commits changes of the IndexWriter (readers see them after refresh)."""
+        self.writer.commit()
+
     def get_lucene_document_id(self, doc_id):
         """Loads a document from a Lucene index based on its id."""
         self.open_searcher()
@@ -215,7 +440,7 @@ class Lucene(object):
                         print term + " : " + str(termfreqs[term])
                     print "-----"
 
-    def get_lucene_query(self, query, field=FIELDNAME_CONTENTS):
+    def get_lucene_query(self, query, field=IndexFields.FIELDNAME_CONTENTS):
         """Creates Lucene query from keyword query."""
         """
         @todo this is temp fix
@@ -226,7 +451,7 @@ class Lucene(object):
         return QueryParser(self.get_version(), field,
                            self.get_analyzer()).parse(query)
 
-    def analyze_query(self, query, field=FIELDNAME_CONTENTS):
+    def analyze_query(self, query, field=IndexFields.FIELDNAME_CONTENTS):
         """
         Analyses the query and returns query terms
 
@@ -265,6 +490,16 @@ class Lucene(object):
             bq.add(q, BooleanClause.Occur.SHOULD)
         return bq
 
+    def get_and_count(self, terms, field):
+        """Returns number of documents containing all the given (not analyzed) terms in the field."""
+        term_queries = [self.get_id_lookup_query(term, field) for term in terms]
+        return self.get_searcher().search(self.get_and_query(term_queries), 1).totalHits
+
+    def get_or_count(self, terms, field):
+        """Returns number of documents containing at least one of the given (not analyzed) terms in the field."""
+        term_queries = [self.get_id_lookup_query(term, field) for term in terms]
+        return self.get_searcher().search(self.get_or_query(term_queries), 1).totalHits
+
     def get_phrase_query(self, query, field):
         """Creates phrase query for searching exact phrase."""
         phq = PhraseQuery()
@@ -275,7 +510,7 @@ class Lucene(object):
     def get_id_filter(self):
         return FieldValueFilter(self.FIELDNAME_ID)
 
-    def __to_retrieval_results(self, scoredocs, field_id=FIELDNAME_ID):
+    def __to_retrieval_results(self, scoredocs, field_id=IndexFields.FIELDNAME_ID):
         """Convert Lucene scoreDocs results to RetrievalResults format."""
         rr = RetrievalResults()
         if scoredocs is not None:
@@ -286,7 +521,8 @@ class Lucene(object):
                 rr.append(doc_id, score, lucene_doc_id)
         return rr
 
-    def score_query(self, query, field_content=FIELDNAME_CONTENTS, field_id=FIELDNAME_ID, num_docs=100):
+    def score_query(self, query, field_content=IndexFields.FIELDNAME_CONTENTS, field_id=IndexFields.FIELDNAME_ID,
+                    num_docs=100):
         """Score a given query and return results as a RetrievalScores object."""
         lucene_query = self.get_lucene_query(query, field_content)
         scoredocs = self.searcher.search(lucene_query, num_docs).scoreDocs
@@ -317,6 +553,46 @@ class Lucene(object):
             termfreqs[term] = int(termenum.totalTermFreq())
         return termfreqs
 
+    @staticmethod
+    def __get_termfreqs(terms):
+        """Returns term frequencies from a Lucene Terms object (i.e., term vector of a document field)."""
+        termfreqs = {}
+        if terms:
+            termenum = terms.iterator(None)
+            total_term_freq = termenum.totalTermFreq
+            for bytesref in BytesRefIterator.cast_(termenum):
+                termfreqs[bytesref.utf8ToString()] = int(total_term_freq())
+        return termfreqs
+
+    def get_doc_termfreqs_fields(self, lucene_doc_id, fields):
+        """
+        Returns term frequencies for the given fields of a document.
+        Term vectors of the document are read only once (getTermVector reads them for each field).
+
+        :param lucene_doc_id: Lucene document ID
+        :param fields: list of document fields
+        :return: dictionary {field: {term: freq, ...}, ...}; empty dictionary for fields without term vector
+        """
+        doc_termfreqs = {}
+        vectors = self.reader.getTermVectors(lucene_doc_id)
+        for field in fields:
+            doc_termfreqs[field] = self.__get_termfreqs(vectors.terms(field)) if vectors else {}
+        return doc_termfreqs
+
+    def get_docs_termfreqs_fields(self, lucene_doc_ids, fields):
+        """
+        Returns term frequencies for the given fields of multiple documents.
+        Documents are read in the order of their internal ids.
+
+        :param lucene_doc_ids: list of Lucene document IDs
+        :param fields: list of document fields
+        :return: dictionary {lucene_doc_id: {field: {term: freq, ...}, ...}, ...}
+        """
+        docs_termfreqs = {}
+        for lucene_doc_id in sorted(set(lucene_doc_ids)):
+            docs_termfreqs[lucene_doc_id] = self.get_doc_termfreqs_fields(lucene_doc_id, fields)
+        return docs_termfreqs
+
     def get_doc_termfreqs_all_fields(self, lucene_doc_id):
         """
         Returns term frequency for all fields in the given document.
@@ -328,16 +604,9 @@ class Lucene(object):
         vectors = self.reader.getTermVectors(lucene_doc_id)
         if vectors:
             for field in vectors.iterator():
-                doc_termfreqs[field] = {}
-                terms = vectors.terms(field)
-                if terms:
-                    termenum = terms.iterator(None)
-                    for bytesref in BytesRefIterator.cast_(termenum):
-                        doc_termfreqs[field][bytesref.utf8ToString()] = int(termenum.totalTermFreq())
-                    print doc_termfreqs[field]
+                doc_termfreqs[field] = self.__get_termfreqs(vectors.terms(field))
         return doc_termfreqs
 
-
     # def get_doc_length(self, lucene_doc_id, field):
     #     """ Returns length of document for the given field."""
     #     # this returns -1, as the information is not saved in terms.
@@ -389,6 +658,80 @@ class Lucene(object):
 
 
 
+class ShardedWriter(object):
+    """
+    Writes documents into N shards (<index_dir>/shard-i); documents are routed by the hash of their id.
+    Has the same writer API as Lucene (open_writer, add_document, close_writer).
+    """
+
+    def __init__(self, index_dir, num_shards, use_ram=False, jvm_ram=None):
+        if num_shards < 1:
+            raise Exception("Number of shards should be at least 1")
+        self.index_dir = index_dir
+        self.num_shards = num_shards
+        self.shards = [Lucene(os.path.join(index_dir, SHARD_PREFIX + str(i)), use_ram=use_ram, jvm_ram=jvm_ram)
+                       for i in range(num_shards)]
+
+    def open_writer(self, ram_buffer_mb=None, max_thread_states=None, segments_per_tier=None, append=False):
+        """Opens IndexWriter for all shards (the RAM buffer is split between the shards)."""
+        if ram_buffer_mb is not None:
+            ram_buffer_mb = ram_buffer_mb / float(self.num_shards)
+        for shard in self.shards:
+            shard.open_writer(ram_buffer_mb, max_thread_states, segments_per_tier, append)
+
+    def force_merge(self, max_num_segments=1):
+        """Merges each shard down to (at most) the given number of segments."""
+        for shard in self.shards:
+            shard.force_merge(max_num_segments)
+
+    def add_document(self, contents):
+        """Adds document to its shard. See LuceneDocument.create_document() for the explanation of contents."""
+        self.shards[get_shard(get_contents_id(contents), self.num_shards)].add_document(contents)
+
+    def update_document(self, contents):
+        """Replaces (or adds) the document in its shard."""
+        self.shards[get_shard(get_contents_id(contents), self.num_shards)].update_document(contents)
+
+    def delete_document(self, doc_id):
+        """Deletes the document from its shard."""
+        self.shards[get_shard(doc_id, self.num_shards)].delete_document(doc_id)
+
+    def commit(self):
+        """Commits changes of all shards."""
+        for shard in self.shards:
+            shard.commit()
+
+    def close_writer(self):
+        """Closes IndexWriter of all shards."""
+        for shard in self.shards:
+            shard.close_writer()
+
+
+def open_index_writer(index_dir, num_shards=1, ram_buffer_mb=None, max_thread_states=None, segments_per_tier=None,
+                      append=False):
+    """
+    Returns a Lucene object (or ShardedWriter for more than one shard) with an open IndexWriter.
+
+    :param index_dir: index directory
+    :param num_shards: number of shards
+    :param ram_buffer_mb, max_thread_states, segments_per_tier, append: IndexWriter settings (see Lucene.open_writer)
+    """
+    if num_shards > 1:
+        writer = ShardedWriter(index_dir, num_shards)
+    else:
+        writer = Lucene(index_dir)
+    writer.open_writer(ram_buffer_mb, max_thread_states, segments_per_tier, append)
+    return writer
+
+
+def get_contents_id(contents):
+    """Returns the id (value of FIELDNAME_ID) of document contents."""
+    for f in contents:
+        if f['field_name'] == Lucene.FIELDNAME_ID:
+            return f['field_value']
+    raise Exception("Document without " + Lucene.FIELDNAME_ID + " field")
+
+
 class LuceneDocument(object):
     """Internal representation of a Lucene document"""
 
@@ -0,0 +1,528 @@
+"""
+In-memory index engine, implementing the subset of the Lucene/IndexCache API used by scorers and features.
+
+- No PyLucene/JVM is needed; postings and term vectors are stored in compact numpy arrays (CSR format)
+- Documents are added using the same API as Lucene (open_writer, add_document, close_writer)
+- The index is saved as .npy files in the index directory and loaded as memory-mapped arrays
+- The analyzer approximates Lucene's StandardAnalyzer (word tokens, lowercasing, English stopwords)
+- score_query approximates Lucene's DefaultSimilarity (tf-idf), without the lossy encoding of length norms
+- Only the id field (FIELDNAME_ID) is stored; values of other fields are not kept
+
+Usage (same as Lucene):
+    index = MemIndex(index_dir)
+    index.open_writer()
+    index.add_document(contents)
+    index.close_writer()  # saves the index
+    ...
+    MemIndex(index_dir).get_coll_termfreq(term, field)
+
+@author: Faegheh Hasibi
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from bisect import bisect_left
+
+import numpy
+from nordlys.retrieval.index_fields import IndexFields
+from nordlys.retrieval.results import RetrievalResults
+
+# English stop words of Lucene's StandardAnalyzer
+STOP_WORDS = frozenset(["a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it",
+                        "no", "not", "of", "on", "or", "such", "that", "the", "their", "then", "there", "these",
+                        "they", "this", "to", "was", "will", "with"])
+TOKEN_RE = re.compile(r"\w+(?:['.]\w+)*", re.UNICODE)
+MAX_TOKEN_LENGTH = 255
+
+
+def to_utf8(s):
+    """Returns utf-8 encoded string (terms and ids are stored in utf-8)."""
+    if isinstance(s, unicode):
+        return s.encode("utf-8")
+    return str(s)
+
+
+def load_array(file_name, mmap_mode="r"):
+    """Loads a numpy array; empty arrays can not be memory-mapped."""
+    try:
+        return numpy.load(file_name, mmap_mode=mmap_mode)
+    except ValueError:
+        return numpy.load(file_name)
+
+
+def intersect_sorted(a, b):
+    """Returns intersection of two sorted arrays of unique values (binary search of the shorter in the longer)."""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return a
+    idx = numpy.minimum(numpy.searchsorted(b, a), len(b) - 1)
+    return a[b[idx] == a]
+
+
+class StringArray(object):
+    """Read-only array of utf-8 strings, stored as a byte blob and offsets."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def build(strings):
+        """
+        Creates array from a list of utf-8 strings.
+
+        :param strings: list of (utf-8 encoded) strings
+        """
+        offsets = numpy.zeros(len(strings) + 1, dtype=numpy.int64)
+        offsets[1:] = numpy.cumsum([len(s) for s in strings])
+        blob = numpy.frombuffer("".join(strings), dtype=numpy.uint8) if len(strings) > 0 \
+            else numpy.zeros(0, dtype=numpy.uint8)
+        return StringArray(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tostring()
+
+    def save(self, prefix):
+        numpy.save(prefix + ".blob.npy", self.blob)
+        numpy.save(prefix + ".offsets.npy", self.offsets)
+
+    @staticmethod
+    def load(prefix, mmap_mode="r"):
+        return StringArray(load_array(prefix + ".blob.npy", mmap_mode), load_array(prefix + ".offsets.npy", mmap_mode))
+
+
+class FieldIndex(object):
+    """
+    Postings, term vectors and statistics of a single field.
+
+    Attributes:
+        terms: StringArray of terms (sorted); term ids are positions in this array
+        post_ptr, post_docs, post_tfs: postings of term i are post_docs[post_ptr[i]:post_ptr[i+1]] (sorted by doc)
+        cf: collection frequency of terms
+        doc_len: length of the field for all documents
+        tv_ptr, tv_terms, tv_tfs: term vectors (only for fields with term vectors, otherwise None)
+        coll_length, num_nonempty, avg_len: collection statistics of the field (computed when built or loaded)
+    """
+    ARRAYS = ["post_ptr", "post_docs", "post_tfs", "cf", "doc_len", "tv_ptr", "tv_terms", "tv_tfs"]
+
+    def __init__(self, name, field_type, has_tv):
+        self.name = name
+        self.field_type = field_type
+        self.has_tv = has_tv
+        self.terms = None
+        for a in self.ARRAYS:
+            setattr(self, a, None)
+        self.coll_length = 0
+        self.num_nonempty = 0
+        self.avg_len = 0
+
+    def compute_stats(self):
+        """Computes collection statistics of the field from the document lengths."""
+        self.coll_length = int(self.doc_len.sum())
+        self.num_nonempty = int(numpy.count_nonzero(self.doc_len))
+        self.avg_len = self.coll_length / float(self.num_nonempty) if self.num_nonempty > 0 else 0
+
+    @staticmethod
+    def build(name, field_type, has_tv, doc_tfs):
+        """
+        Builds field index.
+
+        :param doc_tfs: list of {term: freq} dictionaries (utf-8 terms), one for each document
+        """
+        field = FieldIndex(name, field_type, has_tv)
+        vocab = sorted(set(t for tfs in doc_tfs for t in tfs))
+        term_ids = dict((t, i) for i, t in enumerate(vocab))
+        field.terms = StringArray.build(vocab)
+
+        # term vectors: (term_id, tf) pairs of each document, sorted by term_id
+        doc_counts = numpy.array([len(tfs) for tfs in doc_tfs], dtype=numpy.int64)
+        tv_ptr = numpy.zeros(len(doc_tfs) + 1, dtype=numpy.int64)
+        tv_ptr[1:] = numpy.cumsum(doc_counts)
+        tv_terms = numpy.zeros(tv_ptr[-1], dtype=numpy.int32)
+        tv_tfs = numpy.zeros(tv_ptr[-1], dtype=numpy.int32)
+        for doc, tfs in enumerate(doc_tfs):
+            pairs = sorted((term_ids[t], tf) for t, tf in tfs.iteritems())
+            tv_terms[tv_ptr[doc]:tv_ptr[doc + 1]] = [p[0] for p in pairs]
+            tv_tfs[tv_ptr[doc]:tv_ptr[doc + 1]] = [p[1] for p in pairs]
+        tv_docs = numpy.repeat(numpy.arange(len(doc_tfs), dtype=numpy.int32), doc_counts)
+
+        # postings: the term vectors sorted by term (stable sort keeps doc order)
+        order = numpy.argsort(tv_terms, kind="mergesort")
+        field.post_docs = tv_docs[order]
+        field.post_tfs = tv_tfs[order]
+        field.post_ptr = numpy.zeros(len(vocab) + 1, dtype=numpy.int64)
+        field.post_ptr[1:] = numpy.cumsum(numpy.bincount(tv_terms, minlength=len(vocab)))
+        field.cf = numpy.zeros(len(vocab), dtype=numpy.int64)
+        numpy.add.at(field.cf, tv_terms, tv_tfs)
+        field.doc_len = numpy.array([sum(tfs.values()) for tfs in doc_tfs], dtype=numpy.int32)
+        if has_tv:
+            field.tv_ptr, field.tv_terms, field.tv_tfs = tv_ptr, tv_terms, tv_tfs
+        field.compute_stats()
+        return field
+
+    def save(self, prefix):
+        self.terms.save(prefix + ".terms")
+        for a in self.ARRAYS:
+            if getattr(self, a) is not None:
+                numpy.save(prefix + "." + a + ".npy", getattr(self, a))
+
+    @staticmethod
+    def load(prefix, name, field_type, has_tv, mmap_mode="r"):
+        field = FieldIndex(name, field_type, has_tv)
+        field.terms = StringArray.load(prefix + ".terms", mmap_mode)
+        for a in FieldIndex.ARRAYS:
+            if os.path.exists(prefix + "." + a + ".npy"):
+                setattr(field, a, load_array(prefix + "." + a + ".npy", mmap_mode))
+        field.compute_stats()
+        return field
+
+    def get_term_id(self, term):
+        """Returns id of the (utf-8) term or None if the term is not in the field."""
+        i = bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+    def get_postings(self, term):
+        """Returns (docs, tfs) arrays for the term."""
+        i = self.get_term_id(term)
+        if i is None:
+            return numpy.zeros(0, dtype=numpy.int32), numpy.zeros(0, dtype=numpy.int32)
+        start, end = self.post_ptr[i], self.post_ptr[i + 1]
+        return self.post_docs[start:end], self.post_tfs[start:end]
+
+
+class MemIndex(IndexFields):
+    """In-memory index with (a subset of) the Lucene class interface; field names and types are as in Lucene."""
+
+    META_FILE = "meta.json"
+    VERSION = 1
+
+    def __init__(self, index_dir, use_ram=False, jvm_ram=None):
+        """
+        :param index_dir: index directory
+        :param use_ram: if True, index files are read into memory instead of memory mapping
+        :param jvm_ram: not used (kept for compatibility with Lucene)
+        """
+        self.index_dir = index_dir
+        self.use_ram = use_ram
+        self.fields = None
+        self.ids = None
+        self.ids_order = None
+        self.writer = None
+        self.searcher = None
+        print "Connected to index " + index_dir
+
+    # ---------- writing ----------
+
+    def open_writer(self):
+        """Opens writer; a new index is created (existing index is overwritten when the writer is closed)."""
+        if self.writer is None:
+            self.writer = {'ids': [], 'field_types': {}, 'docs': []}
+        else:
+            raise Exception("IndexWriter is already open")
+
+    def add_document(self, contents):
+        """
+        Adds a document with the specified contents to the index.
+        See LuceneDocument.create_document() for the explanation of contents.
+        """
+        doc = {}
+        doc_id = None
+        for f in contents:
+            name, field_type, value = f['field_name'], f['field_type'], f['field_value']
+            self.writer['field_types'][name] = field_type
+            if name == self.FIELDNAME_ID:
+                doc_id = to_utf8(value)
+            if field_type in (self.FIELDTYPE_ID, self.FIELDTYPE_ID_TV):
+                terms = [to_utf8(value)]
+            else:
+                terms = [to_utf8(t) for t in self.analyze_query(value, name)]
+            tfs = doc.setdefault(name, {})
+            for t in terms:
+                tfs[t] = tfs.get(t, 0) + 1
+        if doc_id is None:
+            raise Exception("Document without " + self.FIELDNAME_ID + " field")
+        self.writer['ids'].append(doc_id)
+        self.writer['docs'].append(doc)
+
+    def close_writer(self):
+        """Builds the index arrays and saves the index."""
+        if self.writer is None:
+            raise Exception("There is no open IndexWriter to close")
+        docs = self.writer['docs']
+        self.ids = StringArray.build(self.writer['ids'])
+        self.ids_order = numpy.array(sorted(range(len(docs)), key=lambda i: self.writer['ids'][i]), dtype=numpy.int32)
+        self.fields = {}
+        for name in sorted(self.writer['field_types']):
+            field_type = self.writer['field_types'][name]
+            has_tv = field_type in (self.FIELDTYPE_ID_TV, self.FIELDTYPE_TEXT_TV, self.FIELDTYPE_TEXT_TVP)
+            doc_tfs = [doc.get(name, {}) for doc in docs]
+            self.fields[name] = FieldIndex.build(name, field_type, has_tv, doc_tfs)
+        self.writer = None
+        self.save()
+
+    def save(self):
+        """Saves index into the index directory."""
+        if not os.path.exists(self.index_dir):
+            os.makedirs(self.index_dir)
+        meta = {'version': self.VERSION, 'num_docs': len(self.ids), 'fields': []}
+        for i, name in enumerate(sorted(self.fields)):
+            field = self.fields[name]
+            meta['fields'].append({'name': name, 'type': field.field_type, 'has_tv': field.has_tv})
+            field.save(os.path.join(self.index_dir, "f" + str(i)))
+        self.ids.save(os.path.join(self.index_dir, "ids"))
+        numpy.save(os.path.join(self.index_dir, "ids.order.npy"), self.ids_order)
+        json.dump(meta, open(os.path.join(self.index_dir, self.META_FILE), "w"), indent=4)
+        print "Index saved to " + self.index_dir
+
+    # ---------- reading ----------
+
+    def open_reader(self):
+        """Loads the index (memory-mapped, unless use_ram is set)."""
+        if self.fields is None:
+            meta_file = os.path.join(self.index_dir, self.META_FILE)
+            if not os.path.exists(meta_file):
+                raise Exception("No index found in " + self.index_dir)
+            meta = json.load(open(meta_file))
+            mmap_mode = None if self.use_ram else "r"
+            self.fields = {}
+            for i, f in enumerate(meta['fields']):
+                self.fields[f['name']] = FieldIndex.load(os.path.join(self.index_dir, "f" + str(i)), f['name'],
+                                                         f['type'], f['has_tv'], mmap_mode)
+            self.ids = StringArray.load(os.path.join(self.index_dir, "ids"), mmap_mode)
+            self.ids_order = load_array(os.path.join(self.index_dir, "ids.order.npy"), mmap_mode)
+
+    def close_reader(self):
+        """Releases the index arrays."""
+        if self.fields is not None:
+            self.fields = None
+            self.ids = None
+            self.ids_order = None
+            self.searcher = None
+        else:
+            raise Exception("There is no open IndexReader to close")
+
+    def open_searcher(self):
+        """There is no separate searcher; opens the reader."""
+        self.open_reader()
+        self.searcher = self
+
+    def maybe_refresh(self):
+        """MemIndex is immutable (rebuilt offline); there is nothing to refresh."""
+        return False
+
+    def get_field(self, field):
+        """Returns FieldIndex or None if the field is not in the index."""
+        self.open_reader()
+        return self.fields.get(field, None)
+
+    def num_docs(self):
+        """Returns number of documents in the index."""
+        self.open_reader()
+        return len(self.ids)
+
+    def get_lucene_document_id(self, doc_id):
+        """Returns internal document id for the given (external) id."""
+        self.open_reader()
+        doc_id = to_utf8(doc_id)
+        sorted_ids = _SortedView(self.ids, self.ids_order)
+        i = bisect_left(sorted_ids, doc_id)
+        if i < len(sorted_ids) and sorted_ids[i] == doc_id:
+            return int(self.ids_order[i])
+        return None
+
+    def get_document_id(self, lucene_doc_id):
+        """Returns (external) document id for the given internal id."""
+        self.open_reader()
+        return self.ids[lucene_doc_id].decode("utf-8")
+
+    def analyze_query(self, query, field=IndexFields.FIELDNAME_CONTENTS):
+        """
+        Analyses the query and returns query terms (approximating Lucene's StandardAnalyzer).
+
+        :param field: field name (not used)
+        :return: list of query terms
+        """
+        if not isinstance(query, unicode):
+            query = str(query).decode("utf-8", "ignore")
+        qterms = []
+        for match in TOKEN_RE.finditer(query.lower()):
+            term = match.group()
+            if (term not in STOP_WORDS) and (len(term) <= MAX_TOKEN_LENGTH):
+                qterms.append(term)
+        return qterms
+
+    def get_doc_termfreqs(self, lucene_doc_id, field):
+        """
+        Returns term frequencies for a given document field.
+
+        :param lucene_doc_id: internal document ID
+        :param field: document field
+        :return dict: with terms (empty if the field has no term vector)
+        """
+        f = self.get_field(field)
+        if (f is None) or (not f.has_tv):
+            return {}
+        termfreqs = {}
+        start, end = f.tv_ptr[lucene_doc_id], f.tv_ptr[lucene_doc_id + 1]
+        for term_id, tf in zip(f.tv_terms[start:end], f.tv_tfs[start:end]):
+            termfreqs[f.terms[term_id].decode("utf-8")] = int(tf)
+        return termfreqs
+
+    def get_doc_termfreqs_fields(self, lucene_doc_id, fields):
+        """Returns term frequencies for the given fields of a document: {field: {term: freq, ...}, ...}."""
+        return dict((field, self.get_doc_termfreqs(lucene_doc_id, field)) for field in fields)
+
+    def get_docs_termfreqs_fields(self, lucene_doc_ids, fields):
+        """Returns term frequencies for the given fields of multiple documents."""
+        return dict((d, self.get_doc_termfreqs_fields(d, fields)) for d in set(lucene_doc_ids))
+
+    def get_doc_termfreqs_all_fields(self, lucene_doc_id):
+        """Returns term frequency for all fields (with term vectors) in the given document."""
+        self.open_reader()
+        doc_termfreqs = {}
+        for field in self.fields:
+            termfreqs = self.get_doc_termfreqs(lucene_doc_id, field)
+            if len(termfreqs) > 0:
+                doc_termfreqs[field] = termfreqs
+        return doc_termfreqs
+
+    def get_coll_termfreq(self, term, field):
+        """Returns collection term frequency for the given field."""
+        f = self.get_field(field)
+        if f is None:
+            return 0
+        term_id = f.get_term_id(to_utf8(term))
+        return int(f.cf[term_id]) if term_id is not None else 0
+
+    def get_doc_freq(self, term, field):
+        """Returns number of documents containing the term in the given field."""
+        f = self.get_field(field)
+        if f is None:
+            return 0
+        term_id = f.get_term_id(to_utf8(term))
+        return int(f.post_ptr[term_id + 1] - f.post_ptr[term_id]) if term_id is not None else 0
+
+    def get_coll_length(self, field):
+        """Returns length of field in the collection."""
+        f = self.get_field(field)
+        return f.coll_length if f is not None else 0
+
+    def get_avg_len(self, field):
+        """Returns average length of a field (over documents with at least one term for this field)."""
+        f = self.get_field(field)
+        return f.avg_len if f is not None else 0
+
+    # ---------- searching ----------
+
+    def get_and_count(self, terms, field):
+        """Returns number of documents containing all the given (not analyzed) terms in the field."""
+        f = self.get_field(field)
+        if f is None or len(terms) == 0:
+            return 0
+        docs = None
+        for term in set(terms):
+            t_docs = f.get_postings(to_utf8(term))[0]
+            docs = t_docs if docs is None else numpy.intersect1d(docs, t_docs, assume_unique=True)
+            if len(docs) == 0:
+                return 0
+        return len(docs)
+
+    def get_or_count(self, terms, field):
+        """Returns number of documents containing at least one of the given (not analyzed) terms in the field."""
+        f = self.get_field(field)
+        if f is None or len(terms) == 0:
+            return 0
+        postings = [f.get_postings(to_utf8(term))[0] for term in set(terms)]
+        return len(numpy.unique(numpy.concatenate(postings)))
+
+    def score_query(self, query, field_content=IndexFields.FIELDNAME_CONTENTS, field_id=IndexFields.FIELDNAME_ID,
+                    num_docs=100):
+        """
+        Scores a given query and returns results as a RetrievalResults object.
+        Approximates Lucene's DefaultSimilarity for a Boolean OR query of the query terms:
+            score(q,d) = coord(q,d) * queryNorm(q) * sum_t sqrt(tf(t,d)) * idf(t)^2 * 1/sqrt(|d_f|)
+        """
+        if field_id != self.FIELDNAME_ID:
+            raise Exception("Only " + self.FIELDNAME_ID + " field is stored in MemIndex")
+        rr = RetrievalResults()
+        f = self.get_field(field_content)
+        qterms = self.analyze_query(query.replace("(", "").replace(")", "").replace("!", ""), field_content)
+        if f is None or len(qterms) == 0:
+            return rr
+
+        n = self.num_docs()
+        scores = numpy.zeros(n, dtype=numpy.float64)
+        overlap = numpy.zeros(n, dtype=numpy.int32)
+        sum_sq_weights = 0
+        for t in qterms:
+            docs, tfs = f.get_postings(to_utf8(t))
+            idf = 1 + math.log(n / float(len(docs) + 1))
+            sum_sq_weights += idf ** 2
+            if len(docs) == 0:
+                continue
+            scores[docs] += numpy.sqrt(tfs) * (idf ** 2) / numpy.sqrt(f.doc_len[docs])
+            overlap[docs] += 1
+        query_norm = 1 / math.sqrt(sum_sq_weights)
+        scores *= query_norm * overlap / float(len(qterms))
+
+        # ranking: by score and then by internal id (as in Lucene)
+        matches = numpy.nonzero(overlap)[0]
+        ranked = matches[numpy.lexsort((matches, -scores[matches]))][:num_docs]
+        for lucene_doc_id in ranked:
+            rr.append(self.get_document_id(lucene_doc_id), float(scores[lucene_doc_id]), int(lucene_doc_id))
+        return rr
+
+
+class _SortedView(object):
+    """Sorted view of a StringArray given the sorting order (used for binary search)."""
+
+    def __init__(self, strings, order):
+        self.strings = strings
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.strings[self.order[i]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--index", help="index directory", type=str)
+    parser.add_argument("-l", "--lookup", help="lookup a document id", type=str)
+    parser.add_argument("-t", "--termvect", help="term vector for a document id", type=str)
+    parser.add_argument("-q", "--query", help="score a query (catchall field)", type=str)
+    parser.add_argument("-s", "--stat", help="stats", action="store_true", default=False)
+    args = parser.parse_args()
+
+    index = MemIndex(args.index)
+    if (args.lookup is not None) or (args.termvect is not None):
+        doc_id = args.lookup if args.lookup is not None else args.termvect
+        lucene_doc_id = index.get_lucene_document_id(doc_id)
+        print "Internal ID: " + str(lucene_doc_id)
+        if (args.termvect is not None) and (lucene_doc_id is not None):
+            for field, termfreqs in index.get_doc_termfreqs_all_fields(lucene_doc_id).iteritems():
+                print field
+                for term in termfreqs:
+                    print "\t" + term + " : " + str(termfreqs[term])
+    elif args.query is not None:
+        for doc_id, score in index.score_query(args.query).get_scores_sorted():
+            print doc_id + "\t" + str(score)
+    elif args.stat:
+        print "Number of documents: " + str(index.num_docs())
+        for field in sorted(index.fields):
+            print field + "\tlength: " + str(index.get_coll_length(field)) + "\tavg: " + str(index.get_avg_len(field))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Cache for PRMS mapping probabilities p(f|t).
+
+Mapping probabilities only depend on the term, the field counts and collection statistics, so they are the same
+for every query containing the term. The cache is shared by all PRMS scorers of a process (for the same index and
+field counts), and can be persisted to a JSON file which is loaded by every process (e.g., retrieval workers).
+
+Precomputing the cache for the vocabulary of a query log:
+    python -m nordlys.retrieval.prms_cache <config_file> [-l <query_log>]
+
+where config_file is a retrieval config (index_dir, field_counts, prms_cache_file and query_file).
+
+@author: Faegheh Hasibi
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+
+
+class PRMSCache(object):
+    """Term -> {field: p(f|t)} cache."""
+
+    # caches shared within the process; key: (index_dir, signature)
+    __caches = {}
+
+    def __init__(self, field_counts, cache_file=None):
+        """
+        :param field_counts: dictionary of fields and their frequency (as used by the PRMS scorer)
+        :param cache_file: JSON file with precomputed mapping probabilities (loaded if exists)
+        """
+        self.signature = self.get_signature(field_counts)
+        self.cache_file = cache_file
+        self.mapping_probs = {}
+        if (cache_file is not None) and os.path.exists(cache_file):
+            self.load(cache_file)
+
+    @staticmethod
+    def get_signature(field_counts):
+        """Returns signature of the field counts; mapping probabilities are only valid for the same field counts."""
+        return hashlib.md5(json.dumps(field_counts, sort_keys=True)).hexdigest()
+
+    @staticmethod
+    def get_cache(index_dir, field_counts, cache_file=None):
+        """
+        Returns the cache shared in the process for the given index and field counts (creates it if needed).
+
+        :param index_dir: index directory
+        :param field_counts: dictionary of fields and their frequency
+        :param cache_file: JSON file with precomputed mapping probabilities
+        """
+        key = (index_dir, PRMSCache.get_signature(field_counts))
+        if key not in PRMSCache.__caches:
+            PRMSCache.__caches[key] = PRMSCache(field_counts, cache_file)
+        return PRMSCache.__caches[key]
+
+    def contains(self, t):
+        return t in self.mapping_probs
+
+    def get(self, t):
+        """Returns mapping probabilities of the term, or None if the term is not cached."""
+        return self.mapping_probs.get(t, None)
+
+    def add(self, t, mapping_probs):
+        self.mapping_probs[t] = mapping_probs
+
+    def load(self, cache_file):
+        """Loads mapping probabilities from file; the file is ignored if it is computed for other field counts."""
+        data = json.load(open(cache_file))
+        if data['signature'] != self.signature:
+            print "Warning: PRMS cache " + cache_file + " is computed for different field counts; ignored."
+            return
+        self.mapping_probs.update(data['mapping_probs'])
+        print "PRMS cache loaded: " + str(len(data['mapping_probs'])) + " terms"
+
+    def save(self, cache_file=None):
+        """Saves mapping probabilities to file."""
+        cache_file = self.cache_file if cache_file is None else cache_file
+        if cache_file is None:
+            raise Exception("PRMS cache file is not specified")
+        tmp_file = cache_file + ".tmp"
+        json.dump({'signature': self.signature, 'mapping_probs': self.mapping_probs}, open(tmp_file, "w"))
+        os.rename(tmp_file, cache_file)
+        print "PRMS cache saved: " + cache_file + " (" + str(len(self.mapping_probs)) + " terms)"
+
+
+def load_queries(query_file, query_log=False):
+    """
+    Returns list of queries.
+
+    :param query_file: JSON query file (as in retrieval) or query log (tab separated, query in the last column)
+    :param query_log: if True, query_file is read as a query log
+    """
+    if not query_log:
+        return [q['query'] for q in json.load(open(query_file))]
+    queries = []
+    with open(query_file) as f:
+        for line in f:
+            line = line.strip()
+            if line != "":
+                queries.append(line.split("\t")[-1])
+    return queries
+
+
+def precompute(config, queries):
+    """
+    Computes mapping probabilities for all terms of the given queries and saves them to the cache file.
+
+    :param config: retrieval config (dictionary)
+    :param queries: list of raw queries
+    """
+    from nordlys.retrieval.index_cache import IndexCache
+    from nordlys.retrieval.scorer import ScorerPRMS
+
+    s_t = datetime.now()
+    lucene = IndexCache(config['index_dir'])
+    scorer = ScorerPRMS(lucene, None, config)
+    terms = set()
+    for query in queries:
+        terms.update(lucene.analyze_query(query))
+    print "Number of terms: " + str(len(terms))
+    for t in terms:
+        scorer.get_mapping_prob(t)
+    scorer.cache.save()
+    print "Execution time(sec):\t" + str((datetime.now() - s_t).total_seconds())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", help="retrieval config file (JSON)", type=str)
+    parser.add_argument("-l", "--log", help="query log (tab separated, query in the last column); "
+                                            "if not given, query_file of the config is used", type=str)
+    args = parser.parse_args()
+
+    config = json.load(open(args.config))
+    if 'prms_cache_file' not in config:
+        raise Exception("prms_cache_file is missing")
+    if 'field_counts' not in config:
+        raise Exception("field_counts is missing")
+    if args.log is not None:
+        queries = load_queries(args.log, query_log=True)
+    else:
+        queries = load_queries(config['query_file'])
+    precompute(config, queries)
+
+
+if __name__ == '__main__':
+    main()
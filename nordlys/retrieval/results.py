@@ -2,51 +2,150 @@
 Result list representation.
 
 - for each hit it holds score and both internal and external doc_ids
+- scores and internal doc_ids are stored in compact arrays; each doc has a slot in these arrays
+- if max_size is given, only the top max_size documents are retained (using a min-heap during append)
 
 @author: Krisztian Balog
 """
 
-import operator
+import heapq
+from array import array
+
+NO_DOC_ID_INT = -1  # slot value for documents without internal doc_id
 
 
 class RetrievalResults(object):
     """Class for storing retrieval scores for a given query."""
-    def __init__(self):
-        self.scores = {}
-        # mapping from external to internal doc_ids -s
-        self.doc_ids = {}
+    def __init__(self, max_size=None):
+        """
+        :param max_size: if set, only the top max_size documents are kept (bounded top-k mode)
+        """
+        self.max_size = max_size
+        self.__scores = array('d')
+        # internal doc_ids, indexed by slot
+        self.__doc_ids_int = array('l')
+        # external doc_ids, indexed by slot
+        self.__doc_ids = []
+        # mapping from external doc_ids to slots
+        self.__slots = {}
+        # min-heap of (score, -seq, slot) for the retained docs (only in top-k mode)
+        self.__heap = []
+        self.__seq = 0
+
+    @staticmethod
+    def __to_key(score):
+        """None scores are stored as NaN; they rank below any other score (as they do in Python 2 sorting)."""
+        return float("-inf") if score is None else score
+
+    def __get_score(self, slot):
+        score = self.__scores[slot]
+        return None if score != score else score  # NaN -> None
+
+    def __set(self, slot, doc_id, score, doc_id_int):
+        """Stores document in the given slot (appends a new slot if slot equals to the current size)."""
+        value = float("nan") if score is None else score
+        doc_id_int = NO_DOC_ID_INT if doc_id_int is None else doc_id_int
+        if slot == len(self.__doc_ids):
+            self.__scores.append(value)
+            self.__doc_ids_int.append(doc_id_int)
+            self.__doc_ids.append(doc_id)
+        else:
+            self.__scores[slot] = value
+            self.__doc_ids_int[slot] = doc_id_int
+            self.__doc_ids[slot] = doc_id
+        self.__slots[doc_id] = slot
 
     def append(self, doc_id, score, doc_id_int=None):
-        """Adds document to the result list"""
-        self.scores[doc_id] = score
-        if doc_id_int is not None:
-            self.doc_ids[doc_id] = doc_id_int
+        """
+        Adds document to the result list.
+        In top-k mode the document is dropped if its score does not exceed the lowest retained score.
+        """
+        # already in the list: score gets overwritten
+        if doc_id in self.__slots:
+            slot = self.__slots[doc_id]
+            if doc_id_int is None and self.__doc_ids_int[slot] != NO_DOC_ID_INT:
+                doc_id_int = self.__doc_ids_int[slot]
+            self.__set(slot, doc_id, score, doc_id_int)
+            if self.max_size is not None:
+                self.__heap = [(self.__to_key(self.__get_score(s)), q, s) for _, q, s in self.__heap]
+                heapq.heapify(self.__heap)
+            return
+
+        if self.max_size is None:
+            self.__set(len(self.__doc_ids), doc_id, score, doc_id_int)
+            return
+
+        if self.max_size <= 0:
+            return
+        self.__seq += 1
+        key = self.__to_key(score)
+        if len(self.__heap) < self.max_size:
+            slot = len(self.__doc_ids)
+            heapq.heappush(self.__heap, (key, -self.__seq, slot))
+        elif key > self.__heap[0][0]:
+            # evicts the lowest scored doc and reuses its slot
+            slot = self.__heap[0][2]
+            del self.__slots[self.__doc_ids[slot]]
+            heapq.heapreplace(self.__heap, (key, -self.__seq, slot))
+        else:
+            return
+        self.__set(slot, doc_id, score, doc_id_int)
 
     def increase(self, doc_id, score):
         """Increases the score of a document (adds it to the results list
         if it is not already there)"""
-        if doc_id not in self.scores:
-            self.scores[doc_id] = 0
-        self.scores[doc_id] += score
+        if self.max_size is not None:
+            raise Exception("increase() is not supported in top-k mode")
+        if doc_id not in self.__slots:
+            self.append(doc_id, 0)
+        slot = self.__slots[doc_id]
+        self.__scores[slot] += score
 
     def num_docs(self):
         """Returns the number of documents in the result list."""
-        return len(self.scores)
+        return len(self.__slots)
+
+    def get_min_score(self):
+        """
+        Returns the lowest retained score if the result list is full (top-k mode), otherwise None.
+        A document has to score higher than this to get into the result list.
+        """
+        if self.max_size is None or len(self.__heap) < self.max_size or len(self.__heap) == 0:
+            return None
+        return self.__get_score(self.__heap[0][2])
+
+    def __iter_slots(self):
+        """Iterates over the slots of retained documents."""
+        if self.max_size is None:
+            return xrange(len(self.__doc_ids))
+        return (slot for _, _, slot in self.__heap)
+
+    def get_scores_sorted(self, max_rank=None):
+        """
+        Returns results sorted by score
 
-    def get_scores_sorted(self):
-        """Returns all results sorted by score"""
-        return sorted(self.scores.iteritems(), key=operator.itemgetter(1), reverse=True)
+        :param max_rank: if set, only the top max_rank results are returned
+        :return: list of (doc_id, score) tuples
+        """
+        slots = self.__iter_slots()
+        sort_key = lambda s: self.__to_key(self.__get_score(s))
+        if max_rank is not None and max_rank < self.num_docs():
+            slots = heapq.nlargest(max_rank, slots, key=sort_key)
+        else:
+            slots = sorted(slots, key=sort_key, reverse=True)
+        return [(self.__doc_ids[s], self.__get_score(s)) for s in slots]
 
     def get_doc_id_int(self, doc_id):
         """Returns internal doc_id for a given doc_id."""
-        if doc_id in self.doc_ids:
-            return self.doc_ids[doc_id]
+        if doc_id in self.__slots:
+            doc_id_int = self.__doc_ids_int[self.__slots[doc_id]]
+            if doc_id_int != NO_DOC_ID_INT:
+                return doc_id_int
         return None
 
     def write_trec_format(self, query_id, run_id, out, max_rank=100):
-        """Outputs results in TREC format"""
+        """Outputs results in TREC format (only the top max_rank results are visited)"""
         rank = 1
-        for doc_id, score in self.get_scores_sorted():
-            if rank <= max_rank:
-                out.write(query_id + " Q0 " + doc_id + " " + str(rank) + " " + str(score) + " " + run_id + "\n")
+        for doc_id, score in self.get_scores_sorted(max_rank):
+            out.write(query_id + " Q0 " + doc_id + " " + str(rank) + " " + str(score) + " " + run_id + "\n")
             rank += 1
@@ -6,6 +6,7 @@ second pass: perform (expensive) scoring of the top N documents using the Scorer
 
 General config parameters:
 - index_dir: index directory
+- index_type: lucene or mem (MemIndex, no JVM needed; default: lucene)
 - query_file: query file (JSON)
 - model: accepted values: lucene, lm, mlm, prms (default: lm)
 - output_file: output file name
@@ -15,6 +16,10 @@ General config parameters:
 - field_id: id field to be returned (default: Lucene.FIELDNAME_ID)
 - first_pass_num_docs: number of documents in first-pass scoring (default: 10000)
 - first_pass_field: field used in first pass retrieval (default: Lucene.FIELDNAME_CONTENTS)
+- num_workers: number of worker processes scoring queries in parallel, each with its own JVM (default: 1)
+- refresh_interval: if set, the index is reopened between queries (at most once in every refresh_interval seconds)
+  when it has been changed by incremental indexing (default: None)
+- prune: if True, second-pass scoring skips documents that cannot enter the top num_docs (default: False)
 
 Model-specific parameters:
 - smoothing_method: jm or dirichlet (lm and mlm, default: jm)
@@ -22,6 +27,7 @@ Model-specific parameters:
 - field_weights: dict with fields and corresponding weights (only mlm)
 - field: field name for LM model
 - field_counts: fields and their frequency for PRMS model
+- prms_cache_file: JSON file with precomputed PRMS mapping probabilities (see prms_cache.py; only prms)
 
 @todo rewrite it using Lucene's Rescoring API
 
@@ -29,11 +35,15 @@ Model-specific parameters:
 """
 from datetime import datetime
 
+import multiprocessing
+import Queue
 import sys
 import json
 import os
+from StringIO import StringIO
 from nordlys.retrieval.index_cache import IndexCache
 from nordlys.retrieval.lucene_tools import Lucene
+from nordlys.retrieval.mem_index import MemIndex
 from scorer import Scorer
 from results import RetrievalResults
 
@@ -65,6 +75,8 @@ class Retrieval(object):
                 raise Exception("output_file is missing")
             if 'run_id' not in self.config:
                 raise Exception("run_id is missing")
+            if 'index_type' not in self.config:
+                self.config['index_type'] = "lucene"
             if 'model' not in self.config:
                 self.config['model'] = "lm"
             if 'num_docs' not in self.config:
@@ -75,6 +87,12 @@ class Retrieval(object):
                 self.config['first_pass_num_docs'] = 10000
             if 'first_pass_field' not in self.config:
                 self.config['first_pass_field'] = Lucene.FIELDNAME_CONTENTS
+            if 'prune' not in self.config:
+                self.config['prune'] = False
+            if 'num_workers' not in self.config:
+                self.config['num_workers'] = 1
+            if 'refresh_interval' not in self.config:
+                self.config['refresh_interval'] = None
 
             # model specific params
             if self.config['model'] == "lm" or self.config['model'] == "mlm" or self.config['model'] == "prms":
@@ -96,7 +114,10 @@ class Retrieval(object):
             sys.exit(1)
 
     def _open_index(self):
-        self.lucene = IndexCache(self.config['index_dir'])
+        if self.config['index_type'] == "mem":
+            self.lucene = MemIndex(self.config['index_dir'])
+        else:
+            self.lucene = IndexCache(self.config['index_dir'], refresh_interval=self.config['refresh_interval'])
 
         self.lucene.open_searcher()
 
@@ -123,51 +144,126 @@ class Retrieval(object):
     def _second_pass_scoring(self, res1, scorer):
         """
         Returns second-pass scoring of documents.
+        Only the top num_docs documents are kept; if pruning is enabled, documents that cannot enter the top
+        num_docs are not fully scored.
 
         :param res1: first pass results
         :return: RetrievalResults object
         """
         print "\tSecond pass scoring... "
-        results = RetrievalResults()
+        results = RetrievalResults(max_size=self.config['num_docs'])
         for doc_id, orig_score in res1.get_scores_sorted():
             doc_id_int = res1.get_doc_id_int(doc_id)
-            score = scorer.score_doc(doc_id, doc_id_int)
+            if self.config['prune']:
+                # pruned documents get None score, which is not retained once the result list is full
+                score = scorer.score_doc_pruned(doc_id, doc_id_int, results.get_min_score())
+            else:
+                score = scorer.score_doc(doc_id, doc_id_int)
             results.append(doc_id, score)
+        if self.config['prune']:
+            print "\t\tfully scored: " + str(scorer.num_scored) + ", pruned: " + str(scorer.num_pruned)
         print "done"
         return results
 
+    def _score_query(self, q, out):
+        """
+        Scores a single query and writes its results to the output.
+
+        :param q: query dictionary (with query_id and query keys)
+        :param out: output file object
+        """
+        query_id = q['query_id']
+        query = q['query']
+        print "scoring [" + query_id + "] " + query
+        self.lucene.maybe_refresh()
+        # first pass scoring
+        res1 = self._first_pass_scoring(self.lucene, query)
+        # second pass scoring (if needed)
+        if self.config['model'] == "lucene":
+            results = res1
+        else:
+            scorer = Scorer.get_scorer(self.config['model'], self.lucene, query, self.config)
+            results = self._second_pass_scoring(res1, scorer)
+        # write results to output file
+        results.write_trec_format(query_id, self.config['run_id'], out, self.config['num_docs'])
+
+    def _retrieve_serial(self, out):
+        """Scores all queries in the current process."""
+        self._open_index()
+        for q in self.queries:
+            self._score_query(q, out)
+        # close index
+        self._close_index()
+
+    def _retrieve_parallel(self, out):
+        """
+        Scores queries using num_workers processes.
+        The JVM can not be forked after initVM, so workers are started before any index is opened in this process;
+        each worker initializes its own JVM and IndexCache on the same index directory.
+        Queries are taken one by one from a shared queue (idle workers pick up the next query), and the per-query
+        TREC output is written in the order of the query file. If a query fails or a worker dies, the remaining
+        workers are terminated before the error is raised.
+        """
+        task_queue = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue()
+        workers = []
+        for i in range(self.config['num_workers']):
+            p = multiprocessing.Process(target=_retrieval_worker, args=(self.config, task_queue, result_queue))
+            p.start()
+            workers.append(p)
+
+        for i, q in enumerate(self.queries):
+            task_queue.put((i, q))
+        for p in workers:
+            task_queue.put(None)
+
+        # merges results in query order, as soon as they are available
+        pending = {}
+        next_i = 0
+        done = False
+        try:
+            while next_i < len(self.queries):
+                try:
+                    i, trec_output = result_queue.get(timeout=1)
+                except Queue.Empty:
+                    if not any(p.is_alive() for p in workers):
+                        raise Exception("Retrieval workers terminated before scoring all queries")
+                    continue
+                if trec_output is None:
+                    raise Exception("Error scoring query " + self.queries[i]['query_id'])
+                pending[i] = trec_output
+                while next_i in pending:
+                    out.write(pending.pop(next_i))
+                    next_i += 1
+            done = True
+        finally:
+            # on error, the remaining workers (each with its own JVM) are stopped
+            if not done:
+                for p in workers:
+                    if p.is_alive():
+                        p.terminate()
+            for p in workers:
+                p.join()
+
     def retrieve(self):
         """Scores queries and outputs results."""
         s_t = datetime.now()  # start time
         total_time = 0.0
 
         self._load_queries()
-        self._open_index()
 
         # init output file
         if os.path.exists(self.config['output_file']):
             os.remove(self.config['output_file'])
         out = open(self.config['output_file'], "w")
 
-        for q in self.queries:
-            query_id = q['query_id']
-            query = q['query']
-            print "scoring [" + query_id + "] " + query
-            # first pass scoring
-            res1 = self._first_pass_scoring(self.lucene, query)
-            # second pass scoring (if needed)
-            if self.config['model'] == "lucene":
-                results = res1
-            else:
-                scorer = Scorer.get_scorer(self.config['model'], self.lucene, query, self.config)
-                results = self._second_pass_scoring(query, res1, scorer)
-            # write results to output file
-            results.write_trec_format(query_id, self.config['run_id'], out, self.config['num_docs'])
+        if self.config['num_workers'] > 1:
+            self._retrieve_parallel(out)
+        else:
+            self._retrieve_serial(out)
 
         # close output file
         out.close()
-        # close index
-        self._close_index()
 
         e_t = datetime.now()  # end time
         diff = e_t - s_t
@@ -176,6 +272,28 @@ class Retrieval(object):
         print time_log
 
 
+def _retrieval_worker(config, task_queue, result_queue):
+    """
+    Worker process of the parallel retrieval: opens its own index and scores queries until it gets None.
+    Results (TREC format) are sent back as (query index, output string); output is None if scoring failed.
+    """
+    r = Retrieval(config)
+    r._open_index()
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        i, q = task
+        out = StringIO()
+        try:
+            r._score_query(q, out)
+            result_queue.put((i, out.getvalue()))
+        except Exception, e:
+            print "Error scoring query " + q['query_id'] + ": ", e
+            result_queue.put((i, None))
+    r._close_index()
+
+
 def print_usage():
     print sys.argv[0] + " <config_file>"
     sys.exit()
@@ -186,7 +304,7 @@ def main(argv):
         print_usage()
 
     r = Retrieval(argv[0])
-    r.retrieval()
+    r.retrieve()
 
 
 if __name__ == '__main__':
@@ -8,8 +8,8 @@ Various retrieval models for scoring a individual document for a given query.
 from __future__ import division
 import math
 import sys
-from lucene_tools import Lucene
-from nordlys.retrieval.index_cache import IndexCache
+from nordlys.retrieval.index_fields import IndexFields
+from nordlys.retrieval.prms_cache import PRMSCache
 
 
 class Scorer(object):
@@ -28,6 +28,9 @@ class Scorer(object):
         # NOTE: The analyser might return terms that are not in the collection.
         # These terms are filtered out later in the score_doc functions.
         self.query_terms = lucene.analyze_query(self.query) if query is not None else None
+        # Counters for the pruning mode (see score_doc_pruned)
+        self.num_scored = 0
+        self.num_pruned = 0
 
     @staticmethod
     def get_scorer(model, lucene, query, params):
@@ -61,6 +64,7 @@ class ScorerLM(Scorer):
         if (self.smoothing_method != "jm") and (self.smoothing_method != "dirichlet"):
             raise Exception(self.params['smoothing_method'] + " smoothing method is not supported!")
         self.tf = {}
+        self.term_bounds = None
 
     @staticmethod
     def get_jm_prob(tf_t_d, len_d, tf_t_C, len_C, lambd):
@@ -98,11 +102,36 @@ class ScorerLM(Scorer):
             p_t_C = tf_t_C / len_C if len_C > 0 else 0
             return (tf_t_d + mu * p_t_C) / (len_d + mu)
 
-    def get_tf(self, lucene_doc_id, field):
+    def get_tv_fields(self):
+        """Returns the fields whose term vectors are read together for a document."""
+        return [self.get_field()]
+
+    def load_tf(self, lucene_doc_id, fields):
+        """
+        Reads term frequencies of the given document fields in one call (fields already read are skipped).
+        Documents that are not in the index (lucene_doc_id is None) get empty term frequencies.
+        """
         if lucene_doc_id not in self.tf:
             self.tf[lucene_doc_id] = {}
-        if field not in self.tf[lucene_doc_id]:
-            self.tf[lucene_doc_id][field] = self.lucene.get_doc_termfreqs(lucene_doc_id, field)
+        missing = [f for f in set(fields) if f not in self.tf[lucene_doc_id]]
+        if lucene_doc_id is None:
+            self.tf[lucene_doc_id].update((f, {}) for f in missing)
+        elif len(missing) > 0:
+            self.tf[lucene_doc_id].update(self.lucene.get_doc_termfreqs_fields(lucene_doc_id, missing))
+
+    def load_tfs(self, lucene_doc_ids, fields):
+        """Reads term frequencies of the given fields of multiple documents in one call (see load_tf)."""
+        missing_docs = [d for d in set(lucene_doc_ids)
+                        if (d is not None) and any(f not in self.tf.get(d, {}) for f in fields)]
+        if len(missing_docs) > 0:
+            for d, termfreqs in self.lucene.get_docs_termfreqs_fields(missing_docs, fields).iteritems():
+                self.tf.setdefault(d, {}).update(termfreqs)
+        if None in lucene_doc_ids:
+            self.load_tf(None, fields)
+
+    def get_tf(self, lucene_doc_id, field):
+        if (lucene_doc_id not in self.tf) or (field not in self.tf[lucene_doc_id]):
+            self.load_tf(lucene_doc_id, self.get_tv_fields() + [field])
         return self.tf[lucene_doc_id][field]
 
     def get_term_prob(self, lucene_doc_id, field, t):
@@ -146,6 +175,27 @@ class ScorerLM(Scorer):
                 print "\t\t\tDoc:  p(t|theta_d_f)=", p_t_d_f
         return p_t_d_f
 
+    def get_term_prob_bound(self, field, t):
+        """
+        Returns an upper bound of p(t|theta_d_f) over all documents, based only on collection statistics.
+            - JM: tf(t,d_f)/|d_f| <= 1, so p(t|theta_d_f) <= (1-lambda) + lambda p(t|C_f)
+            - Dirichlet: tf(t,d_f) <= min(|d_f|, tf(t,C_f)); the bound is reached for |d_f| = tf(t,C_f)
+
+        :param field: entity field name, e.g. <dbo:abstract>
+        :param t: term
+        :return: max_d P(t|d_f)
+        """
+        len_C_f = self.lucene.get_coll_length(field)
+        tf_t_C_f = self.lucene.get_coll_termfreq(t, field)
+        if tf_t_C_f == 0:  # the term does not occur in any document field
+            return 0
+        if self.smoothing_method == "jm":
+            lambd = self.params.get('smoothing_param', 0.1)
+            return self.get_jm_prob(1, 1, tf_t_C_f, len_C_f, lambd)
+        elif self.smoothing_method == "dirichlet":
+            mu = self.params.get('smoothing_param', self.lucene.get_avg_len(field))
+            return self.get_dirichlet_prob(tf_t_C_f, tf_t_C_f, tf_t_C_f, len_C_f, mu)
+
     def get_term_probs(self, lucene_doc_id, field):
         """
         Returns probability of all query terms for the given field.
@@ -159,26 +209,21 @@ class ScorerLM(Scorer):
             p_t_theta_d_f[t] = self.get_term_prob(lucene_doc_id, field, t)
         return p_t_theta_d_f
 
-    def score_doc(self, doc_id, lucene_doc_id=None):
-        """
-        Scores the given document using LM.
+    def get_field(self):
+        """Returns the field used for LM scoring."""
+        return self.params.get('field', IndexFields.FIELDNAME_CONTENTS)
 
-        :param doc_id: document id
-        :param lucene_doc_id: internal Lucene document ID
-        :return float, LM score of document and query
+    def get_query_log_prob(self, p_t_theta_d):
         """
-        if self.SCORER_DEBUG:
-            print "Scoring doc ID=" + doc_id
-
-        if lucene_doc_id is None:
-            lucene_doc_id = self.lucene.get_lucene_document_id(doc_id)
+        Computes log(p(q|theta_d)) = sum(log(p(t|theta_d))) over query terms.
+        Terms that are not in the (field) collection are skipped.
 
-        field = self.params.get('field', Lucene.FIELDNAME_CONTENTS)
-
-        p_t_theta_d = self.get_term_probs(lucene_doc_id, field)
+        :param p_t_theta_d: dictionary of query terms with their probabilities
+        :return float, log-likelihood of query or None if none of query terms are in the collection
+        """
         if sum(p_t_theta_d.values()) == 0:  # none of query terms are in the field collection
             if self.SCORER_DEBUG:
-                print "\t\tP(q|" + field + ") = None"
+                print "\t\tP(q|theta_d) = None"
             return None
         # p(q|theta_d) = prod(p(t|theta_d)) ; we return log(p(q|theta_d))
         p_q_theta_d = 0
@@ -187,12 +232,103 @@ class ScorerLM(Scorer):
             if p_t_theta_d[t] == 0:
                 continue
             if self.SCORER_DEBUG:
-                print "\t\tP(" + t + "|" + field + ") = " + str(p_t_theta_d[t])
+                print "\t\tP(" + t + "|theta_d) = " + str(p_t_theta_d[t])
             p_q_theta_d += math.log(p_t_theta_d[t])
         if self.SCORER_DEBUG:
             print "\tP(d|q)=" + str(p_q_theta_d)
         return p_q_theta_d
 
+    def score_doc(self, doc_id, lucene_doc_id=None):
+        """
+        Scores the given document using LM.
+
+        :param doc_id: document id
+        :param lucene_doc_id: internal Lucene document ID
+        :return float, LM score of document and query
+        """
+        if self.SCORER_DEBUG:
+            print "Scoring doc ID=" + doc_id
+
+        if lucene_doc_id is None:
+            lucene_doc_id = self.lucene.get_lucene_document_id(doc_id)
+
+        p_t_theta_d = self.get_term_probs(lucene_doc_id, self.get_field())
+        return self.get_query_log_prob(p_t_theta_d)
+
+    def get_term_bound(self, t):
+        """Returns an upper bound of p(t|theta_d) over all documents."""
+        return self.get_term_prob_bound(self.get_field(), t)
+
+    def get_doc_term_prob(self, lucene_doc_id, t):
+        """Returns p(t|theta_d) for the given document."""
+        return self.get_term_prob(lucene_doc_id, self.get_field(), t)
+
+    def can_prune(self):
+        """
+        Pruning relies on p(t|theta_d) > 0 for all terms with a non-zero bound, which does not hold for
+        JM smoothing with lambda=0 (terms missing from a document would be skipped instead).
+        """
+        if self.smoothing_method == "jm":
+            return self.params.get('smoothing_param', 0.1) > 0
+        return True
+
+    def get_log_term_bounds(self):
+        """
+        Returns (cached) upper bounds of log(p(t|theta_d)) for all query terms.
+        Terms with zero probability in all documents are skipped in scoring, so their bound is 0.
+        """
+        if self.term_bounds is None:
+            self.term_bounds = {}
+            for t in set(self.query_terms):
+                p_t_max = self.get_term_bound(t)
+                self.term_bounds[t] = math.log(p_t_max) if p_t_max > 0 else 0
+        return self.term_bounds
+
+    def score_doc_pruned(self, doc_id, lucene_doc_id=None, min_score=None):
+        """
+        Scores the document term-at-a-time (MaxScore-style) and stops as soon as the score can not reach min_score.
+        The score of a document is bounded by its partial score plus the term bounds of the remaining terms;
+        terms are processed in increasing order of their bounds (i.e., rare terms first).
+
+        NOTE: The term bounds are based on collection statistics only, i.e., they are the same for all documents.
+        Term vectors are not read only if min_score is above the bound of the whole query (which then holds for
+        all remaining documents); otherwise the term vectors of the document are read with the first term, and
+        pruning saves the computation of the remaining term probabilities (CPU only).
+
+        :param doc_id: document id
+        :param lucene_doc_id: internal Lucene document ID
+        :param min_score: score the document must exceed, e.g., the lowest score in the current top-k
+        :return float, score of the document (same as score_doc if not pruned) or None if the document is pruned
+        """
+        if (min_score is None) or (not self.can_prune()):
+            self.num_scored += 1
+            return self.score_doc(doc_id, lucene_doc_id)
+
+        bounds = self.get_log_term_bounds()
+        term_counts = dict((t, self.query_terms.count(t)) for t in bounds)
+        remaining = sum(bounds[t] * n for t, n in term_counts.iteritems())
+        # bound of the query; no document can exceed it
+        if remaining < min_score:
+            self.num_pruned += 1
+            return None
+
+        if lucene_doc_id is None:
+            lucene_doc_id = self.lucene.get_lucene_document_id(doc_id)
+
+        partial = 0
+        p_t_theta_d = {}
+        for t in sorted(bounds, key=lambda term: bounds[term]):
+            if partial + remaining < min_score:
+                self.num_pruned += 1
+                return None
+            p_t_theta_d[t] = self.get_doc_term_prob(lucene_doc_id, t)
+            remaining -= bounds[t] * term_counts[t]
+            if p_t_theta_d[t] > 0:
+                partial += math.log(p_t_theta_d[t]) * term_counts[t]
+
+        self.num_scored += 1
+        return self.get_query_log_prob(p_t_theta_d)
+
 
 class ScorerMLM(ScorerLM):
     """MLM scorer."""
@@ -200,6 +336,10 @@ class ScorerMLM(ScorerLM):
     def __init__(self, lucene, query, params):
         super(ScorerMLM, self).__init__(lucene, query, params)
 
+    def get_tv_fields(self):
+        """Returns the fields whose term vectors are read together for a document."""
+        return self.params.get('field_weights', {}).keys()
+
     def get_mlm_term_prob(self, lucene_doc_id, weights, t):
         """
         Returns MLM probability for the given term and field-weights.
@@ -268,6 +408,17 @@ class ScorerMLM(ScorerLM):
 
         return p_q_theta_d
 
+    def get_term_bound(self, t):
+        """Returns an upper bound of p(t|theta_d) = sum(mu_f * p(t|theta_d_f)) over all documents."""
+        p_t_max = 0
+        for f, mu_f in self.params['field_weights'].iteritems():
+            p_t_max += mu_f * self.get_term_prob_bound(f, t)
+        return p_t_max
+
+    def get_doc_term_prob(self, lucene_doc_id, t):
+        """Returns p(t|theta_d) for the given document."""
+        return self.get_mlm_term_prob(lucene_doc_id, self.params['field_weights'], t)
+
 
 class ScorerPRMS(ScorerLM):
     """PRMS scorer."""
@@ -278,6 +429,8 @@ class ScorerPRMS(ScorerLM):
         self.field_counts = self.params['field_counts']  # dictionary of fields and their frequency
         self.total_field_freq = None
         self.mapping_probs = None
+        # mapping probabilities shared across queries (and loaded from prms_cache_file, if given)
+        self.cache = PRMSCache.get_cache(self.lucene.index_dir, self.field_counts, self.params.get('prms_cache_file'))
 
     def score_doc(self, doc_id, lucene_doc_id=None):
         """
@@ -322,17 +475,30 @@ class ScorerPRMS(ScorerLM):
                     if self.SCORER_DEBUG:
                         print "\t\t\tf=" + f + ", p(t|f)=" + str(p_f_t[t][f]) + "  P(t|theta_d,f)=" + str(p_t_theta_d_f[f][t])
 
+            # Skips the term if it is not in any field collection (as in get_query_log_prob)
+            if p_t_theta_d == 0:
+                continue
             p_q_theta_d += math.log(p_t_theta_d)
             if self.SCORER_DEBUG:
                 print "\t\tP(t|theta_d)=" + str(p_t_theta_d)
         return p_q_theta_d
 
+    def get_tv_fields(self):
+        """Returns the fields whose term vectors are read together for a document."""
+        return self.field_counts.keys()
+
     def get_total_field_freq(self):
         if self.total_field_freq is None:
             self.total_field_freq = sum(self.field_counts.values())
         return self.total_field_freq
 
     def get_mapping_prob(self, t):
+        """Returns (cached) mapping probabilities p(f|t) for the given term."""
+        if not self.cache.contains(t):
+            self.cache.add(t, self.compute_mapping_prob(t))
+        return self.cache.get(t)
+
+    def compute_mapping_prob(self, t):
         # calculates numerators for all fields: P(t|f)P(f)
         numerators = {}
         for f, freq in self.field_counts.iteritems():
@@ -368,10 +534,25 @@ class ScorerPRMS(ScorerLM):
 
         return self.mapping_probs
 
+    def get_term_bound(self, t):
+        """Returns an upper bound of p(t|theta_d) = sum(p(f|t) * p(t|theta_d_f)) over all documents."""
+        p_t_max = 0
+        for f, p_f_t in self.get_mapping_probs()[t].iteritems():
+            p_t_max += p_f_t * self.get_term_prob_bound(f, t)
+        return p_t_max
+
+    def get_doc_term_prob(self, lucene_doc_id, t):
+        """Returns p(t|theta_d) for the given document; only fields with p(f|t) > 0 are considered."""
+        p_t_theta_d = 0
+        for f, p_f_t in self.get_mapping_probs()[t].iteritems():
+            p_t_theta_d += p_f_t * self.get_term_prob(lucene_doc_id, f, t)
+        return p_t_theta_d
+
 
 def main(args):
     query = args[0]
     en_id = args[1]
+    from nordlys.retrieval.index_cache import IndexCache
     lucene = IndexCache("/hdfs1/krisztib/dbpedia-3.9-indices/index7/")
     # params = {'field_weights': {'names': 0.2, 'contents': 0.8}}
     # score = ScorerMLM(lucene, query, params).score_doc(en_id)
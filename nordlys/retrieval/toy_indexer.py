@@ -1,11 +1,13 @@
 """
 Toy indexer example.
+Use -mem to build a MemIndex (no JVM needed) instead of a Lucene index.
 
 @author: Krisztian Balog
 """
 
 import sys
 from lucene_tools import Lucene
+from mem_index import MemIndex
 
 
 def main(argv):
@@ -35,7 +37,10 @@ def main(argv):
         }
     ]
 
-    lucene = Lucene(index_dir)
+    if len(argv) > 0 and argv[0] == "-mem":
+        lucene = MemIndex(index_dir + "_mem")
+    else:
+        lucene = Lucene(index_dir)
     print index_dir
     lucene.open_writer()
 
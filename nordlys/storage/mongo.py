@@ -109,7 +109,8 @@ class Mongo(object):
         self.collection.drop()
         print self.collection_name + " dropped"
 
-    def get_doc(self, mdoc):
+    @staticmethod
+    def get_doc(mdoc):
         """Returns document contents with with keys and _id field unescaped."""
         if mdoc is None:
             return None
@@ -117,9 +118,9 @@ class Mongo(object):
         doc = {}
         for f in mdoc:
             if f == Mongo.ID_FIELD:
-                doc[f] = self.unescape(mdoc[f])
+                doc[f] = Mongo.unescape(mdoc[f])
             else:
-                doc[self.unescape(f)] = mdoc[f]
+                doc[Mongo.unescape(f)] = mdoc[f]
 
         return doc
 